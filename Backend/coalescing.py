@@ -0,0 +1,250 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """One shared call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Lets identical concurrent calls share a single execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running wait for the same result (or exception). The work is only
+    cancelled when every waiter has gone away.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.flights: Dict[str, _Flight] = {}
+        self.shared = 0
+
+    async def do(self, key: str, work: Callable[[], Awaitable]) -> Any:
+        """
+        Run `work()` for `key`, or join the run already in flight.
+
+        Args:
+            key (str): Identity of the call
+            work (Callable): Factory for the coroutine to run
+
+        Returns:
+            Any: The result of the shared call
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+        else:
+            self.shared += 1
+            logger.info(f"Coalesced {self.name} call into one already in flight")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finished(self, key: str, flight: _Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.flights), "shared": self.shared}
+
+class StreamFanout:
+    """
+    Relays one async byte stream to any number of subscribers.
+
+    Chunks are buffered for the lifetime of the stream so a subscriber that
+    joins late still receives the whole stream from the start. The source is
+    only read once a subscriber starts iterating, and it is closed as soon as
+    every subscription has been closed before it finished, whether or not
+    the subscriptions were ever read.
+    """
+
+    def __init__(self, source: AsyncIterator[bytes], cleanup: Optional[Callable[[], Awaitable]] = None,
+                 on_finished: Optional[Callable[[], None]] = None):
+        self.source = source
+        self.cleanup = cleanup
+        self.on_finished = on_finished
+        self.chunks = []
+        self.done = False
+        self.error = None
+        # Subscriptions handed out and not closed yet, and those of them iterating
+        self.claims = 0
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = None
+        self.closing = None
+
+    def subscribe(self) -> "StreamSubscription":
+        """Return a new iterator over the full stream; close it when done with it"""
+        self.claims += 1
+        return StreamSubscription(self)
+
+    def _start_pump(self):
+        if self.task is None and not self.done:
+            self.task = asyncio.ensure_future(self._pump())
+
+    async def _pump(self):
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self._finish()
+            await self._close_source()
+
+    async def _close_source(self):
+        try:
+            aclose = getattr(self.source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            if self.cleanup is not None:
+                await self.cleanup()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _finish(self):
+        if not self.done:
+            self.done = True
+            self._notify()
+            if self.on_finished is not None:
+                self.on_finished()
+
+    def _release(self):
+        """Close the stream if nobody holds a subscription to it any more"""
+        if self.claims == 0 and not self.done:
+            if self.task is not None:
+                self.task.cancel()
+            else:
+                # Never read: the source still has to give back its connection
+                self._finish()
+                self.closing = asyncio.ensure_future(self._close_source())
+
+class StreamSubscription:
+    """
+    One subscriber's iterator over a StreamFanout.
+
+    It only counts as a subscriber once iteration starts. Close it when the
+    response ends, even if it was never iterated, so the shared stream is not
+    kept open for nobody.
+    """
+
+    def __init__(self, fanout: StreamFanout):
+        self.fanout = fanout
+        self.index = 0
+        self.started = False
+        self.closed = False
+
+    def __aiter__(self) -> "StreamSubscription":
+        return self
+
+    async def __anext__(self) -> bytes:
+        fanout = self.fanout
+        if self.closed:
+            raise StopAsyncIteration
+        if not self.started:
+            self.started = True
+            fanout.subscribers += 1
+            fanout._start_pump()
+        while True:
+            if self.index < len(fanout.chunks):
+                self.index += 1
+                return fanout.chunks[self.index - 1]
+            if fanout.done:
+                await self.aclose()
+                if fanout.error is not None:
+                    raise fanout.error
+                raise StopAsyncIteration
+            await fanout._changed.wait()
+
+    async def aclose(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.started:
+            self.fanout.subscribers -= 1
+        self.fanout.claims -= 1
+        self.fanout._release()
+
+class StreamCoalescer:
+    """Shares one upstream stream between identical concurrent streaming requests"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.streams: Dict[str, _Flight] = {}
+        self.shared = 0
+
+    async def open(self, key: str, open_source: Callable[[], Awaitable]) -> StreamSubscription:
+        """
+        Subscribe to the stream for `key`, opening the source if no identical stream is live.
+
+        Opening is cancelled (and the source never read) when every caller
+        waiting for it goes away first, like `SingleFlight.do`.
+
+        Args:
+            key (str): Identity of the stream
+            open_source (Callable): Coroutine factory returning the byte iterator, or a
+                (byte iterator, cleanup coroutine function) pair; errors it raises are
+                re-raised to every caller
+
+        Returns:
+            StreamSubscription: Iterate it to receive the stream, and close it
+                once the response has ended
+        """
+        flight = self.streams.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._start(key, open_source)))
+            self.streams[key] = flight
+        else:
+            self.shared += 1
+            logger.info(f"Coalesced {self.name} stream into one already in flight")
+
+        flight.waiters += 1
+        subscription = None
+        try:
+            subscription = (await asyncio.shield(flight.task)).subscribe()
+            return subscription
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and subscription is None:
+                if not flight.task.done():
+                    flight.task.cancel()
+                elif not flight.task.cancelled() and flight.task.exception() is None:
+                    # Opened just as the last waiting caller gave up
+                    flight.task.result()._release()
+
+    async def _start(self, key: str, open_source) -> StreamFanout:
+        task = asyncio.current_task()
+        try:
+            opened = await open_source()
+        except BaseException:
+            self._finished(key, task)
+            raise
+        source, cleanup = opened if isinstance(opened, tuple) else (opened, None)
+        return StreamFanout(source, cleanup, on_finished=lambda: self._finished(key, task))
+
+    def _finished(self, key: str, task: asyncio.Task):
+        flight = self.streams.get(key)
+        if flight is not None and flight.task is task:
+            del self.streams[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.streams), "shared": self.shared}
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English text and code. The proxy does not
+# know which tokenizer the loaded model uses, so budgets are approximate.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest line kept per message in a collapsed summary
+SUMMARY_LINE_CHARS = 200
+
+# Summary lines remembered, keyed on a digest so large tool outputs are not kept alive
+SUMMARY_CACHE_SIZE = 4096
+_summaries = OrderedDict()  # (role, sha1 of text) -> summary line
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def message_text(message: dict) -> str:
+    """Flatten a chat message's content (string, parts list or tool calls) to text"""
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    text = content or ""
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"])
+    return text
+
+def count_message_tokens(message: dict) -> int:
+    return count_tokens(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+
+def count_messages_tokens(messages: list) -> int:
+    return sum(count_message_tokens(message) for message in messages)
+
+def is_tool_output(message: dict) -> bool:
+    """Tool results and injected context (e.g. file analysis) that can be shortened"""
+    return message.get("role") in ("tool", "function", "system")
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the start of `text`, noting how much was cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = text[:max_tokens * CHARS_PER_TOKEN]
+    return f"{kept}\n...[truncated {count_tokens(text) - max_tokens} tokens]"
+
+def truncate_content(content, max_tokens: int):
+    """
+    Shorten a message's content to about `max_tokens`. A parts list stays a
+    list: its text parts share the budget in order, other parts (images) are kept.
+    """
+    if isinstance(content, str):
+        return truncate_to_tokens(content, max_tokens)
+    if not isinstance(content, list):
+        return content
+    parts = []
+    remaining = max_tokens
+    for part in content:
+        if isinstance(part, dict) and isinstance(part.get("text"), str):
+            tokens = count_tokens(part["text"])
+            if tokens > remaining:
+                part = {**part, "text": truncate_to_tokens(part["text"], remaining)}
+            remaining = max(remaining - tokens, 0)
+        parts.append(part)
+    return parts
+
+def summarize_message(role: str, text: str) -> str:
+    """
+    One-line extractive summary of a message.
+
+    Cached, so earlier turns are only summarized once however many times
+    the conversation is sent again.
+    """
+    key = (role, hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest())
+    summary = _summaries.get(key)
+    if summary is not None:
+        _summaries.move_to_end(key)
+        return summary
+    text = re.sub(r"\s+", " ", text).strip()
+    first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(first_sentence) > SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:SUMMARY_LINE_CHARS].rstrip() + "..."
+    summary = f"- {role}: {first_sentence}"
+    _summaries[key] = summary
+    while len(_summaries) > SUMMARY_CACHE_SIZE:
+        _summaries.popitem(last=False)
+    return summary
+
+class ContextCompactor:
+    """
+    Shrinks chat histories to a per-model token budget before they go upstream.
+
+    The first system prompt and the latest turn are always kept. When a
+    conversation is over budget, older tool outputs and injected context are
+    truncated first; if that is not enough, earlier turns are collapsed into a
+    single summary message; as a last resort the summary and then the oldest of
+    the recent turns are dropped.
+    """
+
+    def __init__(self, config: dict):
+        self.default_budget = config.get("default_budget", 6000)
+        self.model_budgets = config.get("model_budgets", {})
+        self.keep_recent_turns = config.get("keep_recent_turns", 4)
+        self.max_tool_output_tokens = config.get("max_tool_output_tokens", 400)
+        self.summary_max_tokens = config.get("summary_max_tokens", 600)
+
+    def budget_for(self, body: dict) -> int:
+        """Prompt token budget for the request's model, minus what its tool schemas use"""
+        budget = self.model_budgets.get(body.get("model"), self.default_budget)
+        for field in ("tools", "functions"):
+            if body.get(field):
+                budget -= count_tokens(json.dumps(body[field]))
+        return max(budget, 0)
+
+    def _split(self, messages: list):
+        """Split into (pinned system prompt, older messages, recent turns)"""
+        pinned = messages[:1] if messages and messages[0].get("role") == "system" else []
+        rest = messages[len(pinned):]
+
+        user_positions = [i for i, message in enumerate(rest) if message.get("role") == "user"]
+        if len(user_positions) <= self.keep_recent_turns:
+            return pinned, [], rest
+        boundary = user_positions[-self.keep_recent_turns]
+        return pinned, rest[:boundary], rest[boundary:]
+
+    def _truncate_tool_outputs(self, messages: list) -> list:
+        return [
+            {**message, "content": truncate_content(message.get("content"), self.max_tool_output_tokens)}
+            if is_tool_output(message) and not message.get("tool_calls") else message
+            for message in messages
+        ]
+
+    def _summarize(self, messages: list) -> dict:
+        lines = [summarize_message(message.get("role", "user"), message_text(message)) for message in messages]
+        # Keep the most recent lines if the summary itself is over budget
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_max_tokens:
+            lines.pop(0)
+        return {
+            "role": "system",
+            "content": "Summary of the earlier conversation:\n" + "\n".join(lines)
+        }
+
+    def compact(self, body: dict) -> list:
+        """
+        Return the request's messages fitted to the model's budget.
+
+        Args:
+            body (dict): Completion request with `messages`
+
+        Returns:
+            list: The messages to forward (the original list if already within budget)
+        """
+        messages = body.get("messages") or []
+        budget = self.budget_for(body)
+        original_tokens = count_messages_tokens(messages)
+        if original_tokens <= budget:
+            return messages
+
+        pinned, older, recent = self._split(messages)
+
+        # 1. Shorten old tool outputs and injected context
+        middle = self._truncate_tool_outputs(older)
+
+        # 2. Collapse earlier turns into a summary
+        if middle and count_messages_tokens(pinned + middle + recent) > budget:
+            middle = [self._summarize(older)]
+
+        # 3. Shorten tool outputs in recent turns, except the latest message
+        if count_messages_tokens(pinned + middle + recent) > budget:
+            recent = self._truncate_tool_outputs(recent[:-1]) + recent[-1:]
+
+        # 4. Drop the summary, then the oldest recent turns, keeping at least the last one
+        while count_messages_tokens(pinned + middle + recent) > budget:
+            if middle:
+                middle = []
+                continue
+            user_positions = [i for i, message in enumerate(recent) if message.get("role") == "user"]
+            if len(user_positions) < 2:
+                break
+            recent = recent[user_positions[1]:]
+
+        compacted = pinned + middle + recent
+        logger.info(
+            f"Compacted {len(messages)} messages (~{original_tokens} tokens) to "
+            f"{len(compacted)} (~{count_messages_tokens(compacted)} tokens), budget {budget}"
+        )
+        return compacted
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+from Tools.progress import Cancelled
+
+logger = logging.getLogger(__name__)
+
+# Job states; the last three are final
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobLimitError(Exception):
+    """Raised when too many jobs are queued or running to accept another"""
+
+class Job:
+    """One submitted tool call, its progress, partial results and outcome"""
+
+    def __init__(self, name: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.params = params
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.progress = {"done": None, "total": None, "message": None}
+        self.partial = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+        self.expires_at: Optional[float] = None
+        # Every status/progress change, numbered so subscribers can resume
+        self.events = []
+        self.changed = asyncio.Event()
+        # Called with (job, event) after every event; set by a JobManager sharing its jobs
+        self.on_event: Optional[Callable[["Job", dict], None]] = None
+        self.partials_written = 0
+
+    def emit(self, event_type: str, data: dict):
+        event = {"seq": len(self.events), "event": event_type, **data}
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(self, event)
+        # Wake current subscribers; later ones wait on a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def set_status(self, status: str):
+        self.status = status
+        if status == RUNNING:
+            self.started = time.time()
+        elif status in FINAL_STATES:
+            self.finished = time.time()
+        self.emit("status", {"status": status})
+
+    def apply_progress(self, update: dict):
+        """Record a `report_progress` update (called on the event loop)"""
+        if "partial" in update:
+            self.partial.append(update.pop("partial"))
+        self.progress.update({key: value for key, value in update.items() if value is not None})
+        self.emit("progress", dict(self.progress, partial_results=len(self.partial)))
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress,
+            "partial_results": len(self.partial)
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == SUCCEEDED:
+            data["result"] = self.result
+        return data
+
+class RemoteJob:
+    """Read-only view of a job that another worker process is running (multi-worker mode)"""
+
+    def __init__(self, store, snapshot: dict):
+        self.store = store
+        self.snapshot = snapshot
+
+    @property
+    def id(self) -> str:
+        return self.snapshot["id"]
+
+    @property
+    def status(self) -> str:
+        return self.snapshot["status"]
+
+    def refresh(self):
+        """Re-read the snapshot (blocking: call on a worker thread)"""
+        self.snapshot = self.store.load(self.id) or self.snapshot
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {key: value for key, value in self.snapshot.items() if key != "cancel_requested"}
+        if not include_result:
+            data.pop("result", None)
+        return data
+
+class JobManager:
+    """
+    Runs tool calls in the background so long tools outlive HTTP and UI timeouts.
+
+    At most `max_workers` jobs run at once; the rest wait in submission order.
+    Progress and partial results come from the tool's `report_progress`
+    calls. Finished jobs, with their results, are kept for `result_ttl`
+    seconds after they end.
+
+    With a `store` (multi-worker mode) every job is also written to the shared
+    database, so the other workers can report on it and ask for it to be
+    cancelled; `max_workers` then applies per worker process. Store calls run
+    on worker threads, and events are written in order by one background
+    writer, so a busy database never stalls the event loop.
+    """
+
+    def __init__(self, run: Callable[[str, dict, Callable[[dict], None]], Awaitable[Any]],
+                 max_workers: int = 2, max_jobs: int = 100, result_ttl: float = 3600,
+                 store=None, cancel_poll_interval: float = 0.5):
+        """
+        Args:
+            run (Callable): Coroutine function (name, params, reporter) that executes
+                the tool with `reporter` installed for its progress reports
+            max_workers (int): Jobs allowed to run at the same time
+            max_jobs (int): Jobs allowed to be queued or running at the same time
+            result_ttl (float): Seconds a finished job is kept
+            store (SharedJobStore, optional): Shared job records for multi-worker mode
+            cancel_poll_interval (float): Seconds between checks for cancellations
+                requested through other workers
+        """
+        self.run = run
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self.workers = asyncio.Semaphore(max_workers)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.store = store
+        self.cancel_poll_interval = cancel_poll_interval
+        self.cancel_watcher: Optional[asyncio.Task] = None
+        # (snapshot, expires_at, event, new partials, index of the first) waiting to be written
+        self.pending_writes: Optional[asyncio.Queue] = None
+        self.writer: Optional[asyncio.Task] = None
+
+    async def submit(self, name: str, params: dict) -> Job:
+        """
+        Queue a tool call as a job.
+
+        Raises:
+            JobLimitError: If `max_jobs` jobs are already queued or running
+        """
+        await self.purge()
+        if self.store is not None:
+            active = await asyncio.to_thread(self.store.active_count)
+        else:
+            active = sum(1 for job in self.jobs.values() if job.status not in FINAL_STATES)
+        if active >= self.max_jobs:
+            raise JobLimitError(f"{active} jobs are already queued or running")
+
+        job = Job(name, params)
+        self.jobs[job.id] = job
+        if self.store is not None:
+            job.on_event = self._persist
+            if self.writer is None or self.writer.done():
+                self.pending_writes = self.pending_writes or asyncio.Queue()
+                self.writer = asyncio.create_task(self._write_events())
+            if self.cancel_watcher is None or self.cancel_watcher.done():
+                self.cancel_watcher = asyncio.create_task(self._watch_cancellations())
+        job.emit("status", {"status": QUEUED})
+        job.task = asyncio.create_task(self._execute(job))
+        logger.info(f"Job {job.id} queued: {name}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """A job of this process, or a RemoteJob view of one running on another worker"""
+        await self.purge()
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            snapshot = await asyncio.to_thread(self.store.load, job_id)
+            if snapshot is not None:
+                return RemoteJob(self.store, snapshot)
+        return job
+
+    async def summaries(self) -> list:
+        await self.purge()
+        if self.store is not None:
+            return [RemoteJob(self.store, snapshot).to_dict(include_result=False)
+                    for snapshot in await asyncio.to_thread(self.store.list)]
+        return [job.to_dict(include_result=False) for job in self.jobs.values()]
+
+    async def partials(self, job) -> list:
+        """Partial results a job has reported so far"""
+        if isinstance(job, RemoteJob):
+            return await asyncio.to_thread(self.store.partials, job.id)
+        return job.partial
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job.
+
+        Coroutine tools are cancelled straight away. A tool running on a worker
+        thread cannot be interrupted; it stops at its next progress report and
+        anything it returns afterwards is discarded.
+        """
+        job = await self.get(job_id)
+        if job is None or job.status in FINAL_STATES:
+            return job
+        if isinstance(job, RemoteJob):
+            # The owning worker notices the flag within cancel_poll_interval
+            await asyncio.to_thread(self.store.request_cancel, job_id)
+            return job
+        job.cancel_requested = True
+        job.task.cancel()
+        return job
+
+    async def purge(self):
+        """Forget finished jobs whose results have expired"""
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.expires_at is not None and job.expires_at <= now]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if self.store is not None:
+            await asyncio.to_thread(self.store.purge)
+
+    async def events(self, job: Job, after: int = -1) -> AsyncGenerator[dict, None]:
+        """Yield the job's events after sequence number `after`, until it finishes"""
+        if isinstance(job, RemoteJob):
+            async for event in self._remote_events(job, after):
+                yield event
+            return
+        position = after + 1
+        while True:
+            changed = job.changed
+            while position < len(job.events):
+                yield job.events[position]
+                position += 1
+            if job.status in FINAL_STATES:
+                return
+            await changed.wait()
+
+    async def _remote_events(self, job: RemoteJob, after: int) -> AsyncGenerator[dict, None]:
+        """Poll the shared store for another worker's job events"""
+        while True:
+            await asyncio.to_thread(job.refresh)
+            final = job.status in FINAL_STATES
+            for event in await asyncio.to_thread(self.store.events_after, job.id, after):
+                after = event["seq"]
+                yield event
+            if final:
+                return
+            await asyncio.sleep(self.cancel_poll_interval)
+
+    def _persist(self, job: Job, event: dict):
+        """Queue a local job's new event, snapshot and partial results for the shared store"""
+        written = job.partials_written
+        expires_at = time.time() + self.result_ttl if job.status in FINAL_STATES else None
+        self.pending_writes.put_nowait((job.to_dict(), expires_at, event, job.partial[written:], written))
+        job.partials_written = len(job.partial)
+
+    async def _write_events(self):
+        """Write queued job updates to the shared store in order, a batch per worker-thread call"""
+        while True:
+            batch = [await self.pending_writes.get()]
+            while not self.pending_writes.empty():
+                batch.append(self.pending_writes.get_nowait())
+            try:
+                await asyncio.to_thread(self._save_batch, batch)
+            finally:
+                for _ in batch:
+                    self.pending_writes.task_done()
+
+    def _save_batch(self, batch: list):
+        for snapshot, expires_at, event, partials, first_partial in batch:
+            try:
+                self.store.save(snapshot, expires_at, event, partials, first_partial)
+            except Exception as e:
+                logger.warning(f"Could not share job {snapshot['id']} with the other workers: {str(e)}")
+
+    async def close(self):
+        """Finish writing queued job updates, then close the shared store"""
+        if self.writer is not None and not self.writer.done():
+            try:
+                await asyncio.wait_for(self.pending_writes.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.pending_writes.qsize()} unwritten job updates")
+            self.writer.cancel()
+        if self.cancel_watcher is not None:
+            self.cancel_watcher.cancel()
+        if self.store is not None:
+            self.store.close()
+
+    async def _watch_cancellations(self):
+        """Cancel local jobs that a request to another worker asked to cancel"""
+        while any(job.status not in FINAL_STATES for job in self.jobs.values()):
+            await asyncio.sleep(self.cancel_poll_interval)
+            try:
+                job_ids = await asyncio.to_thread(self.store.cancel_requests)
+            except Exception as e:
+                logger.warning(f"Could not check for job cancellations: {str(e)}")
+                continue
+            for job_id in job_ids:
+                await self.cancel(job_id)
+
+    def reporter_for(self, job: Job) -> Callable[[dict], None]:
+        """Progress callback handed to the tool; safe to call from worker threads"""
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+
+        def report(update: dict):
+            if job.cancel_requested:
+                raise Cancelled(f"Job {job.id} was cancelled")
+            if threading.get_ident() == loop_thread:
+                # A coroutine tool: apply now, so the update is not recorded after the job finished
+                job.apply_progress(update)
+            else:
+                loop.call_soon_threadsafe(job.apply_progress, update)
+        return report
+
+    async def _execute(self, job: Job):
+        try:
+            async with self.workers:
+                job.set_status(RUNNING)
+                job.result = await self.run(job.name, job.params, self.reporter_for(job))
+            job.set_status(SUCCEEDED)
+        except asyncio.CancelledError:
+            job.set_status(CANCELLED)
+            logger.info(f"Job {job.id} cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.set_status(FAILED)
+            logger.error(f"Job {job.id} failed: {str(e)}")
+        finally:
+            job.expires_at = time.monotonic() + self.result_ttl
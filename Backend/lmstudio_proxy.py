@@ -6,109 +6,1198 @@ import asyncio
 import time
 import sys
 import os
+from contextlib import asynccontextmanager
 
 # Add the project root to Python path to allow imports from Tools directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from Tools.tool_handlers import TOOL_HANDLERS
+from Tools.tool_handlers import TOOL_HANDLERS, TOOL_SCHEMAS, TOOL_STREAMERS
+from Tools.progress import progress_reporter, report_progress
+from Tools.registry import close_helpers
+from Backend.sse import CompletionAccumulator, completion_to_sse, format_sse
+from Backend.response_cache import ResponseCache, cache_key, is_cacheable
+from Backend.coalescing import SingleFlight, StreamCoalescer
+from Backend.scheduler import AdmissionScheduler, QueueFullError, QueueTimeoutError
+from Backend.compaction import ContextCompactor
+from Backend.tool_executor import ToolExecutor, ToolTimeoutError
+from Backend.tool_validation import ToolValidationError, compile_validators
+from Backend.process_pool import ProcessToolPool
+from Backend.traffic_recorder import TrafficRecorder
+from Backend.upstreams import NoUpstreamAvailable, Upstream, UpstreamPool
+from Backend.jobs import JobLimitError, JobManager
+from Backend.shared_state import SharedJobStore, SharedSlots
+from Backend.server import WORKERS_ENV
+from Backend import metrics
 
-from fastapi.responses import JSONResponse, StreamingResponse
-from typing import AsyncGenerator
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from anyio import CancelScope
+from typing import AsyncGenerator, Awaitable, Callable, Optional, Tuple
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-
 # Load tool configurations
 with open('Tools/tools_config.json', 'r') as f:
     TOOLS_CONFIG = json.load(f)
 
-LMSTUDIO_URL = "http://localhost:4891/v1/chat/completions"
+# Tool handlers run off the event loop with per-tool concurrency limits and timeouts
+EXECUTION_CONFIG = TOOLS_CONFIG.get("execution", {})
+
+# Tools with "isolation": "process" run in prewarmed, resource-limited worker processes
+PROCESS_POOL_CONFIG = EXECUTION_CONFIG.get("process_pool", {})
+process_pool = ProcessToolPool(
+    size=PROCESS_POOL_CONFIG.get("size", 2),
+    max_calls=PROCESS_POOL_CONFIG.get("max_calls", 50),
+    cpu_seconds=PROCESS_POOL_CONFIG.get("cpu_seconds", 60),
+    memory_mb=PROCESS_POOL_CONFIG.get("memory_mb", 1024),
+    progress_callback=report_progress
+) if any(
+    settings.get("isolation") == "process"
+    for settings in [EXECUTION_CONFIG.get("defaults", {}), *EXECUTION_CONFIG.get("tools", {}).values()]
+) else None
+
+tool_executor = ToolExecutor(TOOL_HANDLERS, EXECUTION_CONFIG, process_pool, TOOL_STREAMERS)
+
+# Parameter validators, compiled once from the tool schemas and checked before dispatch
+tool_validators = compile_validators(TOOL_SCHEMAS)
+
+def validate_tool_params(function_name: str, params):
+    """
+    Check a call's parameters against the tool's schema before any work starts.
+    
+    Raises:
+        ToolValidationError: With one structured error per problem found
+    """
+    validator = tool_validators.get(function_name)
+    if validator is None:
+        return
+    try:
+        validator(params)
+    except ToolValidationError:
+        metrics.TOOL_REQUESTS.inc(tool=function_name, outcome="invalid")
+        raise
+
+# Identical concurrent completions and tool calls share one execution
+completion_flights = SingleFlight("completion")
+stream_flights = StreamCoalescer("completion")
+tool_flights = SingleFlight("tool")
+
+# Load proxy configuration (upstream address, connection pool, timeouts)
+PROXY_CONFIG_PATH = os.environ.get(
+    'FEANOR_PROXY_CONFIG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'proxy_config.json')
+)
+with open(PROXY_CONFIG_PATH, 'r') as f:
+    PROXY_CONFIG = json.load(f)
+
+UPSTREAM_CONFIG = PROXY_CONFIG["upstream"]
+
+# Multi-worker mode (Backend/server.py --workers N): the workers share the response
+# cache, the job store and the upstream concurrency limit through one SQLite database
+SERVER_CONFIG = PROXY_CONFIG.get("server", {})
+WORKERS = int(os.environ.get(WORKERS_ENV, SERVER_CONFIG.get("workers", 1)))
+SHARED_STATE_PATH = SERVER_CONFIG.get("state_path", "logs/proxy_state.db") if WORKERS > 1 else None
+
+# Model servers: the `upstreams` list (or the single `upstream.base_url`), routed per model
+upstream_pool = UpstreamPool.from_config(PROXY_CONFIG)
+
+# Admission control: bounded, prioritized and fair queue in front of LM Studio
+SCHEDULER_CONFIG = PROXY_CONFIG.get("scheduler", {})
+scheduler = AdmissionScheduler(
+    max_concurrency=SCHEDULER_CONFIG.get("max_concurrency", 2),
+    max_queue=SCHEDULER_CONFIG.get("max_queue", 32),
+    max_wait=SCHEDULER_CONFIG.get("max_wait"),
+    default_priority=SCHEDULER_CONFIG.get("default_priority", "interactive"),
+    wait_observer=metrics.QUEUE_WAIT.observe,
+    shared_slots=SharedSlots(
+        SHARED_STATE_PATH, SCHEDULER_CONFIG.get("max_concurrency", 2)
+    ) if SHARED_STATE_PATH else None
+)
+
+# Token-budgeted compaction of long chat histories before they are forwarded
+COMPACTION_CONFIG = PROXY_CONFIG.get("compaction", {})
+# Off by default: requests opt in with "compact": true unless it is enabled for all
+compactor = ContextCompactor(COMPACTION_CONFIG)
+
+# Cache of repeatable (deterministic or opted-in) completions
+CACHE_CONFIG = PROXY_CONFIG.get("cache", {})
+response_cache = ResponseCache(
+    max_bytes=CACHE_CONFIG.get("max_bytes", 64 * 1024 * 1024),
+    ttl=CACHE_CONFIG.get("ttl", 3600),
+    disk_path=CACHE_CONFIG.get("disk_path") or SHARED_STATE_PATH
+) if CACHE_CONFIG.get("enabled", False) else None
+
+# Opt-in capture of requests and response metadata for offline replay (Tests/replay_traffic.py)
+RECORDER_CONFIG = PROXY_CONFIG.get("recorder", {})
+RECORDER_PATH = RECORDER_CONFIG.get("path", "logs/traffic.jsonl")
+if WORKERS > 1:
+    # One file per worker: rotation is not safe with several writers
+    RECORDER_PATH = f"{os.path.splitext(RECORDER_PATH)[0]}.{os.getpid()}{os.path.splitext(RECORDER_PATH)[1]}"
+traffic_recorder = TrafficRecorder(
+    path=RECORDER_PATH,
+    max_bytes=RECORDER_CONFIG.get("max_bytes", 10 * 1024 * 1024),
+    backup_count=RECORDER_CONFIG.get("backup_count", 5),
+    include_bodies=RECORDER_CONFIG.get("include_bodies", True)
+) if RECORDER_CONFIG.get("enabled", False) else None
+
+def create_upstream_client() -> httpx.AsyncClient:
+    """Create the shared, pooled client used for every call to LM Studio"""
+    pool = UPSTREAM_CONFIG.get("pool", {})
+    timeouts = UPSTREAM_CONFIG.get("timeouts", {})
+    
+    http2 = UPSTREAM_CONFIG.get("http2", False)
+    if http2:
+        try:
+            import h2  # noqa: F401 - httpx needs it for HTTP/2
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+    
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=pool.get("max_connections", 32),
+            max_keepalive_connections=pool.get("max_keepalive_connections", 16),
+            keepalive_expiry=pool.get("keepalive_expiry", 30.0)
+        ),
+        timeout=httpx.Timeout(
+            connect=timeouts.get("connect", 5.0),
+            read=timeouts.get("read", 300.0),
+            write=timeouts.get("write", 30.0),
+            pool=timeouts.get("pool", 10.0)
+        )
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the upstream connection pool on startup and close it on shutdown"""
+    app.state.upstream = create_upstream_client()
+    health_checks = asyncio.create_task(upstream_pool.run_health_checks(app.state.upstream))
+    if process_pool is not None:
+        await process_pool.start()
+    if traffic_recorder is not None:
+        traffic_recorder.start()
+    try:
+        yield
+    finally:
+        health_checks.cancel()
+        await app.state.upstream.aclose()
+        await close_helpers()
+        tool_executor.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown()
+        if response_cache is not None:
+            response_cache.close()
+        if traffic_recorder is not None:
+            traffic_recorder.stop()
+        if scheduler.shared_slots is not None:
+            scheduler.shared_slots.close()
+        await job_manager.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Upper bound on model <-> tool round trips for server-side tool execution
+DEFAULT_MAX_TOOL_ROUNDS = 5
+
+# Largest number of tool calls accepted by /v1/functions/batch
+MAX_BATCH_CALLS = 1000
+
+# Status code reported (and logged) for requests abandoned by the client
+CLIENT_CLOSED_REQUEST = 499
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its request finished"""
+
+async def wait_for_disconnect(request: Request):
+    """Return once the client that sent the request has disconnected"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_until_disconnect(request: Request, work: Awaitable, description: str):
+    """
+    Await `work`, cancelling it if the client disconnects first.
+    
+    Args:
+        request (Request): The incoming request to watch
+        work (Awaitable): Upstream call or tool execution to run
+        description (str): Label used when logging the freed capacity
+        
+    Returns:
+        The result of `work`
+        
+    Raises:
+        ClientDisconnected: If the client disconnected before `work` finished
+    """
+    started = time.monotonic()
+    work_task = asyncio.ensure_future(work)
+    disconnect_task = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {work_task, disconnect_task},
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if work_task in done:
+            return work_task.result()
+        
+        work_task.cancel()
+        try:
+            await work_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        logger.info(
+            f"Client disconnected, cancelled {description} after "
+            f"{time.monotonic() - started:.2f}s and released its capacity"
+        )
+        raise ClientDisconnected()
+    finally:
+        disconnect_task.cancel()
+        if not work_task.done():
+            work_task.cancel()
+
+async def execute_tool(function_name: str, params: dict, timeout: float = None):
+    """Run one tool execution, recording its latency and outcome"""
+    started = time.monotonic()
+    outcome = "error"
+    metrics.TOOLS_IN_FLIGHT.inc(tool=function_name)
+    try:
+        result = await tool_executor.run(function_name, params, timeout)
+        outcome = "ok"
+        return result
+    except ToolTimeoutError:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        metrics.TOOLS_IN_FLIGHT.dec(tool=function_name)
+        metrics.TOOL_LATENCY.observe(time.monotonic() - started, tool=function_name)
+        metrics.TOOL_REQUESTS.inc(tool=function_name, outcome=outcome)
+
+async def run_tool(function_name: str, params: dict):
+    """
+    Run a registered tool handler without blocking the event loop.
+    
+    Identical calls (same tool, same parameters) that overlap share one
+    execution unless the tool sets "coalesce": false in its execution config.
+    Parameters are validated first, raising ToolValidationError.
+    """
+    validate_tool_params(function_name, params)
+    if not tool_executor.settings_for(function_name)["coalesce"]:
+        return await execute_tool(function_name, params)
+    key = function_name + ":" + json.dumps(params, sort_keys=True, default=str)
+    return await tool_flights.do(key, lambda: execute_tool(function_name, params))
+
+async def run_job_tool(function_name: str, params: dict, reporter: Callable[[dict], None]):
+    """
+    Run a tool for the job API with `reporter` receiving its progress reports.
+    
+    Jobs are not coalesced with other calls, so every job sees its own progress.
+    """
+    with progress_reporter(reporter):
+        return await execute_tool(function_name, params, timeout=JOBS_CONFIG.get("timeout"))
+
+# Background jobs for tools that outlast HTTP and UI timeouts
+JOBS_CONFIG = PROXY_CONFIG.get("jobs", {})
+job_manager = JobManager(
+    run_job_tool,
+    max_workers=JOBS_CONFIG.get("max_workers", 2),
+    max_jobs=JOBS_CONFIG.get("max_jobs", 100),
+    result_ttl=JOBS_CONFIG.get("result_ttl", 3600),
+    store=SharedJobStore(SHARED_STATE_PATH) if SHARED_STATE_PATH else None
+)
+
+async def execute_tool_call(tool_call: dict) -> dict:
+    """
+    Execute one `tool_calls` entry from a model response.
+    
+    Args:
+        tool_call (dict): Tool call as returned by the model
+        
+    Returns:
+        dict: A `tool` role message carrying the result (or the error) back to the model
+    """
+    function = tool_call.get("function", {})
+    function_name = function.get("name")
+    started = time.monotonic()
+    
+    try:
+        if function_name not in TOOL_HANDLERS:
+            raise ValueError(f"Function {function_name} not found")
+        arguments = function.get("arguments") or "{}"
+        params = json.loads(arguments) if isinstance(arguments, str) else arguments
+        result = await run_tool(function_name, params)
+        content = result if isinstance(result, str) else json.dumps(result, default=str)
+    except Exception as e:
+        logger.error(f"Tool call {function_name} failed: {str(e)}")
+        content = f"Error: {str(e)}"
+    
+    logger.info(f"Tool call {function_name} finished in {time.monotonic() - started:.2f}s")
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call.get("id"),
+        "name": function_name,
+        "content": content
+    }
+
+async def run_tool_loop(client: httpx.AsyncClient, body: dict, max_rounds: int,
+                        priority: str, session: str) -> dict:
+    """
+    Let the model call tools on the server until it produces a final answer.
+    
+    Every round forwards the conversation to LM Studio; any `tool_calls` in the
+    reply are executed concurrently through TOOL_HANDLERS and their results are
+    appended as `tool` messages before asking the model again.
+    
+    Args:
+        client (httpx.AsyncClient): Shared upstream client
+        body (dict): Completion request, already stripped of proxy-only fields
+        max_rounds (int): Maximum number of tool rounds before forcing an answer
+        priority (str): Scheduler priority class for the upstream calls
+        session (str): Scheduler session for the upstream calls
+        
+    Returns:
+        dict: The final (non-streaming) chat completion from LM Studio
+        
+    Raises:
+        UpstreamError: If LM Studio answers a round with an error status
+    """
+    messages = list(body["messages"])
+    payload = {**body, "stream": False}
+    if "tools" not in payload:
+        payload["tools"] = TOOL_SCHEMAS
+    # Legacy `functions` fields would compete with `tools`
+    payload.pop("functions", None)
+    payload.pop("function_call", None)
+    
+    for round_number in range(max_rounds + 1):
+        if round_number == max_rounds:
+            # Out of rounds, ask for an answer with what has been gathered so far
+            payload["tool_choice"] = "none"
+        
+        # Only the model call holds an upstream slot, not the tool work in between
+        async with scheduler.slot(priority, session):
+            started = time.monotonic()
+            response, node = await send_to_upstream(client, {**payload, "messages": messages})
+            # A client error is the request's fault; a server error counts against the node
+            upstream_pool.finish(node, response.status_code < 500, time.monotonic() - started,
+                                 status_code=response.status_code)
+        if response.status_code != 200:
+            logger.error(f"LM Studio returned {response.status_code} in tool round {round_number + 1}")
+            raise UpstreamError(response.status_code, response.text)
+        completion = response.json()
+        
+        message = completion["choices"][0]["message"]
+        tool_calls = message.get("tool_calls") or []
+        if not tool_calls or round_number == max_rounds:
+            return completion
+        
+        logger.info(f"Tool round {round_number + 1}: running {len(tool_calls)} tool call(s)")
+        messages.append({
+            "role": "assistant",
+            "content": message.get("content"),
+            "tool_calls": tool_calls
+        })
+        messages.extend(await asyncio.gather(*(execute_tool_call(call) for call in tool_calls)))
+    
+    return completion
+
+def record_upstream_status(status_code: int):
+    """Count an upstream response by status class"""
+    metrics.UPSTREAM_REQUESTS.inc(status=f"{status_code // 100}xx")
 
-async def check_lmstudio():
-    """Check if LM Studio is running and responding"""
+@asynccontextmanager
+async def track_upstream():
+    """Count transport failures (connection refused, timeouts) talking to LM Studio"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:4891/v1/models")
-            if response.status_code == 200:
-                return True
-            return False
-    except:
-        return False
+        yield
+    except httpx.HTTPError:
+        metrics.UPSTREAM_REQUESTS.inc(status="error")
+        raise
+
+def record_generation(mode: str, usage: Optional[dict], token_events: int, duration: Optional[float] = None):
+    """
+    Record token counts and generation speed for a finished completion.
+    
+    Args:
+        mode (str): "stream" or "json"
+        usage (dict, optional): Upstream usage block
+        token_events (int): Streamed chunks carrying tokens, used when there is no usage block
+        duration (float, optional): Seconds spent generating after the first token. Non-streaming
+            responses have no first token to time from (their latency includes queueing and prompt
+            processing), so they pass None and only count tokens
+    """
+    completion_tokens = token_events
+    if usage:
+        completion_tokens = usage.get("completion_tokens", token_events)
+        metrics.COMPLETION_TOKENS.inc(usage.get("prompt_tokens", 0), kind="prompt")
+        metrics.COMPLETION_TOKENS.inc(completion_tokens, kind="completion")
+    if completion_tokens and duration:
+        metrics.COMPLETION_TOKENS_PER_SECOND.observe(completion_tokens / duration, mode=mode)
+
+def event_has_token(event: dict) -> bool:
+    """Whether a streamed chunk carries generated content"""
+    return any(
+        (choice.get("delta") or {}).get("content") or (choice.get("delta") or {}).get("tool_calls")
+        for choice in event.get("choices", [])
+    )
 
-async def stream_response(response: httpx.Response) -> AsyncGenerator[bytes, None]:
-    """Stream the response from LM Studio"""
-    async for chunk in response.aiter_bytes():
-        yield chunk
+class UpstreamError(Exception):
+    """LM Studio answered with an error status"""
+    
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"LM Studio returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+# Statuses after which a request is tried again on another upstream
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """The upstream's numeric Retry-After header, if it sent one"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+async def send_to_upstream(client: httpx.AsyncClient, body: dict,
+                           stream: bool = False) -> Tuple[httpx.Response, Upstream]:
+    """
+    Send a completion to the least-loaded upstream serving the requested model.
+    
+    Connection failures and overload or server error statuses are retried on
+    another node, up to `routing.retries` times. Only the response headers have
+    been received at that point, so a stream is never retried after any of it
+    was relayed.
+    
+    Args:
+        client (httpx.AsyncClient): Shared upstream client
+        body (dict): Completion request to forward
+        stream (bool): Open the response as a stream
+        
+    Returns:
+        tuple: (response, node). The node counts the request as outstanding
+            until the caller passes it to `upstream_pool.finish`
+        
+    Raises:
+        NoUpstreamAvailable: If no node can take the request
+        UpstreamError: If the last node tried answered with a retryable error status
+        httpx.TransportError: If the last node tried could not be reached
+    """
+    headers = {
+        'Accept': 'text/event-stream' if stream else 'application/json',
+        'Cache-Control': 'no-cache'
+    }
+    tried = set()
+    last_error = None
+    for _ in range(upstream_pool.retries + 1):
+        try:
+            node = upstream_pool.choose(body.get("model"), exclude=tried)
+        except NoUpstreamAvailable:
+            if last_error is None:
+                raise
+            break
+        tried.add(node.name)
+        
+        upstream_pool.start(node)
+        started = time.monotonic()
+        try:
+            async with track_upstream():
+                response = await client.send(
+                    client.build_request("POST", node.completions_url, json=body, headers=headers),
+                    stream=stream
+                )
+        except httpx.TransportError as e:
+            upstream_pool.finish(node, False, time.monotonic() - started)
+            logger.warning(f"Upstream {node.name} failed: {e!r}")
+            last_error = e
+            continue
+        except BaseException:
+            upstream_pool.finish(node, None)
+            raise
+        record_upstream_status(response.status_code)
+        
+        if response.status_code not in RETRYABLE_STATUSES:
+            return response, node
+        
+        error_body = await response.aread()
+        await response.aclose()
+        upstream_pool.finish(
+            node, False, time.monotonic() - started,
+            status_code=response.status_code, retry_after=retry_after_seconds(response)
+        )
+        logger.warning(f"Upstream {node.name} returned {response.status_code}")
+        last_error = UpstreamError(response.status_code, error_body.decode('utf-8', errors='replace'))
+    
+    raise last_error
+
+def store_in_cache(key: Optional[str]) -> Optional[Callable[[dict], Awaitable]]:
+    """Return a callback that caches a finished completion under `key`, if caching applies"""
+    if key is None or response_cache is None:
+        return None
+    
+    async def store(completion: dict):
+        await response_cache.put(key, completion)
+    return store
+
+async def fetch_completion(client: httpx.AsyncClient, body: dict, priority: str, session: str,
+                           key: Optional[str] = None) -> dict:
+    """Forward a non-streaming completion once admitted, caching the answer when `key` is given"""
+    async with scheduler.slot(priority, session):
+        started = time.monotonic()
+        response, node = await send_to_upstream(client, body)
+        upstream_pool.finish(node, True, time.monotonic() - started)
+    completion = response.json()
+    if response.status_code == 200:
+        record_generation("json", completion.get("usage"), 0)
+    store = store_in_cache(key)
+    if store is not None and response.status_code == 200 and completion.get("choices"):
+        await store(completion)
+    return completion
+
+async def send_stream_request(client: httpx.AsyncClient, body: dict) -> Tuple[httpx.Response, Upstream]:
+    """
+    Open a streaming completion upstream.
+    
+    Returns:
+        tuple: (response, node), the node still counting the stream as outstanding
+        
+    Raises:
+        UpstreamError: If LM Studio rejects the request
+    """
+    response, node = await send_to_upstream(client, body, stream=True)
+    
+    if response.status_code != 200:
+        error_body = await response.aread()
+        await response.aclose()
+        upstream_pool.finish(node, True)
+        logger.error(f"LM Studio returned {response.status_code} for streaming request")
+        raise UpstreamError(response.status_code, error_body.decode('utf-8', errors='replace'))
+    return response, node
+
+async def open_completion_stream(client: httpx.AsyncClient, body: dict, priority: str, session: str,
+                                 on_complete: Optional[Callable[[dict], Awaitable]] = None):
+    """
+    Wait for an upstream slot and open a streaming completion.
+    
+    The slot stays held until the stream has been fully relayed or torn down.
+    
+    Returns:
+        tuple: (chunk iterator, cleanup coroutine function for when the response ends)
+    """
+    admission = await scheduler.acquire(priority, session)
+    sent_at = time.monotonic()
+    try:
+        response, node = await send_stream_request(client, body)
+    except BaseException:
+        admission.release()
+        raise
+    latency = time.monotonic() - sent_at
+    
+    released = False
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            upstream_pool.finish(node, True, latency)
+            admission.release()
+    
+    async def cleanup():
+        await response.aclose()
+        release()
+    
+    chunks = stream_response(response, sent_at, on_complete=on_complete, on_close=release)
+    return chunks, cleanup
+
+async def stream_response(
+    response: httpx.Response,
+    sent_at: float,
+    on_complete: Optional[Callable[[dict], Awaitable]] = None,
+    on_close: Optional[Callable[[], None]] = None
+) -> AsyncGenerator[bytes, None]:
+    """
+    Forward SSE chunks from LM Studio as they arrive.
+    
+    The next chunk is only read from upstream once the previous one has been
+    handed to the client, so a slow reader holds back LM Studio through TCP flow
+    control instead of piling chunks up in memory. The upstream response is
+    closed as soon as the downstream stream ends, however it ends; if the client
+    disconnected, closing the connection aborts the generation in LM Studio.
+    
+    Args:
+        response (httpx.Response): Upstream response opened with stream=True
+        sent_at (float): time.monotonic() when the upstream request was sent, for TTFT
+        on_complete (Callable, optional): Awaited with the reassembled completion
+            once the stream has finished normally
+        on_close (Callable, optional): Called once the upstream response is closed
+    """
+    started = time.monotonic()
+    chunks = 0
+    completed = False
+    # Parsing the events also yields time-to-first-token and generation speed
+    accumulator = CompletionAccumulator()
+    first_token_at = None
+    token_events = 0
+    try:
+        async for chunk in response.aiter_bytes():
+            chunks += 1
+            for event in accumulator.feed(chunk):
+                if event_has_token(event):
+                    token_events += 1
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                        metrics.COMPLETION_TTFT.observe(first_token_at - sent_at)
+            yield chunk
+        completed = True
+    finally:
+        with CancelScope(shield=True):
+            await response.aclose()
+        if on_close is not None:
+            on_close()
+        if not completed:
+            logger.info(
+                f"Client disconnected, aborted upstream stream after {chunks} chunks "
+                f"and {time.monotonic() - started:.2f}s and released its capacity"
+            )
+    
+    if completed and first_token_at is not None:
+        record_generation("stream", accumulator.usage, token_events, time.monotonic() - first_token_at)
+    if completed and on_complete is not None and accumulator.is_complete:
+        await on_complete(accumulator.to_completion())
+
+def record_traffic(request: Request, started: float, status_code: int, **response_meta):
+    """Hand one finished request to the traffic recorder, if recording is enabled"""
+    if traffic_recorder is None:
+        return
+    headers = {
+        name: request.headers[name]
+        for name in ('X-Session-ID', 'X-Priority')
+        if name in request.headers
+    }
+    entry = {
+        "ts": request.state.received_at,
+        "method": request.method,
+        "path": request.url.path,
+        "client": request.client.host if request.client else None,
+        "headers": headers,
+        "status": status_code,
+        "duration": round(time.monotonic() - started, 4),
+        **{name: value for name, value in response_meta.items() if value is not None}
+    }
+    traffic_recorder.record(entry, getattr(request.state, "raw_body", None))
+
+def record_completion(request: Request, started: float, status_code: int, **response_meta):
+    metrics.COMPLETIONS_IN_FLIGHT.dec()
+    labels = {"mode": request.state.completion_mode, "status": str(status_code)}
+    metrics.COMPLETION_REQUESTS.inc(**labels)
+    metrics.COMPLETION_LATENCY.observe(time.monotonic() - started, **labels)
+    record_traffic(request, started, status_code, mode=request.state.completion_mode, **response_meta)
+
+async def track_stream(chunks: AsyncGenerator[bytes, None], request: Request, started: float):
+    """Relay a streaming response body, recording the request once the stream ends"""
+    status_code = CLIENT_CLOSED_REQUEST
+    first_chunk_at = None
+    sent_bytes = 0
+    try:
+        async for chunk in chunks:
+            if first_chunk_at is None:
+                first_chunk_at = time.monotonic()
+            sent_bytes += len(chunk)
+            yield chunk
+        status_code = 200
+    finally:
+        record_completion(
+            request, started, status_code,
+            ttfb=round(first_chunk_at - started, 4) if first_chunk_at is not None else None,
+            bytes=sent_bytes
+        )
 
 @app.post("/v1/chat/completions")
 async def proxy_completion(request: Request):
+    """Handle a chat completion, recording request count, latency and in-flight metrics"""
+    started = time.monotonic()
+    request.state.completion_mode = "json"
+    request.state.received_at = time.time()
+    metrics.COMPLETIONS_IN_FLIGHT.inc()
+    if traffic_recorder is not None:
+        # Cached by Starlette, so handle_completion's request.json() does not read it again
+        request.state.raw_body = await request.body()
+    try:
+        response = await handle_completion(request)
+    except HTTPException as e:
+        record_completion(request, started, e.status_code)
+        raise
+    except BaseException:
+        record_completion(request, started, 500)
+        raise
+    
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = track_stream(response.body_iterator, request, started)
+    else:
+        usage = response.get("usage") if isinstance(response, dict) else None
+        cache_header = response.headers.get("X-Cache") if isinstance(response, Response) else None
+        record_completion(
+            request, started, getattr(response, "status_code", 200), usage=usage, cache=cache_header
+        )
+    return response
+
+async def handle_completion(request: Request):
     try:
         body = await request.json()
-        logger.info(f"Received request body: {json.dumps(body, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received request body: {json.dumps(body, separators=(',', ':'))}")
         
         # Check if streaming is requested
         is_streaming = body.get('stream', False)
         
-        # For other requests, forward to LM Studio
-        async with httpx.AsyncClient() as client:
-            # Ensure we're passing stream=true to LM Studio when requested
-            if is_streaming:
-                body['stream'] = True  # Explicitly set stream to True
-                
-            response = await client.post(
-                LMSTUDIO_URL, 
-                json=body,
-                timeout=30.0,
-                headers={
-                    'Accept': 'text/event-stream' if is_streaming else 'application/json',
-                    'Cache-Control': 'no-cache',
-                    'Connection': 'keep-alive' if is_streaming else 'close'
-                }
+        client = request.app.state.upstream
+        
+        # Opt-in server-side tool execution: run the whole tool loop in one round trip
+        server_tools = body.pop('server_tools', False)
+        max_tool_rounds = body.pop('max_tool_rounds', DEFAULT_MAX_TOOL_ROUNDS)
+        cache_opt_in = body.pop('cache', None)
+        
+        # Fit long histories to the model's prompt budget ("compact": true/false overrides the config)
+        if body.pop('compact', COMPACTION_CONFIG.get("enabled", False)) and body.get('messages'):
+            body['messages'] = compactor.compact(body)
+        
+        # Scheduling: interactive chats are served before batch/agent traffic, sessions take turns
+        priority = body.pop('priority', None) or request.headers.get('X-Priority')
+        session = (
+            request.headers.get('X-Session-ID')
+            or body.get('user')
+            or (request.client.host if request.client else 'default')
+        )
+        
+        if server_tools:
+            request.state.completion_mode = "tools"
+            completion = await run_until_disconnect(
+                request,
+                run_tool_loop(client, body, max_tool_rounds, priority, session),
+                "server-side tool loop"
             )
-            
-            # If streaming is requested, return a streaming response
             if is_streaming:
                 return StreamingResponse(
-                    stream_response(response),
-                    media_type='text/event-stream'
+                    completion_to_sse(completion),
+                    media_type='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'}
                 )
+            return completion
+        
+        # Repeatable requests are served from the response cache and share in-flight upstream calls
+        key = cache_key(body) if is_cacheable(body, cache_opt_in) else None
+        if key and response_cache is not None:
+            cached = await response_cache.get(key)
+            if cached is not None:
+                logger.info("Serving completion from response cache")
+                request.state.completion_mode = "cache"
+                if is_streaming:
+                    return StreamingResponse(
+                        completion_to_sse(cached),
+                        media_type='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Cache': 'HIT'}
+                    )
+                return JSONResponse(content=cached, headers={'X-Cache': 'HIT'})
+        
+        # For other requests, forward to LM Studio over the shared connection pool
+        
+        # If streaming is requested, open the upstream stream and relay it as it is generated
+        if is_streaming:
+            request.state.completion_mode = "stream"
+            body['stream'] = True  # Explicitly set stream to True
+            stream_headers = {
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
             
-            # Otherwise return JSON response
-            return response.json()
+            if key:
+                def open_shared_stream():
+                    return open_completion_stream(
+                        client, body, priority, session, on_complete=store_in_cache(key)
+                    )
+                
+                subscription = await run_until_disconnect(
+                    request,
+                    stream_flights.open(key, open_shared_stream),
+                    "queued streaming completion"
+                )
+                # Closing the subscription lets the shared stream stop once nobody reads it
+                return StreamingResponse(
+                    subscription,
+                    media_type='text/event-stream',
+                    headers=stream_headers,
+                    background=BackgroundTask(subscription.aclose)
+                )
             
+            chunks, cleanup = await run_until_disconnect(
+                request,
+                open_completion_stream(client, body, priority, session),
+                "queued streaming completion"
+            )
+            return StreamingResponse(
+                chunks,
+                media_type='text/event-stream',
+                headers=stream_headers,
+                background=BackgroundTask(cleanup)
+            )
+        
+        if key:
+            work = completion_flights.do(
+                key, lambda: fetch_completion(client, body, priority, session, key)
+            )
+        else:
+            work = fetch_completion(client, body, priority, session)
+        
+        # Otherwise return JSON response
+        return await run_until_disconnect(request, work, "upstream completion")
+            
+    except UpstreamError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": e.detail})
+    except QueueFullError as e:
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e)},
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except (QueueTimeoutError, NoUpstreamAvailable) as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         logger.exception("Error in proxy_completion")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get('/health')
 async def health_check():
+    """Proxy and upstream health from the background checks; never contacts LM Studio"""
     try:
-        lmstudio_connected = await check_lmstudio()
+        snapshot = upstream_pool.health_snapshot()
         return {
             "status": "healthy",
-            "lmstudio_connected": lmstudio_connected
+            "lmstudio_connected": snapshot["connected"],
+            "checked": snapshot["checked"],
+            "age": snapshot["age"],
+            "stale": snapshot["stale"],
+            "last_latency": snapshot["last_latency"],
+            "upstreams": snapshot["upstreams"],
+            "queue": scheduler.stats(),
+            "tool_processes": process_pool.stats() if process_pool is not None else None,
+            "worker": {"pid": os.getpid(), "workers": WORKERS}
         }
     except Exception as e:
         logger.exception("Error in health check")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get('/v1/models')
+async def list_models():
+    """Models reported by the healthy upstreams at their last background check"""
+    snapshot = upstream_pool.health_snapshot()
+    return {
+        "object": "list",
+        "data": upstream_pool.models_snapshot(),
+        "age": snapshot["age"],
+        "stale": snapshot["stale"],
+        "last_latency": snapshot["last_latency"]
+    }
+
+@app.get('/metrics')
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    queue = scheduler.stats()
+    metrics.QUEUE_DEPTH.set(queue["queued"])
+    metrics.UPSTREAM_ACTIVE.set(queue["active"])
+    for node in upstream_pool.stats():
+        metrics.UPSTREAM_OUTSTANDING.set(node["outstanding"], upstream=node["name"])
+        metrics.UPSTREAM_HEALTHY.set(int(bool(node["healthy"]) and not node["ejected_for"]), upstream=node["name"])
+    if response_cache is not None:
+        cache = response_cache.stats()
+        metrics.CACHE_HITS.set(cache["hits"])
+        metrics.CACHE_MISSES.set(cache["misses"])
+        metrics.CACHE_BYTES.set(cache["bytes"])
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get('/v1/queue')
+async def queue_status():
+    """Current upstream queue depth, concurrency and recent wait times"""
+    return scheduler.stats()
+
+async def run_batch_call(index: int, call: dict) -> dict:
+    """Run one call of a batch, returning its NDJSON result line"""
+    function_name = call.get("name")
+    line = {"index": index, "name": function_name}
+    if "id" in call:
+        line["id"] = call["id"]
+    started = time.monotonic()
+    try:
+        if function_name not in TOOL_HANDLERS:
+            raise ValueError(f"Function {function_name} not found")
+        line["result"] = await run_tool(function_name, call.get("params") or {})
+        line["ok"] = True
+    except Exception as e:
+        line["ok"] = False
+        line["error"] = str(e)
+        line["error_type"] = type(e).__name__
+        if isinstance(e, ToolValidationError):
+            line["errors"] = e.errors
+    line["duration"] = round(time.monotonic() - started, 4)
+    return line
+
+async def stream_batch_results(calls: list) -> AsyncGenerator[bytes, None]:
+    """
+    Run a batch of tool calls concurrently and yield each result as soon as it finishes.
+    
+    Per-tool concurrency limits and timeouts still apply through run_tool. If the
+    client goes away, the calls that have not finished are cancelled.
+    """
+    tasks = [asyncio.ensure_future(run_batch_call(index, call)) for index, call in enumerate(calls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            yield (json.dumps(line, default=str) + "\n").encode("utf-8")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def get_job_or_404(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.post("/v1/jobs")
+async def submit_job(request: Request):
+    """
+    Run a tool call in the background.
+    
+    The body is {"name": tool, "params": {...}}. Answers 202 with the job ID;
+    poll GET /v1/jobs/{id}, subscribe to /v1/jobs/{id}/events or cancel with DELETE.
+    """
+    body = await request.json()
+    function_name = body.get("name")
+    if function_name not in TOOL_HANDLERS:
+        raise HTTPException(status_code=404, detail=f"Function {function_name} not found")
+    params = body.get("params") or {}
+    try:
+        validate_tool_params(function_name, params)
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    try:
+        job = await job_manager.submit(function_name, params)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JSONResponse(
+        status_code=202,
+        content={
+            "id": job.id,
+            "status": job.status,
+            "url": f"/v1/jobs/{job.id}",
+            "events_url": f"/v1/jobs/{job.id}/events"
+        }
+    )
+
+@app.get("/v1/jobs")
+async def list_jobs():
+    return {"jobs": await job_manager.summaries()}
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress and timings of a job, with its result once it has succeeded"""
+    return (await get_job_or_404(job_id)).to_dict()
+
+@app.get("/v1/jobs/{job_id}/partial")
+async def get_job_partial(job_id: str, offset: int = 0):
+    """Partial results reported so far (pages, files, ...), starting at `offset`"""
+    job = await get_job_or_404(job_id)
+    partial = await job_manager.partials(job)
+    return {
+        "id": job.id,
+        "status": job.status,
+        "offset": offset,
+        "total": len(partial),
+        "items": partial[offset:]
+    }
+
+@app.get("/v1/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: `status` and `progress` events as they happen,
+    then a final `done` event carrying the job (and its result). Reconnecting
+    clients resume after the `Last-Event-ID` they received.
+    """
+    job = await get_job_or_404(job_id)
+    try:
+        after = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        # Not an id this endpoint sent: replay every event from the start
+        after = -1
+    
+    async def stream():
+        async for event in job_manager.events(job, after):
+            yield format_sse(event, event=event["event"], event_id=event["seq"])
+        yield format_sse(job.to_dict(), event="done")
+    
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.delete("/v1/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; finished jobs are returned unchanged"""
+    await get_job_or_404(job_id)
+    return (await job_manager.cancel(job_id)).to_dict(include_result=False)
+
+# Declared before /v1/functions/{function_name} so "batch" is not taken for a tool name
+@app.post("/v1/functions/batch")
+async def execute_function_batch(request: Request):
+    """
+    Run many tool calls in one request, streaming results back as NDJSON.
+    
+    The body is a list of {"name", "params", "id" (optional)} calls, or an object
+    with that list under "calls". Every output line carries the call's index, id,
+    name, ok flag, result or error, and duration in seconds, in completion order.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    calls = body.get("calls") if isinstance(body, dict) else body
+    if not isinstance(calls, list) or not all(isinstance(call, dict) and call.get("name") for call in calls):
+        raise HTTPException(status_code=400, detail='Expected a list of {"name", "params"} calls')
+    if len(calls) > MAX_BATCH_CALLS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_CALLS} calls per batch")
+    
+    logger.info(f"Executing batch of {len(calls)} function call(s)")
+    return StreamingResponse(
+        stream_batch_results(calls),
+        media_type='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.post("/v1/functions/{function_name}/stream")
+async def stream_function(function_name: str, request: Request):
+    """
+    Run a tool's streaming variant, sending its pieces back as NDJSON as they are produced.
+    
+    Takes the same parameters as the tool (for read_file: {"file_path", ...range
+    parameters}) and yields one line per piece ({"offset", "content"} for
+    read_file), then a {"done": true, "pieces": n} line, or an {"error"} line
+    if the tool fails part way through.
+    """
+    if function_name not in TOOL_STREAMERS:
+        raise HTTPException(status_code=404, detail=f"Function {function_name} has no streaming mode")
+    try:
+        params = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    try:
+        validate_tool_params(function_name, params)
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    
+    logger.info(f"Streaming function {function_name} with params: {params}")
+    pieces = tool_executor.stream(function_name, params)
+    # Fetch the first piece before answering, so a missing file or bad range gets an error status
+    try:
+        first = [await pieces.__anext__()]
+    except StopAsyncIteration:
+        first = []
+    except FileNotFoundError as e:
+        metrics.TOOL_REQUESTS.inc(tool=function_name, outcome="error")
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        metrics.TOOL_REQUESTS.inc(tool=function_name, outcome="error")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        metrics.TOOL_REQUESTS.inc(tool=function_name, outcome="error")
+        logger.error(f"Error in stream_function: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def lines() -> AsyncGenerator[bytes, None]:
+        count = 0
+        outcome = "error"
+        try:
+            for piece in first:
+                count += 1
+                yield (json.dumps(piece, default=str) + "\n").encode("utf-8")
+            async for piece in pieces:
+                count += 1
+                yield (json.dumps(piece, default=str) + "\n").encode("utf-8")
+            outcome = "ok"
+            yield (json.dumps({"done": True, "pieces": count}) + "\n").encode("utf-8")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming {function_name}: {str(e)}")
+            yield (json.dumps({"error": str(e), "pieces": count}) + "\n").encode("utf-8")
+        finally:
+            await pieces.aclose()
+            metrics.TOOL_REQUESTS.inc(tool=function_name, outcome=outcome)
+    
+    return StreamingResponse(
+        lines(),
+        media_type='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.post("/v1/functions/{function_name}")
 async def execute_function(function_name: str, request: Request):
+    """Run a tool directly, recording the call when traffic recording is enabled"""
+    started = time.monotonic()
+    request.state.received_at = time.time()
+    if traffic_recorder is not None:
+        request.state.raw_body = await request.body()
+    status_code = 500
+    try:
+        response = await handle_function(function_name, request)
+        status_code = getattr(response, "status_code", 200)
+        return response
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    finally:
+        record_traffic(request, started, status_code)
+
+async def handle_function(function_name: str, request: Request):
     try:
         if function_name in TOOL_HANDLERS:
             params = await request.json()
             logger.info(f"Executing function {function_name} with params: {params}")
-            result = TOOL_HANDLERS[function_name](params)
+            # Await the handler so a disconnect can be noticed while it works. Async handlers
+            # are cancelled; a sync handler's thread cannot be interrupted, so its result is discarded.
+            result = await run_until_disconnect(
+                request,
+                run_tool(function_name, params),
+                f"tool {function_name}"
+            )
             return {"result": result}
         return {"error": f"Function {function_name} not found"}
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except ToolValidationError as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=422, detail=e.errors)
+    except ToolTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error in execute_function: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
-    print("Starting proxy server on port 4892...")
+    from Backend.server import main
+    print("Starting proxy server...")
     print("Tools available:", list(TOOL_HANDLERS.keys()))
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=4892) 
\ No newline at end of file
+    # Several workers import the app by name; a single worker serves this module's app
+    main(app=app)
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""Minimal Prometheus text-format metrics for the proxy"""
+import math
+import threading
+from typing import Dict, Iterable, Tuple
+
+# Seconds; covers fast cache hits up to long local generations
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: Tuple, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.lock = threading.Lock()
+
+    def header(self) -> list:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = self.header()
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple = LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.series: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = self.header()
+        with self.lock:
+            for key, series in self.series.items():
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._add(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._add(Gauge(name, description))
+
+    def histogram(self, name: str, description: str, buckets: Tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, description, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+COMPLETION_REQUESTS = registry.counter(
+    "feanor_completion_requests_total",
+    "Chat completion requests by mode (json/stream/tools/cache) and response status"
+)
+COMPLETION_LATENCY = registry.histogram(
+    "feanor_completion_duration_seconds",
+    "End-to-end chat completion latency as seen by the proxy"
+)
+COMPLETION_TTFT = registry.histogram(
+    "feanor_completion_time_to_first_token_seconds",
+    "Time from upstream request to the first streamed content token"
+)
+COMPLETION_TOKENS_PER_SECOND = registry.histogram(
+    "feanor_completion_tokens_per_second",
+    "Generation speed of streamed completions after the first token, from usage blocks or streamed chunks",
+    TOKENS_PER_SECOND_BUCKETS
+)
+COMPLETION_TOKENS = registry.counter(
+    "feanor_completion_tokens_total",
+    "Prompt and completion tokens reported by upstream usage blocks"
+)
+COMPLETIONS_IN_FLIGHT = registry.gauge(
+    "feanor_completions_in_flight",
+    "Chat completion requests currently being handled"
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "feanor_upstream_requests_total",
+    "Requests sent to the model server by HTTP status class (or 'error' for transport failures)"
+)
+TOOL_REQUESTS = registry.counter(
+    "feanor_tool_requests_total",
+    "Tool executions by tool and outcome"
+)
+TOOL_LATENCY = registry.histogram(
+    "feanor_tool_duration_seconds",
+    "Tool execution latency by tool"
+)
+TOOLS_IN_FLIGHT = registry.gauge(
+    "feanor_tools_in_flight",
+    "Tool executions currently running, by tool"
+)
+QUEUE_WAIT = registry.histogram(
+    "feanor_queue_wait_seconds",
+    "Time requests waited in the admission queue for an upstream slot"
+)
+QUEUE_DEPTH = registry.gauge(
+    "feanor_queue_depth",
+    "Requests waiting for an upstream slot"
+)
+UPSTREAM_ACTIVE = registry.gauge(
+    "feanor_upstream_active",
+    "Upstream calls currently holding a slot"
+)
+UPSTREAM_OUTSTANDING = registry.gauge(
+    "feanor_upstream_outstanding",
+    "Requests outstanding on each upstream model server"
+)
+UPSTREAM_HEALTHY = registry.gauge(
+    "feanor_upstream_healthy",
+    "1 if an upstream passes health checks and is not ejected, else 0"
+)
+CACHE_HITS = registry.gauge(
+    "feanor_response_cache_hits",
+    "Response cache hits since startup"
+)
+CACHE_MISSES = registry.gauge(
+    "feanor_response_cache_misses",
+    "Response cache misses since startup"
+)
+CACHE_BYTES = registry.gauge(
+    "feanor_response_cache_bytes",
+    "Bytes held in the in-memory response cache"
+)
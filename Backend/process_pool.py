@@ -0,0 +1,390 @@
+"""
+Isolated worker processes for CPU-heavy or untrusted tool calls.
+
+The parent side (`ProcessToolPool`) keeps a set of prewarmed workers, each a
+`python -m Backend.process_pool <handlers module>` subprocess that imports the
+tool modules once at spawn. Calls and results travel as length-prefixed
+pickles over the worker's stdin/stdout pipes. Every call runs under its own
+CPU-time and data-size limits (where the `resource` module exists), and
+workers are replaced after `max_calls` calls, after running out of memory,
+or when a call is cancelled or times out.
+"""
+import asyncio
+import contextlib
+import importlib
+import inspect
+import logging
+import os
+import pickle
+import signal
+import struct
+import subprocess
+import sys
+import threading
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no per-call limits, isolation only
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_HEADER = struct.Struct("!I")
+
+# Longest wait between attempts to replace a worker that failed to start
+SPAWN_RETRY_MAX_DELAY = 30
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process died during a call (e.g. it hit its CPU limit)"""
+
+class ToolProcessError(Exception):
+    """An exception raised by the tool inside the worker process"""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+def _write_frame(stream, message):
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+def _read_frame(stream):
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("Worker pipe closed")
+    (length,) = _HEADER.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise EOFError("Worker pipe closed")
+    return pickle.loads(payload)
+
+class _Worker:
+    """Parent-side handle on one worker process"""
+
+    def __init__(self, handlers_module: str):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "Backend.process_pool", handlers_module],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=os.getcwd(),
+            env=env
+        )
+        self.calls = 0
+        # The worker announces itself once its tool modules are imported
+        message = _read_frame(self.process.stdout)
+        if message[0] != "ready":
+            raise WorkerCrashedError(f"Worker failed to start: {message}")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def call(self, request: dict, on_progress: Optional[Callable[..., None]]) -> Any:
+        """Send one call and block until its result (run on a helper thread)"""
+        self.calls += 1
+        try:
+            _write_frame(self.process.stdin, request)
+            while True:
+                message = _read_frame(self.process.stdout)
+                if message[0] == "progress":
+                    if on_progress is not None:
+                        on_progress(**message[1])
+                elif message[0] == "result":
+                    return message[1]
+                else:
+                    raise ToolProcessError(message[1], message[2])
+        except (EOFError, BrokenPipeError, OSError):
+            self.process.wait()
+            if self.process.returncode == -getattr(signal, "SIGXCPU", 0):
+                reason = f"exceeded its {request['cpu_seconds']}s CPU time limit"
+            else:
+                reason = f"exited with code {self.process.returncode}"
+            raise WorkerCrashedError(f"Worker process running {request['name']} {reason}")
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        """Ask the worker to exit once idle"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+class ProcessToolPool:
+    """
+    Prewarmed pool of tool worker processes.
+
+    Args:
+        handlers_module (str): Module exposing TOOL_HANDLERS, imported by every worker
+        size (int): Number of worker processes kept ready
+        max_calls (int): Calls a worker serves before it is replaced
+        cpu_seconds (float): Default CPU-time limit per call
+        memory_mb (int): Default memory limit per call (heap and anonymous mappings;
+            memory-mapped input files do not count)
+        progress_callback (Callable, optional): Called in the parent with each
+            `report_progress` update a tool sends from its worker; if it raises,
+            the call is abandoned and its worker killed
+    """
+
+    def __init__(self, handlers_module: str = "Tools.tool_handlers", size: int = 2, max_calls: int = 50,
+                 cpu_seconds: float = 60, memory_mb: int = 1024,
+                 progress_callback: Optional[Callable[..., None]] = None):
+        self.handlers_module = handlers_module
+        self.size = size
+        self.max_calls = max_calls
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.progress_callback = progress_callback
+        self.idle: Optional[asyncio.Queue] = None
+        self.workers = set()
+        self.respawns = set()  # background tasks replacing retired workers
+        self.spawn_error: Optional[str] = None  # why the last replacement failed, until one succeeds
+        self.closed = False
+        self.spawned = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.spawn_failures = 0
+
+    async def start(self):
+        """Spawn and prewarm every worker"""
+        self.idle = asyncio.Queue()
+        await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+        logger.info(f"Started {self.size} tool worker processes")
+
+    async def _spawn(self):
+        worker = await asyncio.to_thread(_Worker, self.handlers_module)
+        if self.closed:
+            worker.kill()
+            return
+        self.workers.add(worker)
+        self.spawned += 1
+        self.idle.put_nowait(worker)
+
+    async def _respawn(self):
+        """Replace a retired worker, retrying with backoff until a spawn succeeds"""
+        attempt = 0
+        while not self.closed:
+            try:
+                await self._spawn()
+                self.spawn_error = None
+                return
+            except Exception as e:
+                self.spawn_failures += 1
+                self.spawn_error = f"{type(e).__name__}: {str(e)}"
+                delay = min(2 ** attempt, SPAWN_RETRY_MAX_DELAY)
+                logger.error(f"Could not start a tool worker process ({self.spawn_error}), retrying in {delay}s")
+                if not self.workers:
+                    # Wake callers waiting for a worker so they fail now instead of at their timeout
+                    self.idle.put_nowait(None)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def _retire(self, worker: _Worker, kill: bool = False):
+        """Stop a worker and start its replacement in the background"""
+        self.workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            threading.Thread(target=worker.close, daemon=True).start()
+        task = asyncio.get_running_loop().create_task(self._respawn())
+        self.respawns.add(task)
+        task.add_done_callback(self.respawns.discard)
+
+    async def _acquire(self) -> _Worker:
+        """
+        Wait for an idle worker.
+
+        Raises:
+            WorkerCrashedError: If no worker is running and replacements keep failing
+        """
+        while True:
+            if not self.workers and self.spawn_error is not None:
+                raise WorkerCrashedError(f"No tool worker processes are running: {self.spawn_error}")
+            worker = await self.idle.get()
+            if worker is not None:
+                return worker
+            if not self.workers and self.spawn_error is not None:
+                # Pass the wake-up on to the next waiting caller
+                self.idle.put_nowait(None)
+
+    async def run(self, name: str, params: dict, cpu_seconds: float = None, memory_mb: int = None) -> Any:
+        """
+        Run a tool call in a worker process.
+
+        Args:
+            name (str): Tool name in the workers' TOOL_HANDLERS
+            params (dict): Parameters for the handler (must be picklable)
+            cpu_seconds (float, optional): CPU-time limit for this call
+            memory_mb (int, optional): Memory limit for this call
+
+        Returns:
+            Any: The handler's result
+
+        Raises:
+            ToolProcessError: If the handler raised
+            WorkerCrashedError: If the worker died, e.g. on exceeding its CPU limit, or
+                no worker is running because replacements cannot be started
+        """
+        worker = await self._acquire()
+        request = {
+            "name": name,
+            "params": params,
+            "cpu_seconds": cpu_seconds or self.cpu_seconds,
+            "memory_bytes": int((memory_mb or self.memory_mb) * 1024 * 1024)
+        }
+        # to_thread carries the caller's context, so progress reaches the caller's reporter
+        call = asyncio.ensure_future(asyncio.to_thread(worker.call, request, self.progress_callback))
+        try:
+            result = await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # Timed out or abandoned: killing the worker stops the tool for real. The
+            # helper thread then fails with WorkerCrashedError, which nobody awaits.
+            call.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._retire(worker, kill=True)
+            raise
+        except WorkerCrashedError:
+            self.crashed += 1
+            self._retire(worker, kill=True)
+            raise
+        except ToolProcessError as e:
+            if e.error_type == "MemoryError" or not worker.alive:
+                self._retire(worker, kill=True)
+            else:
+                self._release(worker)
+            raise
+        except BaseException:
+            # The progress callback refused the call (e.g. its job was cancelled)
+            self._retire(worker, kill=True)
+            raise
+
+        self._release(worker)
+        return result
+
+    def _release(self, worker: _Worker):
+        if worker.calls >= self.max_calls:
+            self.recycled += 1
+            self._retire(worker)
+        else:
+            self.idle.put_nowait(worker)
+
+    def shutdown(self):
+        self.closed = True
+        for task in list(self.respawns):
+            task.cancel()
+        for worker in list(self.workers):
+            worker.kill()
+        self.workers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": sum(1 for worker in self.workers if worker.alive),
+            "idle": self.idle.qsize() if self.idle is not None else 0,
+            "spawned": self.spawned,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "spawn_failures": self.spawn_failures,
+            "spawn_error": self.spawn_error
+        }
+
+def _apply_limits(cpu_seconds: float, memory_bytes: int):
+    """
+    Limit the next call to `cpu_seconds` more CPU time and `memory_bytes` of data.
+
+    RLIMIT_DATA (heap and private anonymous mappings) is used rather than
+    RLIMIT_AS: tools memory-map whole input files, and file-backed pages count
+    towards the address space but not towards the data size.
+    """
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    cpu_soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    if cpu_hard != resource.RLIM_INFINITY:
+        cpu_soft = min(cpu_soft, cpu_hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+
+    _, data_hard = resource.getrlimit(resource.RLIMIT_DATA)
+    if data_hard != resource.RLIM_INFINITY:
+        memory_bytes = min(memory_bytes, data_hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, data_hard))
+
+def _clear_limits():
+    if resource is None:
+        return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_DATA):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+async def _run_coroutine(coroutine, registry):
+    """Await a coroutine handler, then close what helpers opened on this call's event loop"""
+    try:
+        return await coroutine
+    finally:
+        if registry is not None:
+            await registry.close_helpers()
+
+def worker_main(handlers_module: str):
+    """Worker process loop: import the tools once, then serve calls until stdin closes"""
+    # Keep the real stdout for the protocol; anything the tools print goes to stderr
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    protocol_in = sys.stdin.buffer
+
+    handlers = importlib.import_module(handlers_module).TOOL_HANDLERS
+    package = handlers_module.rsplit(".", 1)[0]
+    try:
+        progress = importlib.import_module(package + ".progress")
+    except ImportError:
+        progress = None
+    try:
+        registry = importlib.import_module(package + ".registry")
+    except ImportError:
+        registry = None
+    if registry is not None:
+        # Prewarm: import the tools' heavy dependencies now rather than on the first call
+        registry.preload()
+
+    def send_progress(update: dict):
+        _write_frame(protocol_out, ("progress", update))
+
+    _write_frame(protocol_out, ("ready", os.getpid()))
+    while True:
+        try:
+            request = _read_frame(protocol_in)
+        except EOFError:
+            return
+
+        try:
+            _apply_limits(request["cpu_seconds"], request["memory_bytes"])
+            handler = handlers[request["name"]]
+            reporting = progress.progress_reporter(send_progress) if progress else contextlib.nullcontext()
+            with reporting:
+                result = handler(request["params"])
+                if inspect.iscoroutine(result):
+                    result = asyncio.run(_run_coroutine(result, registry))
+            _clear_limits()
+            _write_frame(protocol_out, ("result", result))
+        except BaseException as e:
+            _clear_limits()
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            try:
+                _write_frame(protocol_out, ("error", type(e).__name__, str(e)))
+            except Exception:
+                return
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1] if len(sys.argv) > 1 else "Tools.tool_handlers")
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Request fields that change what the model returns; everything else
+# (stream, user, proxy-only options) is ignored when building the key
+CACHE_KEY_FIELDS = (
+    "model", "messages", "tools", "tool_choice", "functions", "function_call",
+    "temperature", "top_p", "top_k", "min_p", "max_tokens", "stop", "seed",
+    "presence_penalty", "frequency_penalty", "repeat_penalty", "response_format", "n"
+)
+
+def cache_key(body: dict) -> str:
+    """Hash a canonicalized completion request into a cache key"""
+    canonical = {field: body[field] for field in CACHE_KEY_FIELDS if field in body}
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def is_deterministic(body: dict) -> bool:
+    """Whether the sampling settings make the completion reproducible"""
+    return body.get("temperature") == 0 or body.get("top_k") == 1
+
+def is_cacheable(body: dict, opt_in: Optional[bool]) -> bool:
+    """
+    Decide whether a completion may be served from / stored in the cache.
+
+    Args:
+        body (dict): Completion request
+        opt_in (Optional[bool]): The request's `cache` field; True forces caching,
+            False disables it, None caches only deterministic requests
+    """
+    if opt_in is not None:
+        return bool(opt_in)
+    return is_deterministic(body)
+
+class ResponseCache:
+    """
+    Byte-bounded LRU cache of completed chat completions with a TTL.
+
+    Entries live in memory first; when `disk_path` is set they are also
+    written to a SQLite file so they survive restarts and memory evictions,
+    and are shared by all worker processes in multi-worker mode.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, disk_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, payload)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        self.disk_lock = threading.Lock()
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False)
+            # WAL lets the proxy's worker processes share the file without blocking readers
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute("PRAGMA busy_timeout=5000")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+            )
+            self.disk.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.disk.commit()
+
+    def _remember(self, key: str, expires_at: float, payload: bytes):
+        """Insert into the memory tier, evicting least recently used entries"""
+        if len(payload) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.current_bytes -= len(self.entries.pop(key)[1])
+        while self.entries and self.current_bytes + len(payload) > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.current_bytes -= len(evicted)
+        self.entries[key] = (expires_at, payload)
+        self.current_bytes += len(payload)
+
+    def _forget(self, key: str):
+        expires_at, payload = self.entries.pop(key)
+        self.current_bytes -= len(payload)
+
+    def _disk_get(self, key: str):
+        with self.disk_lock:
+            return self.disk.execute(
+                "SELECT expires_at, payload FROM responses WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+
+    def _disk_put(self, key: str, expires_at: float, payload: bytes):
+        with self.disk_lock:
+            self.disk.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, payload) VALUES (?, ?, ?)",
+                (key, expires_at, payload)
+            )
+            self.disk.commit()
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return the cached completion for `key`, or None"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at >= time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+            self._forget(key)
+
+        if self.disk is not None:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                expires_at, payload = row
+                self._remember(key, expires_at, payload)
+                self.hits += 1
+                return json.loads(payload)
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, completion: dict):
+        """Store a finished completion under `key`"""
+        expires_at = time.time() + self.ttl
+        payload = json.dumps(completion, separators=(',', ':')).encode('utf-8')
+        self._remember(key, expires_at, payload)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self._disk_put, key, expires_at, payload)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write response cache entry to disk: {str(e)}")
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
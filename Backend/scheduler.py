@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "batch": 1
+}
+
+class QueueFullError(Exception):
+    """Raised when a request cannot even be queued"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Upstream queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class QueueTimeoutError(Exception):
+    """Raised when a queued request waited longer than the configured maximum"""
+
+    def __init__(self, waited: float, retry_after: int):
+        super().__init__(f"Request waited {waited:.1f}s for an upstream slot")
+        self.retry_after = retry_after
+
+class Admission:
+    """A granted upstream slot; release it exactly once when the upstream call is done"""
+
+    def __init__(self, scheduler: "AdmissionScheduler"):
+        self.scheduler = scheduler
+        self.started = time.monotonic()
+        self.released = False
+        # Lease on a slot shared with the other worker processes, if any
+        self.lease = None
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            if self.lease is not None:
+                self.scheduler._release_shared(self.lease)
+            self.scheduler._release(time.monotonic() - self.started)
+
+class AdmissionScheduler:
+    """
+    Bounded, prioritized queue in front of the upstream model server.
+
+    At most `max_concurrency` upstream calls run at once. Others wait in a
+    queue of at most `max_queue` entries: higher priority classes are always
+    served first, and within a class sessions take turns (round robin) so one
+    busy client cannot starve the others. A full queue is rejected straight
+    away with an estimated Retry-After instead of letting requests time out.
+
+    When the proxy runs several worker processes, `shared_slots` (a
+    SharedSlots semaphore) keeps the total across workers under its limit:
+    a request admitted here still takes a shared slot before it proceeds.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait: float = None,
+                 default_priority: str = "interactive", wait_observer=None, shared_slots=None):
+        self.max_concurrency = max_concurrency
+        self.shared_slots = shared_slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.default_priority = default_priority
+        # Optional callable receiving each admitted request's queue wait in seconds
+        self.wait_observer = wait_observer
+
+        self.active = 0
+        self.waiting = 0
+        # priority -> session -> waiters, in the order sessions take turns
+        self.queues = {priority: OrderedDict() for priority in PRIORITY_CLASSES.values()}
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.recent_waits = deque(maxlen=100)
+        self.recent_service_times = deque(maxlen=100)
+
+    def priority_of(self, name: str) -> int:
+        """Map a priority class name to its queue, falling back to the default class"""
+        return PRIORITY_CLASSES.get(name, PRIORITY_CLASSES[self.default_priority])
+
+    def retry_after(self) -> int:
+        """Estimate how many seconds until a new request could be served"""
+        average_service = (
+            sum(self.recent_service_times) / len(self.recent_service_times)
+            if self.recent_service_times else 1.0
+        )
+        return max(1, math.ceil(average_service * (self.waiting + 1) / self.max_concurrency))
+
+    async def acquire(self, priority: str = None, session: str = "default") -> Admission:
+        """
+        Wait for an upstream slot.
+
+        Args:
+            priority (str): Priority class name ("interactive" or "batch")
+            session (str): Client session, used to share capacity fairly
+
+        Returns:
+            Admission: The granted slot
+
+        Raises:
+            QueueFullError: If the queue is already full
+            QueueTimeoutError: If no slot became free within `max_wait` seconds
+        """
+        queued_at = time.monotonic()
+        admission = await self._acquire_local(priority, session)
+        if self.shared_slots is None:
+            return admission
+
+        remaining = None if self.max_wait is None else max(0.0, self.max_wait - (time.monotonic() - queued_at))
+        try:
+            admission.lease = await self.shared_slots.acquire(timeout=remaining)
+        except asyncio.TimeoutError:
+            admission.release()
+            self.timed_out += 1
+            raise QueueTimeoutError(time.monotonic() - queued_at, self.retry_after())
+        except BaseException:
+            admission.release()
+            raise
+        return admission
+
+    async def _acquire_local(self, priority: str, session: str) -> Admission:
+        """Wait for one of this process's `max_concurrency` slots"""
+        if self.active < self.max_concurrency and self.waiting == 0:
+            return self._admit(0.0)
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        queue = self.queues[self.priority_of(priority or self.default_priority)]
+        waiter = asyncio.get_running_loop().create_future()
+        queue.setdefault(session, deque()).append(waiter)
+        self.waiting += 1
+        queued_at = time.monotonic()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we gave up; hand it back
+                self._release(0.0)
+            else:
+                waiter.cancel()
+                self._remove(queue, session, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise QueueTimeoutError(time.monotonic() - queued_at, self.retry_after())
+            raise
+
+        self._record_wait(time.monotonic() - queued_at)
+        return Admission(self)
+
+    @asynccontextmanager
+    async def slot(self, priority: str = None, session: str = "default"):
+        """Hold an upstream slot for the duration of the block"""
+        admission = await self.acquire(priority, session)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    def _admit(self, waited: float) -> Admission:
+        self.active += 1
+        self.admitted += 1
+        self._record_wait(waited)
+        return Admission(self)
+
+    def _record_wait(self, waited: float):
+        self.recent_waits.append(waited)
+        if self.wait_observer is not None:
+            self.wait_observer(waited)
+
+    def _remove(self, queue: OrderedDict, session: str, waiter: asyncio.Future):
+        waiters = queue.get(session)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.waiting -= 1
+            if not waiters:
+                del queue[session]
+
+    def _release_shared(self, lease: str):
+        """Give back a shared slot on a worker thread, so a busy database never stalls the loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.shared_slots.release(lease)
+            return
+        released = loop.run_in_executor(None, self.shared_slots.release, lease)
+        released.add_done_callback(self._log_shared_release)
+
+    @staticmethod
+    def _log_shared_release(released: asyncio.Future):
+        if not released.cancelled() and released.exception() is not None:
+            # The lease row stays until its process exits and another worker reclaims it
+            logger.error(f"Could not release a shared upstream slot: {str(released.exception())}")
+
+    def _release(self, service_time: float):
+        self.active -= 1
+        if service_time:
+            self.recent_service_times.append(service_time)
+
+        # Hand the slot to the next waiter: best priority class, next session in turn
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue:
+                session, waiters = queue.popitem(last=False)
+                waiter = waiters.popleft()
+                self.waiting -= 1
+                if waiters:
+                    queue[session] = waiters
+                if not waiter.done():
+                    self.active += 1
+                    self.admitted += 1
+                    waiter.set_result(None)
+                    return
+
+    def stats(self) -> dict:
+        """Queue depth, concurrency and wait times for monitoring"""
+        stats = {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.waiting,
+            "max_queue": self.max_queue,
+            "queued_by_priority": {
+                name: sum(len(waiters) for waiters in self.queues[priority].values())
+                for name, priority in PRIORITY_CLASSES.items()
+            },
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "average_wait": (
+                sum(self.recent_waits) / len(self.recent_waits) if self.recent_waits else 0.0
+            ),
+            "max_recent_wait": max(self.recent_waits, default=0.0)
+        }
+        if self.shared_slots is not None:
+            stats["shared_active"] = self.shared_slots.held()
+        return stats
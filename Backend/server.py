@@ -0,0 +1,104 @@
+"""
+Launcher for the proxy: one or more uvicorn worker processes listening on TCP
+and, optionally, on a Unix domain socket for clients on the same machine.
+
+    python -m Backend.server --workers 4 --uds /tmp/feanor-proxy.sock
+
+Defaults come from the `server` section of proxy_config.json. With more than
+one worker, the workers share the response cache, job store and upstream
+concurrency limit through the SQLite database at `server.state_path`.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List, Optional, Union
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = "Backend.lmstudio_proxy:app"
+
+# Read by the proxy module in every worker, so they agree on multi-worker mode
+WORKERS_ENV = "FEANOR_PROXY_WORKERS"
+
+logger = logging.getLogger(__name__)
+
+def load_server_config() -> dict:
+    """The `server` section of the proxy config (FEANOR_PROXY_CONFIG or Backend/proxy_config.json)"""
+    path = os.environ.get('FEANOR_PROXY_CONFIG', os.path.join(PROJECT_ROOT, 'Backend', 'proxy_config.json'))
+    with open(path, 'r') as f:
+        return json.load(f).get("server", {})
+
+def bind_sockets(config: uvicorn.Config, host: Optional[str], port: int, uds: Optional[str]) -> list:
+    """Bind the TCP listener (unless `host` is None) and the Unix socket (if `uds` is set)"""
+    sockets = []
+    if host is not None:
+        sockets.append(uvicorn.Config(config.app, host=host, port=port).bind_socket())
+    if uds:
+        if os.path.exists(uds):
+            # Left behind by a previous run that did not shut down cleanly
+            os.unlink(uds)
+        sockets.append(uvicorn.Config(config.app, uds=uds).bind_socket())
+        # Only the user running the proxy (and its Electron or PyQt clients) may connect
+        os.chmod(uds, 0o600)
+    return sockets
+
+def serve(app: Union[str, object] = APP_PATH, host: Optional[str] = "0.0.0.0", port: int = 4892,
+          workers: int = 1, uds: Optional[str] = None, log_level: str = "info"):
+    """
+    Run the proxy.
+
+    Args:
+        app (str | ASGI app): Import string of the app; an app object is only
+            accepted with a single worker
+        host (str, optional): TCP host to listen on; None for Unix socket only
+        port (int): TCP port
+        workers (int): Worker processes; each one imports the app
+        uds (str, optional): Path of a Unix domain socket to listen on as well
+        log_level (str): uvicorn log level
+    """
+    if host is None and not uds:
+        raise ValueError("Nothing to listen on: give a host or a Unix socket path")
+    if workers > 1 and not isinstance(app, str):
+        app = APP_PATH
+    os.environ[WORKERS_ENV] = str(workers)
+
+    config = uvicorn.Config(app, workers=workers, log_level=log_level)
+    sockets = bind_sockets(config, host, port, uds)
+    server = uvicorn.Server(config)
+    try:
+        if workers > 1:
+            Multiprocess(config, target=server.run, sockets=sockets).run()
+        else:
+            server.run(sockets=sockets)
+    finally:
+        for sock in sockets:
+            sock.close()
+        if uds and os.path.exists(uds):
+            os.unlink(uds)
+
+def main(argv: List[str] = None, app: Union[str, object] = APP_PATH):
+    server_config = load_server_config()
+    parser = argparse.ArgumentParser(description="Run the Feanor LM Studio proxy")
+    parser.add_argument("--host", default=server_config.get("host", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=server_config.get("port", 4892))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get(WORKERS_ENV, server_config.get("workers", 1))))
+    parser.add_argument("--uds", default=server_config.get("unix_socket"),
+                        help="Also listen on this Unix domain socket")
+    parser.add_argument("--no-tcp", action="store_true", help="Listen on the Unix socket only")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.uds and not hasattr(os, "fork"):
+        # Windows has no AF_UNIX support in asyncio's server
+        print("Unix sockets are not supported on this platform, ignoring --uds", file=sys.stderr)
+        args.uds = None
+    serve(app, None if args.no_tcp else args.host, args.port, args.workers, args.uds, args.log_level)
+
+if __name__ == "__main__":
+    sys.path.insert(0, PROJECT_ROOT)
+    main()
@@ -0,0 +1,272 @@
+"""
+State shared by the proxy's worker processes when it runs with several workers.
+
+Everything lives in one SQLite database in WAL mode, so readers never block
+the writer and every worker sees the others' changes straight away:
+
+- `SharedSlots`: a cross-process counting semaphore that keeps the total
+  number of upstream calls under the scheduler's `max_concurrency`
+- `SharedJobStore`: job status, progress, events and partial results, so any
+  worker can answer for (and cancel) a job another worker is running
+
+The response cache shares its SQLite tier through the same file. Rows held by
+a worker process that has died (slot leases, running jobs) are detected by
+checking whether its PID is still alive.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the shared database in autocommit mode with WAL journaling"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    return db
+
+def pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class SharedSlots:
+    """
+    Counting semaphore shared by every worker process.
+
+    Each held slot is a lease row; acquiring inserts one inside an IMMEDIATE
+    transaction when fewer than `limit` exist. Leases of dead processes are
+    reclaimed on the next acquire.
+    """
+
+    def __init__(self, path: str, limit: int, name: str = "upstream", poll_interval: float = 0.02,
+                 max_poll_interval: float = 0.25):
+        self.db = connect(path)
+        self.lock = threading.Lock()
+        self.limit = limit
+        self.name = name
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS slot_leases "
+            "(token TEXT PRIMARY KEY, name TEXT NOT NULL, pid INTEGER NOT NULL, acquired REAL NOT NULL)"
+        )
+
+    def try_acquire(self) -> Optional[str]:
+        """Take a slot if one is free, returning its lease token"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                pids = [pid for (pid,) in self.db.execute(
+                    "SELECT DISTINCT pid FROM slot_leases WHERE name = ?", (self.name,)
+                )]
+                for pid in pids:
+                    if not pid_alive(pid):
+                        self.db.execute("DELETE FROM slot_leases WHERE pid = ?", (pid,))
+                (held,) = self.db.execute(
+                    "SELECT COUNT(*) FROM slot_leases WHERE name = ?", (self.name,)
+                ).fetchone()
+                token = None
+                if held < self.limit:
+                    token = uuid.uuid4().hex
+                    self.db.execute(
+                        "INSERT INTO slot_leases (token, name, pid, acquired) VALUES (?, ?, ?, ?)",
+                        (token, self.name, os.getpid(), time.time())
+                    )
+                self.db.execute("COMMIT")
+                return token
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    async def acquire(self, timeout: float = None) -> str:
+        """
+        Wait for a slot, polling with backoff.
+
+        Raises:
+            asyncio.TimeoutError: If no slot was freed within `timeout` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = self.poll_interval
+        while True:
+            token = await asyncio.to_thread(self.try_acquire)
+            if token is not None:
+                return token
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def release(self, token: str):
+        with self.lock:
+            self.db.execute("DELETE FROM slot_leases WHERE token = ?", (token,))
+
+    def held(self) -> int:
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM slot_leases WHERE name = ?", (self.name,)
+            ).fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+class SharedJobStore:
+    """
+    Job records shared between worker processes.
+
+    The worker running a job writes its snapshot (the job's `to_dict`), every
+    event and every partial result; other workers read them to answer status,
+    partial and event requests, and flag cancellations for the owner to act on.
+    """
+
+    def __init__(self, path: str):
+        self.db = connect(path)
+        self.lock = threading.Lock()
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "  id TEXT PRIMARY KEY, owner_pid INTEGER NOT NULL, status TEXT NOT NULL,"
+            "  created REAL NOT NULL, data TEXT NOT NULL, cancel_requested INTEGER NOT NULL DEFAULT 0,"
+            "  expires_at REAL);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "  job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, seq));"
+            "CREATE TABLE IF NOT EXISTS job_partials ("
+            "  job_id TEXT NOT NULL, seq INTEGER NOT NULL, item TEXT NOT NULL, PRIMARY KEY (job_id, seq));"
+        )
+
+    def _write(self, statements: list):
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                for sql, args in statements:
+                    self.db.execute(sql, args)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def save(self, snapshot: dict, expires_at: float = None, event: dict = None, partials: list = None,
+             first_partial: int = 0):
+        """
+        Write a job's snapshot, with a new event and new partial results, in one transaction.
+
+        Args:
+            snapshot (dict): The job's `to_dict()`, result included
+            expires_at (float, optional): Wall-clock time the finished job may be forgotten
+            event (dict, optional): Event to append (carries its own "seq")
+            partials (list, optional): Partial results not written yet
+            first_partial (int): Index of the first item of `partials`
+        """
+        statements = [(
+            "INSERT INTO jobs (id, owner_pid, status, created, data, expires_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, data = excluded.data, "
+            "expires_at = excluded.expires_at",
+            (snapshot["id"], os.getpid(), snapshot["status"], snapshot["created"],
+             json.dumps(snapshot, default=str), expires_at)
+        )]
+        if event is not None:
+            statements.append((
+                "INSERT OR REPLACE INTO job_events (job_id, seq, data) VALUES (?, ?, ?)",
+                (snapshot["id"], event["seq"], json.dumps(event, default=str))
+            ))
+        for offset, item in enumerate(partials or []):
+            statements.append((
+                "INSERT OR REPLACE INTO job_partials (job_id, seq, item) VALUES (?, ?, ?)",
+                (snapshot["id"], first_partial + offset, json.dumps(item, default=str))
+            ))
+        self._write(statements)
+
+    def load(self, job_id: str) -> Optional[dict]:
+        """
+        A job's snapshot, or None if it is unknown or expired.
+
+        A job left queued or running by a worker that has since died is
+        reported as failed.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT owner_pid, data, cancel_requested FROM jobs "
+                "WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        owner_pid, data, cancel_requested = row
+        snapshot = json.loads(data)
+        if snapshot["status"] in ("queued", "running") and not pid_alive(owner_pid):
+            snapshot["status"] = "failed"
+            snapshot["error"] = f"Worker process {owner_pid} exited while running the job"
+        snapshot["cancel_requested"] = bool(cancel_requested)
+        return snapshot
+
+    def list(self) -> List[dict]:
+        with self.lock:
+            ids = [job_id for (job_id,) in self.db.execute(
+                "SELECT id FROM jobs WHERE expires_at IS NULL OR expires_at > ? ORDER BY created",
+                (time.time(),)
+            )]
+        return [snapshot for snapshot in map(self.load, ids) if snapshot is not None]
+
+    def active_count(self) -> int:
+        """Jobs queued or running on any live worker"""
+        with self.lock:
+            owners = self.db.execute(
+                "SELECT owner_pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+        return sum(1 for (pid,) in owners if pid_alive(pid))
+
+    def events_after(self, job_id: str, seq: int) -> List[dict]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def partials(self, job_id: str) -> list:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT item FROM job_partials WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+        return [json.loads(item) for (item,) in rows]
+
+    def request_cancel(self, job_id: str):
+        self._write([("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))])
+
+    def cancel_requests(self) -> List[str]:
+        """Unfinished jobs of this process that another worker asked to cancel"""
+        with self.lock:
+            return [job_id for (job_id,) in self.db.execute(
+                "SELECT id FROM jobs WHERE owner_pid = ? AND cancel_requested = 1 "
+                "AND status IN ('queued', 'running')",
+                (os.getpid(),)
+            )]
+
+    def purge(self):
+        """Delete expired jobs with their events and partial results"""
+        with self.lock:
+            expired = [job_id for (job_id,) in self.db.execute(
+                "SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )]
+        if expired:
+            statements = []
+            for job_id in expired:
+                for table, column in (("jobs", "id"), ("job_events", "job_id"), ("job_partials", "job_id")):
+                    statements.append((f"DELETE FROM {table} WHERE {column} = ?", (job_id,)))
+            self._write(statements)
+
+    def close(self):
+        self.db.close()
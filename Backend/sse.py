@@ -0,0 +1,177 @@
+"""Helpers for OpenAI-style server-sent event (SSE) streams"""
+import json
+import time
+from typing import Iterator, Union
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+def format_sse(data: Union[dict, str], event: str = None, event_id: int = None) -> bytes:
+    """Encode one SSE `data:` event, optionally named and numbered"""
+    if not isinstance(data, str):
+        data = json.dumps(data, separators=(',', ':'), default=str)
+    header = ""
+    if event is not None:
+        header += f"event: {event}\n"
+    if event_id is not None:
+        header += f"id: {event_id}\n"
+    return f"{header}data: {data}\n\n".encode('utf-8')
+
+def completion_to_sse(completion: dict) -> Iterator[bytes]:
+    """
+    Re-emit a finished chat completion as a `chat.completion.chunk` stream.
+    
+    Used when the proxy already holds the full answer (for example after a
+    server-side tool loop) but the client asked for a streaming response.
+    
+    Args:
+        completion (dict): A non-streaming chat completion response
+        
+    Yields:
+        bytes: SSE events, terminated by `data: [DONE]`
+    """
+    base = {
+        "id": completion.get("id") or f"chatcmpl-{int(time.time() * 1000)}",
+        "object": "chat.completion.chunk",
+        "created": completion.get("created") or int(time.time()),
+        "model": completion.get("model") or ""
+    }
+    
+    for choice in completion.get("choices", []):
+        index = choice.get("index", 0)
+        message = choice.get("message", {})
+        
+        delta = {"role": message.get("role", "assistant")}
+        if message.get("content"):
+            delta["content"] = message["content"]
+        if message.get("tool_calls"):
+            delta["tool_calls"] = [
+                {**call, "index": position}
+                for position, call in enumerate(message["tool_calls"])
+            ]
+        yield format_sse({**base, "choices": [{"index": index, "delta": delta, "finish_reason": None}]})
+        
+        final_chunk = {
+            **base,
+            "choices": [{"index": index, "delta": {}, "finish_reason": choice.get("finish_reason", "stop")}]
+        }
+        if "usage" in completion:
+            final_chunk["usage"] = completion["usage"]
+        yield format_sse(final_chunk)
+    
+    yield SSE_DONE
+
+class CompletionAccumulator:
+    """
+    Rebuilds a chat completion from the raw bytes of a streamed one.
+    
+    Chunks are fed in as they are relayed to the client; once the stream has
+    finished, `to_completion()` returns the equivalent non-streaming response.
+    """
+    
+    def __init__(self):
+        self._buffer = b""
+        self.id = None
+        self.model = None
+        self.created = None
+        self.usage = None
+        self.done = False
+        self.choices = {}
+    
+    def feed(self, chunk: bytes) -> list:
+        """
+        Consume raw stream bytes.
+        
+        Args:
+            chunk (bytes): Bytes as received from upstream, split anywhere
+            
+        Returns:
+            list: The JSON events completed by this chunk
+        """
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        
+        events = []
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                self.done = True
+                continue
+            try:
+                event = json.loads(data)
+            except ValueError:
+                continue
+            self._apply(event)
+            events.append(event)
+        return events
+    
+    def _apply(self, event: dict):
+        self.id = event.get("id", self.id)
+        self.model = event.get("model", self.model)
+        self.created = event.get("created", self.created)
+        if event.get("usage"):
+            self.usage = event["usage"]
+        
+        for choice in event.get("choices", []):
+            state = self.choices.setdefault(choice.get("index", 0), {
+                "role": "assistant",
+                "content": [],
+                "tool_calls": {},
+                "finish_reason": None
+            })
+            delta = choice.get("delta") or {}
+            if delta.get("role"):
+                state["role"] = delta["role"]
+            if delta.get("content"):
+                state["content"].append(delta["content"])
+            for call_delta in delta.get("tool_calls") or []:
+                call = state["tool_calls"].setdefault(call_delta.get("index", 0), {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if call_delta.get("id"):
+                    call["id"] = call_delta["id"]
+                function = call_delta.get("function") or {}
+                if function.get("name"):
+                    call["function"]["name"] = function["name"]
+                if function.get("arguments"):
+                    call["function"]["arguments"] += function["arguments"]
+            if choice.get("finish_reason"):
+                state["finish_reason"] = choice["finish_reason"]
+    
+    @property
+    def is_complete(self) -> bool:
+        """Whether the stream ended normally (so the result is safe to reuse)"""
+        return bool(self.choices) and all(
+            state["finish_reason"] for state in self.choices.values()
+        )
+    
+    def to_completion(self) -> dict:
+        """Return the accumulated stream as a `chat.completion` response"""
+        choices = []
+        for index, state in sorted(self.choices.items()):
+            message = {
+                "role": state["role"],
+                "content": "".join(state["content"]) or None
+            }
+            if state["tool_calls"]:
+                message["tool_calls"] = [call for _, call in sorted(state["tool_calls"].items())]
+            choices.append({
+                "index": index,
+                "message": message,
+                "finish_reason": state["finish_reason"]
+            })
+        
+        completion = {
+            "id": self.id,
+            "object": "chat.completion",
+            "created": self.created,
+            "model": self.model,
+            "choices": choices
+        }
+        if self.usage:
+            completion["usage"] = self.usage
+        return completion
@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class ToolTimeoutError(Exception):
+    """Raised when a tool does not finish within its configured timeout"""
+
+class ToolExecutor:
+    """
+    Runs tool handlers without blocking the proxy event loop.
+
+    Handlers may be plain functions or coroutine functions. Coroutines are
+    awaited directly; plain functions run on a bounded thread pool. Tools with
+    "isolation": "process" run in a worker process from `process_pool` instead,
+    under per-call CPU and memory limits. Every tool gets its own concurrency
+    limit and timeout from the `execution` section of tools_config.json:
+
+        "execution": {
+            "max_workers": 8,
+            "defaults": {"max_concurrency": 4, "timeout": 120},
+            "tools": {"analyze_repo": {"max_concurrency": 1, "timeout": 300}}
+        }
+    """
+
+    def __init__(self, handlers: Dict[str, Callable], execution_config: dict = None, process_pool=None,
+                 streamers: Dict[str, Callable] = None):
+        execution_config = execution_config or {}
+        self.handlers = handlers
+        self.streamers = streamers or {}
+        self.process_pool = process_pool
+        self.defaults = execution_config.get("defaults", {})
+        self.tool_settings = execution_config.get("tools", {})
+        self.executor = ThreadPoolExecutor(
+            max_workers=execution_config.get("max_workers", 8),
+            thread_name_prefix="tool"
+        )
+        self.semaphores = {
+            name: asyncio.Semaphore(self.settings_for(name)["max_concurrency"])
+            for name in handlers
+        }
+
+    def settings_for(self, function_name: str) -> dict:
+        """Return the effective concurrency limit, timeout, coalescing flag and isolation for a tool"""
+        settings = {"max_concurrency": 4, "timeout": 120, "coalesce": True, "isolation": "thread", **self.defaults}
+        settings.update(self.tool_settings.get(function_name, {}))
+        return settings
+
+    async def run(self, function_name: str, params: dict, timeout: float = None) -> Any:
+        """
+        Run a tool handler under its concurrency limit and timeout.
+
+        Args:
+            function_name (str): Name of the registered tool
+            params (dict): Parameters passed to the handler
+            timeout (float, optional): Overrides the tool's configured timeout
+
+        Returns:
+            Any: Whatever the handler returns
+
+        Raises:
+            ToolTimeoutError: If the handler runs longer than its timeout
+        """
+        handler = self.handlers[function_name]
+        settings = self.settings_for(function_name)
+        timeout = timeout or settings["timeout"]
+
+        async with self.semaphores[function_name]:
+            if settings["isolation"] == "process" and self.process_pool is not None:
+                # A timed-out call's worker process is killed, so the tool really stops
+                work = self.process_pool.run(
+                    function_name, params,
+                    cpu_seconds=settings.get("cpu_seconds"),
+                    memory_mb=settings.get("memory_mb")
+                )
+            elif inspect.iscoroutinefunction(handler):
+                work = handler(params)
+            else:
+                # Carry the caller's context variables into the worker thread
+                context = contextvars.copy_context()
+                work = asyncio.get_running_loop().run_in_executor(
+                    self.executor,
+                    functools.partial(context.run, handler, params)
+                )
+
+            try:
+                return await asyncio.wait_for(work, timeout=timeout)
+            except asyncio.TimeoutError:
+                # A thread cannot be stopped; its eventual result is discarded
+                logger.warning(f"Tool {function_name} timed out after {timeout}s")
+                raise ToolTimeoutError(f"Tool {function_name} timed out after {timeout}s")
+
+    async def stream(self, function_name: str, params: dict) -> AsyncIterator[Any]:
+        """
+        Iterate a tool's streaming variant, fetching each piece on the thread pool.
+
+        The tool's concurrency limit is held until the iteration ends. There is
+        no overall timeout: the client consumes the pieces at its own pace.
+
+        Args:
+            function_name (str): Name of a tool registered with a streaming variant
+            params (dict): Parameters passed to the streamer
+
+        Yields:
+            Any: The pieces, in order
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        finished = object()
+        async with self.semaphores[function_name]:
+            pieces = await loop.run_in_executor(
+                self.executor,
+                functools.partial(context.run, self.streamers[function_name], params)
+            )
+            try:
+                while True:
+                    piece = await loop.run_in_executor(self.executor, next, pieces, finished)
+                    if piece is finished:
+                        return
+                    yield piece
+            finally:
+                close = getattr(pieces, "close", None)
+                if close is not None:
+                    # Releases the generator's file handles and maps
+                    await loop.run_in_executor(self.executor, close)
+
+    def shutdown(self):
+        """Stop accepting work and release the worker threads"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+"""
+Tool parameter validation, compiled once from the tools' JSON schemas.
+
+Every schema is turned into a tree of small checker closures at startup, so
+validating a call is a handful of isinstance checks and dictionary lookups.
+Calls are checked before they are dispatched, which turns hallucinated or
+missing parameter names into a structured error (with a "did you mean"
+suggestion) instead of a failure deep inside a tool after its expensive work
+has started.
+
+Supported keywords: type, properties, required, additionalProperties, items,
+enum, minLength, maxLength, pattern, minimum and maximum. Tools only take the
+parameters they declare, so objects reject unknown properties unless their
+schema sets "additionalProperties".
+"""
+import difflib
+import re
+from typing import Any, Callable, Dict, List
+
+# Checker signature: (value, location, errors) -> None, appending to `errors`
+Checker = Callable[[Any, tuple, list], None]
+
+_TYPES = {
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "null": lambda value: value is None
+}
+
+class ToolValidationError(ValueError):
+    """Raised when a tool call's parameters do not match the tool's schema"""
+
+    def __init__(self, tool: str, errors: List[dict]):
+        details = "; ".join(_describe(error) for error in errors)
+        super().__init__(f"Invalid parameters for {tool}: {details}")
+        self.tool = tool
+        self.errors = errors
+
+def _describe(error: dict) -> str:
+    where = ".".join(str(part) for part in error["loc"]) or "params"
+    text = f"{where}: {error['msg']}"
+    if "suggestion" in error:
+        text += f" (did you mean '{error['suggestion']}'?)"
+    return text
+
+def _error(errors: list, location: tuple, error_type: str, message: str, **extra):
+    errors.append({"loc": list(location), "type": error_type, "msg": message, **extra})
+
+def _closest(name: str, candidates) -> List[str]:
+    candidates = list(candidates)
+    matches = difflib.get_close_matches(name, candidates, n=1, cutoff=0.6)
+    if not matches:
+        # Shortened or prefixed names ("pdf" for "pdf_path", "input_url" for "url")
+        matches = [candidate for candidate in candidates if name in candidate or candidate in name][:1]
+    return matches
+
+def _type_name(value: Any) -> str:
+    for name, matches in _TYPES.items():
+        if matches(value):
+            return name
+    return type(value).__name__
+
+def compile_schema(schema: dict) -> Checker:
+    """
+    Compile one JSON schema into a checker function.
+
+    Args:
+        schema (dict): JSON schema of a value
+
+    Returns:
+        Checker: Appends an error dict to `errors` for every violation it finds
+    """
+    checks: List[Checker] = []
+
+    expected = schema.get("type")
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        matchers = [_TYPES[name] for name in names if name in _TYPES]
+        label = " or ".join(names)
+
+        def check_type(value, location, errors):
+            if not any(matches(value) for matches in matchers):
+                _error(errors, location, "type", f"expected {label}, got {_type_name(value)}")
+                return False
+            return True
+    else:
+        check_type = None
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, location, errors):
+            if value not in allowed:
+                guess = _closest(value, map(str, allowed)) if isinstance(value, str) else []
+                extra = {"suggestion": guess[0]} if guess else {}
+                _error(errors, location, "enum", f"must be one of {allowed}", **extra)
+        checks.append(check_enum)
+
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    if min_length is not None or max_length is not None or pattern is not None:
+        def check_string(value, location, errors):
+            if not isinstance(value, str):
+                return
+            if min_length is not None and len(value) < min_length:
+                _error(errors, location, "too_short", f"must be at least {min_length} character(s)")
+            if max_length is not None and len(value) > max_length:
+                _error(errors, location, "too_long", f"must be at most {max_length} characters")
+            if pattern is not None and not pattern.search(value):
+                _error(errors, location, "pattern", f"must match {pattern.pattern}")
+        checks.append(check_string)
+
+    minimum, maximum = schema.get("minimum"), schema.get("maximum")
+    if minimum is not None or maximum is not None:
+        def check_range(value, location, errors):
+            if not _TYPES["number"](value):
+                return
+            if minimum is not None and value < minimum:
+                _error(errors, location, "minimum", f"must be >= {minimum}")
+            if maximum is not None and value > maximum:
+                _error(errors, location, "maximum", f"must be <= {maximum}")
+        checks.append(check_range)
+
+    if "items" in schema:
+        check_item = compile_schema(schema["items"])
+
+        def check_items(value, location, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    check_item(item, location + (index,), errors)
+        checks.append(check_items)
+
+    if "properties" in schema or "required" in schema or expected == "object":
+        checks.append(_compile_object(schema))
+
+    def check(value, location, errors):
+        if check_type is not None and not check_type(value, location, errors):
+            return
+        for run_check in checks:
+            run_check(value, location, errors)
+    return check
+
+def _compile_object(schema: dict) -> Checker:
+    properties = {name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    required = list(schema.get("required", []))
+    additional = schema.get("additionalProperties", False)
+    check_additional = compile_schema(additional) if isinstance(additional, dict) else None
+
+    def check_object(value, location, errors):
+        if not isinstance(value, dict):
+            return
+        unknown = [key for key in value if key not in properties]
+        for name in required:
+            if name not in value:
+                # A misspelt or renamed parameter usually shows up as an unknown key
+                guess = _closest(name, unknown)
+                extra = {"got": guess[0]} if guess else {}
+                message = f"missing required parameter '{name}'"
+                if guess:
+                    message += f", got unknown '{guess[0]}' instead"
+                _error(errors, location + (name,), "missing", message, **extra)
+        for name, check_property in properties.items():
+            if name in value:
+                check_property(value[name], location + (name,), errors)
+        for key in unknown:
+            if check_additional is not None:
+                check_additional(value[key], location + (key,), errors)
+            elif additional is not True:
+                guess = _closest(key, properties)
+                extra = {"suggestion": guess[0]} if guess else {}
+                _error(errors, location + (key,), "unexpected",
+                       f"unknown parameter; expected one of {sorted(properties)}", **extra)
+    return check_object
+
+def compile_validators(tool_schemas: List[dict]) -> Dict[str, Callable[[Any], None]]:
+    """
+    Compile the parameter schema of every tool.
+
+    Args:
+        tool_schemas (List[dict]): OpenAI `tools` entries ({"type": "function", "function": {...}})
+
+    Returns:
+        Dict[str, Callable]: Tool name -> validator that raises ToolValidationError
+            for parameters that do not match
+    """
+    validators = {}
+    for entry in tool_schemas:
+        function = entry.get("function", entry)
+        name = function["name"]
+        parameters = function.get("parameters") or {"type": "object", "properties": {}}
+        validators[name] = _make_validator(name, compile_schema({"type": "object", **parameters}))
+    return validators
+
+def _make_validator(name: str, check: Checker) -> Callable[[Any], None]:
+    def validate(params: Any):
+        errors = []
+        check(params, (), errors)
+        if errors:
+            raise ToolValidationError(name, errors)
+    return validate
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueue records untouched so JSON encoding happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line; raw request bodies are parsed here, off the event loop"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(record.msg)
+        raw_body = entry.pop("raw_body", None)
+        if raw_body is not None:
+            try:
+                entry["body"] = json.loads(raw_body)
+            except ValueError:
+                entry["body"] = raw_body.decode("utf-8", errors="replace")
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+class TrafficRecorder:
+    """
+    Opt-in capture of proxy traffic to rotated JSONL files for offline replay.
+
+    `record` only puts the entry on an in-memory queue; a background
+    QueueListener thread encodes it and writes it through a
+    RotatingFileHandler, so request handling never waits on disk or JSON
+    encoding. Each line holds the request (method, path, scheduling headers,
+    body) plus its timing and response metadata.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 include_bodies: bool = True):
+        self.path = path
+        self.include_bodies = include_bodies
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding="utf-8")
+        file_handler.setFormatter(_JsonLinesFormatter())
+
+        self.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.queue, file_handler)
+        self.file_handler = file_handler
+
+        self.logger = logging.getLogger("feanor.traffic")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = _DeferredQueueHandler(self.queue)
+        self.records = 0
+
+    def start(self):
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+        logger.info(f"Recording proxy traffic to {self.path}")
+
+    def stop(self):
+        """Flush queued entries and close the file"""
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        self.file_handler.close()
+
+    def record(self, entry: dict, raw_body: bytes = None):
+        """
+        Queue one traffic entry.
+
+        Args:
+            entry (dict): JSON-serializable request and response metadata
+            raw_body (bytes, optional): The request body as received; decoded on
+                the writer thread unless bodies are excluded by configuration
+        """
+        if raw_body is not None and self.include_bodies:
+            entry["raw_body"] = raw_body
+        self.records += 1
+        self.logger.info(entry)
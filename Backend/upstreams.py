@@ -0,0 +1,310 @@
+import asyncio
+import fnmatch
+import logging
+import math
+import random
+import time
+from typing import List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Upstream answers that mean "this node cannot take the request right now"
+OVERLOADED_STATUSES = {429, 503}
+
+class NoUpstreamAvailable(Exception):
+    """Raised when every upstream that could serve a model is down, ejected or already tried"""
+
+    def __init__(self, model: Optional[str], retry_after: int):
+        super().__init__(f"No upstream available for model {model or '(default)'}")
+        self.retry_after = retry_after
+
+class Upstream:
+    """One OpenAI-compatible model server (LM Studio, llama.cpp server, ...)"""
+
+    def __init__(self, name: str, base_url: str, models: Optional[List[str]] = None,
+                 max_outstanding: Optional[int] = None, weight: float = 1.0):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.completions_url = f"{self.base_url}/v1/chat/completions"
+        self.models_url = f"{self.base_url}/v1/models"
+        # Models this node is configured to serve; None means "whatever it reports"
+        self.configured_models = models
+        self.max_outstanding = max_outstanding
+        self.weight = weight
+
+        self.outstanding = 0
+        # Routable until a health check says otherwise, but not reported healthy before one
+        self.healthy = True
+        self.available_models: Optional[List[str]] = None
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_latency: Optional[float] = None
+        # Last health check: wall-clock time, monotonic time, round trip and /v1/models entries
+        self.last_checked: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_check_latency: Optional[float] = None
+        self.model_entries: List[dict] = []
+
+    def serves(self, model: Optional[str]) -> Optional[bool]:
+        """Whether the node serves `model`; None when it is unknown"""
+        models = self.configured_models if self.configured_models is not None else self.available_models
+        if model is None or models is None:
+            return None
+        return any(fnmatch.fnmatchcase(model, pattern) for pattern in models)
+
+    def is_available(self, now: float) -> bool:
+        if not self.healthy or now < self.ejected_until:
+            return False
+        return self.max_outstanding is None or self.outstanding < self.max_outstanding
+
+    def load(self) -> float:
+        return self.outstanding / self.weight
+
+    def stats(self, now: float) -> dict:
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "healthy": self.healthy if self.checked_at is not None else None,
+            "ejected_for": max(0.0, round(self.ejected_until - now, 1)),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": self.configured_models if self.configured_models is not None else self.available_models,
+            "last_latency": self.last_latency,
+            "last_checked": self.last_checked,
+            "check_age": round(now - self.checked_at, 1) if self.checked_at is not None else None,
+            "last_check_latency": self.last_check_latency
+        }
+
+class UpstreamPool:
+    """
+    A set of model servers behind the proxy.
+
+    Requests are routed by model: an explicit routing table (model name or
+    glob -> node names) wins, otherwise nodes that list or report the model are
+    used, otherwise any node. Among the candidates the one with
+    the fewest outstanding requests (relative to its weight) is picked.
+
+    Nodes that fail `eject_after_failures` times in a row, or answer 429/503,
+    are ejected for `eject_seconds`, doubling on repeated ejections up to
+    `max_eject_seconds`. A background task checks every node's /v1/models
+    every `health_check_interval` seconds (with random jitter, so several
+    proxies do not probe in lockstep) and takes unreachable ones out of
+    rotation until they answer again. Health and model list requests from
+    clients are answered from those results and never reach the model servers.
+    """
+
+    def __init__(self, nodes: List[Upstream], routes: dict = None, retries: int = 1,
+                 eject_after_failures: int = 3, eject_seconds: float = 10.0,
+                 max_eject_seconds: float = 120.0, health_check_interval: float = 10.0,
+                 health_check_timeout: float = 2.0, health_check_jitter: float = 0.2):
+        if not nodes:
+            raise ValueError("At least one upstream is required")
+        self.nodes = {node.name: node for node in nodes}
+        self.routes = routes or {}
+        self.retries = retries
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.health_check_jitter = health_check_jitter
+
+    @classmethod
+    def from_config(cls, proxy_config: dict) -> "UpstreamPool":
+        """
+        Build the pool from the proxy configuration.
+
+        Uses the `upstreams` list when present, otherwise the single
+        `upstream.base_url`, so existing configurations keep working.
+        """
+        entries = proxy_config.get("upstreams") or [
+            {"name": "default", "base_url": proxy_config["upstream"]["base_url"]}
+        ]
+        nodes = [
+            Upstream(
+                name=entry.get("name", entry["base_url"]),
+                base_url=entry["base_url"],
+                models=entry.get("models"),
+                max_outstanding=entry.get("max_outstanding"),
+                weight=entry.get("weight", 1.0)
+            )
+            for entry in entries
+        ]
+        routing = proxy_config.get("routing", {})
+        return cls(
+            nodes,
+            routes=routing.get("routes"),
+            retries=routing.get("retries", 1),
+            eject_after_failures=routing.get("eject_after_failures", 3),
+            eject_seconds=routing.get("eject_seconds", 10.0),
+            max_eject_seconds=routing.get("max_eject_seconds", 120.0),
+            health_check_interval=routing.get("health_check_interval", 10.0),
+            health_check_timeout=routing.get("health_check_timeout", 2.0),
+            health_check_jitter=routing.get("health_check_jitter", 0.2)
+        )
+
+    def candidates(self, model: Optional[str]) -> List[Upstream]:
+        """Nodes allowed to serve `model`, before health and load are considered"""
+        if model is not None:
+            for pattern, names in self.routes.items():
+                if fnmatch.fnmatchcase(model, pattern):
+                    return [self.nodes[name] for name in names if name in self.nodes]
+
+        nodes = list(self.nodes.values())
+        serving = [node for node in nodes if node.serves(model)]
+        # LM Studio answers with its loaded model whatever name is asked for, so an
+        # unlisted model may go to any node
+        return serving or nodes
+
+    def choose(self, model: Optional[str], exclude=()) -> Upstream:
+        """
+        Pick the least-loaded available node for `model`.
+
+        Args:
+            model (str): Requested model name, if any
+            exclude: Names of nodes already tried for this request
+
+        Returns:
+            Upstream: The node to send the request to
+
+        Raises:
+            NoUpstreamAvailable: If no candidate node can take the request
+        """
+        now = time.monotonic()
+        candidates = [node for node in self.candidates(model) if node.name not in exclude]
+        available = [node for node in candidates if node.is_available(now)]
+        if not available:
+            waits = [node.ejected_until - now for node in candidates if node.ejected_until > now]
+            raise NoUpstreamAvailable(model, max(1, math.ceil(min(waits, default=self.eject_seconds))))
+
+        lowest = min(node.load() for node in available)
+        # Random among equally loaded nodes so bursts do not all land on the first one
+        return random.choice([node for node in available if node.load() == lowest])
+
+    def start(self, node: Upstream):
+        """Count a request as outstanding on `node`"""
+        node.outstanding += 1
+        node.requests += 1
+
+    def finish(self, node: Upstream, ok: Optional[bool], latency: Optional[float] = None,
+               status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Record the outcome of a request started with `start`.
+
+        Args:
+            node (Upstream): The node that served the request
+            ok (bool): Whether the node answered usefully; None if the request was
+                abandoned (e.g. the client went away) and says nothing about the node
+            latency (float, optional): Seconds until the node answered
+            status_code (int, optional): Upstream status, used to detect overload
+            retry_after (float, optional): The node's own Retry-After hint
+        """
+        node.outstanding -= 1
+        if latency is not None:
+            node.last_latency = round(latency, 4)
+        if ok is None:
+            return
+        if ok:
+            node.consecutive_failures = 0
+            node.ejections = 0
+            return
+
+        node.failures += 1
+        node.consecutive_failures += 1
+        if time.monotonic() < node.ejected_until:
+            return  # already out of rotation; concurrent failures should not stack ejections
+        if status_code in OVERLOADED_STATUSES:
+            self.eject(node, retry_after, reason=f"overloaded ({status_code})")
+        elif node.consecutive_failures >= self.eject_after_failures:
+            self.eject(node, reason=f"{node.consecutive_failures} consecutive failures")
+
+    def eject(self, node: Upstream, seconds: Optional[float] = None, reason: str = ""):
+        """Take a node out of rotation for a while"""
+        node.ejections += 1
+        if seconds is None:
+            seconds = min(self.eject_seconds * 2 ** (node.ejections - 1), self.max_eject_seconds)
+        node.ejected_until = time.monotonic() + seconds
+        logger.warning(f"Ejecting upstream {node.name} for {seconds:.0f}s: {reason}")
+
+    async def check(self, client: httpx.AsyncClient, node: Upstream) -> bool:
+        """Probe one node's /v1/models, updating its health and model list"""
+        started = time.monotonic()
+        try:
+            response = await client.get(node.models_url, timeout=self.health_check_timeout)
+            healthy = response.status_code == 200
+            if healthy:
+                node.model_entries = response.json().get("data", [])
+                node.available_models = [model["id"] for model in node.model_entries]
+        except (httpx.HTTPError, ValueError):
+            healthy = False
+
+        node.last_checked = time.time()
+        node.checked_at = time.monotonic()
+        node.last_check_latency = round(node.checked_at - started, 4)
+        if healthy != node.healthy:
+            logger.warning(f"Upstream {node.name} is now {'healthy' if healthy else 'unreachable'}")
+        node.healthy = healthy
+        return healthy
+
+    async def check_all(self, client: httpx.AsyncClient) -> bool:
+        """Probe every node concurrently; True if at least one is healthy"""
+        results = await asyncio.gather(*(self.check(client, node) for node in self.nodes.values()))
+        return any(results)
+
+    async def run_health_checks(self, client: httpx.AsyncClient):
+        """Background task: probe every node about every `health_check_interval` seconds"""
+        while True:
+            try:
+                await self.check_all(client)
+            except Exception:
+                logger.exception("Upstream health check failed")
+            jitter = random.uniform(-self.health_check_jitter, self.health_check_jitter)
+            await asyncio.sleep(self.health_check_interval * (1 + jitter))
+
+    def is_stale(self, node: Upstream, now: float) -> bool:
+        """Whether a node's last health check is older than two polling intervals"""
+        if node.checked_at is None:
+            return True
+        max_age = 2 * self.health_check_interval * (1 + self.health_check_jitter) + self.health_check_timeout
+        return now - node.checked_at > max_age
+
+    def health_snapshot(self) -> dict:
+        """
+        Health as of the last background checks, without contacting any node.
+
+        Returns:
+            dict: Whether any node answered its last check (False until one has
+                been checked), how old the oldest check is, whether the results
+                are stale, the last check round trip and per-node state
+        """
+        now = time.monotonic()
+        nodes = list(self.nodes.values())
+        ages = [now - node.checked_at for node in nodes if node.checked_at is not None]
+        latencies = [node.last_check_latency for node in nodes if node.healthy and node.last_check_latency is not None]
+        return {
+            "connected": any(node.healthy and node.checked_at is not None for node in nodes),
+            "checked": len(ages) == len(nodes),
+            "age": round(max(ages), 1) if ages else None,
+            "stale": any(self.is_stale(node, now) for node in nodes),
+            "last_latency": min(latencies) if latencies else None,
+            "upstreams": [node.stats(now) for node in nodes]
+        }
+
+    def models_snapshot(self) -> List[dict]:
+        """/v1/models entries reported by healthy nodes at their last check, without duplicates"""
+        models = {}
+        for node in self.nodes.values():
+            if node.healthy:
+                for entry in node.model_entries:
+                    models.setdefault(entry.get("id"), entry)
+        return list(models.values())
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        return [node.stats(now) for node in self.nodes.values()]
@@ -0,0 +1,93 @@
+"""
+Cold start benchmark for the proxy and the tool registry.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+Reports the median import time of the tool handlers and of the proxy module,
+which heavy tool dependencies those imports pulled in (should be none), and
+how long each lazily built tool helper takes on its first use:
+
+    python Tests/bench_startup.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party modules the built-in tools need; none should load at startup
+HEAVY_MODULES = ["docx", "striprtf", "markdown", "chardet", "PyPDF2", "git", "requests", "bs4"]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy, "modules": len(sys.modules)}}))
+"""
+
+HELPERS_PROBE = """
+import json, time
+import Tools.tool_handlers
+from Tools import registry
+timings = {}
+for loader in registry._lazy_objects:
+    started = time.perf_counter()
+    try:
+        loader()
+        timings[loader.target] = time.perf_counter() - started
+    except Exception as e:
+        timings[loader.target] = "error: " + str(e)
+print(json.dumps(timings))
+"""
+
+def run_probe(code: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    # The proxy logs while importing; the probe's JSON is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def bench_import(module: str, runs: int) -> dict:
+    samples = [run_probe(IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)) for _ in range(runs)]
+    seconds = [sample["seconds"] for sample in samples]
+    return {
+        "median_seconds": statistics.median(seconds),
+        "min_seconds": min(seconds),
+        "max_seconds": max(seconds),
+        "heavy_modules": samples[-1]["heavy_modules"],
+        "modules_loaded": samples[-1]["modules"]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure proxy and tool registry cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per import measurement")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(PROJECT_ROOT, "Tools")):
+        sys.exit("Tools/ not found: the proxy imports the tools package as 'Tools'")
+
+    results = {
+        "tool_handlers_import": bench_import("Tools.tool_handlers", args.runs),
+        "proxy_import": bench_import("Backend.lmstudio_proxy", args.runs),
+        "first_use_seconds": run_probe(HELPERS_PROBE)
+    }
+
+    for name in ("tool_handlers_import", "proxy_import"):
+        result = results[name]
+        heavy = ", ".join(result["heavy_modules"]) or "none"
+        print(f"{name}: median {result['median_seconds'] * 1000:.1f}ms "
+              f"({result['modules_loaded']} modules, heavy: {heavy})")
+    for target, seconds in results["first_use_seconds"].items():
+        shown = f"{seconds * 1000:.1f}ms" if isinstance(seconds, float) else seconds
+        print(f"first use of {target}: {shown}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,136 @@
+"""
+Local stand-in for LM Studio's OpenAI-compatible server.
+
+Streams synthetic tokens with a configurable time-to-first-token and token
+rate so the proxy can be exercised and benchmarked without a GPU:
+
+    python Tests/fake_lmstudio.py --port 4891 --ttft 0.3 --tokens-per-second 40 --tokens 64
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+
+settings = {
+    "ttft": 0.3,
+    "tokens_per_second": 40.0,
+    "tokens": 64,
+    "jitter": 0.0,
+    "model": "fake-model"
+}
+
+def completion_tokens(body: dict) -> int:
+    """Number of tokens to generate, capped by the request's max_tokens"""
+    max_tokens = body.get("max_tokens") or settings["tokens"]
+    if max_tokens < 0:
+        return settings["tokens"]
+    return min(settings["tokens"], max_tokens)
+
+def prompt_tokens(body: dict) -> int:
+    text = json.dumps(body.get("messages", []))
+    return max(1, len(text) // 4)
+
+async def think(seconds: float):
+    """Sleep for `seconds`, randomized by the configured jitter"""
+    if settings["jitter"]:
+        seconds *= random.uniform(1 - settings["jitter"], 1 + settings["jitter"])
+    await asyncio.sleep(max(seconds, 0))
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [{"id": settings["model"], "object": "model", "owned_by": "fake-lmstudio"}]
+    }
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    model = body.get("model", settings["model"])
+    count = completion_tokens(body)
+    usage = {
+        "prompt_tokens": prompt_tokens(body),
+        "completion_tokens": count,
+        "total_tokens": prompt_tokens(body) + count
+    }
+    token_delay = 1.0 / settings["tokens_per_second"]
+
+    if body.get("stream"):
+        async def generate():
+            await think(settings["ttft"])
+            for index in range(count):
+                if index:
+                    await think(token_delay)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": f"token{index} "} if index == 0
+                        else {"content": f"token{index} "},
+                        "finish_reason": None
+                    }]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    await think(settings["ttft"] + token_delay * max(count - 1, 0))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": " ".join(f"token{index}" for index in range(count))
+            },
+            "finish_reason": "stop"
+        }],
+        "usage": usage
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake LM Studio server for proxy tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4891)
+    parser.add_argument("--ttft", type=float, default=settings["ttft"], help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=settings["tokens_per_second"])
+    parser.add_argument("--tokens", type=int, default=settings["tokens"], help="Tokens generated per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- fraction applied to every delay")
+    parser.add_argument("--model", default=settings["model"])
+    args = parser.parse_args()
+
+    settings.update(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        tokens=args.tokens,
+        jitter=args.jitter,
+        model=args.model
+    )
+    print(f"Fake LM Studio on {args.host}:{args.port} with {settings}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,169 @@
+"""
+Load generator for the LM Studio proxy.
+
+Sends chat completions at a fixed concurrency and reports throughput plus
+p50/p95/p99 time-to-first-token and total latency. Results are written as
+JSON so runs before and after a proxy change can be compared:
+
+    python Tests/fake_lmstudio.py &
+    python Backend/lmstudio_proxy.py &
+    python Tests/load_test.py --concurrency 8 --requests 200 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+
+import httpx
+
+def percentile(values: list, fraction: float):
+    """Nearest-rank percentile; None when there are no samples"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None
+    }
+
+def build_payload(args, index: int) -> dict:
+    # Unique prompts keep the proxy cache and request coalescing out of the measurement
+    prompt = args.prompt if args.repeat_prompt else f"{args.prompt} [{index}-{uuid.uuid4().hex[:8]}]"
+    return {
+        "model": args.model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": args.temperature,
+        "max_tokens": args.max_tokens,
+        "stream": args.stream
+    }
+
+async def run_one(client: httpx.AsyncClient, args, index: int) -> dict:
+    """Send one completion and time it"""
+    payload = build_payload(args, index)
+    started = time.perf_counter()
+    ttft = None
+    tokens = 0
+
+    try:
+        if args.stream:
+            async with client.stream("POST", args.url, json=payload) as response:
+                status = response.status_code
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:") or line.strip() == "data: [DONE]":
+                        continue
+                    event = json.loads(line[5:])
+                    for choice in event.get("choices", []):
+                        if (choice.get("delta") or {}).get("content"):
+                            tokens += 1
+                            if ttft is None:
+                                ttft = time.perf_counter() - started
+                    if event.get("usage"):
+                        tokens = event["usage"].get("completion_tokens", tokens)
+        else:
+            response = await client.post(args.url, json=payload)
+            status = response.status_code
+            if status == 200:
+                tokens = response.json().get("usage", {}).get("completion_tokens", 0)
+    except httpx.HTTPError as e:
+        return {"ok": False, "status": None, "error": str(e), "latency": time.perf_counter() - started}
+
+    return {
+        "ok": status == 200,
+        "status": status,
+        "latency": time.perf_counter() - started,
+        "ttft": ttft,
+        "tokens": tokens
+    }
+
+async def run_load(args) -> dict:
+    results = []
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index
+        while next_index < args.requests:
+            index = next_index
+            next_index += 1
+            results.append(await run_one(client, args, index))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    succeeded = [result for result in results if result["ok"]]
+    statuses = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+
+    return {
+        "config": {
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "stream": args.stream,
+            "max_tokens": args.max_tokens,
+            "repeat_prompt": args.repeat_prompt
+        },
+        "elapsed_seconds": elapsed,
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "statuses": statuses,
+        "throughput": {
+            "requests_per_second": len(succeeded) / elapsed if elapsed else None,
+            "tokens_per_second": sum(result["tokens"] for result in succeeded) / elapsed if elapsed else None
+        },
+        "ttft_seconds": summarize([result["ttft"] for result in succeeded if result.get("ttft") is not None]),
+        "latency_seconds": summarize([result["latency"] for result in succeeded]),
+        "timestamp": time.time()
+    }
+
+def print_report(report: dict):
+    def fmt(value):
+        return "-" if value is None else f"{value * 1000:.1f} ms"
+
+    print(f"\nRequests: {report['succeeded']} ok, {report['failed']} failed in {report['elapsed_seconds']:.2f}s")
+    print(f"Statuses: {report['statuses']}")
+    print(f"Throughput: {report['throughput']['requests_per_second']:.2f} req/s, "
+          f"{report['throughput']['tokens_per_second']:.1f} tokens/s")
+    for name in ("ttft_seconds", "latency_seconds"):
+        stats = report[name]
+        print(f"{name:16} p50 {fmt(stats['p50'])}  p95 {fmt(stats['p95'])}  "
+              f"p99 {fmt(stats['p99'])}  max {fmt(stats['max'])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the LM Studio proxy")
+    parser.add_argument("--url", default="http://localhost:4892/v1/chat/completions")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--model", default="local-model")
+    parser.add_argument("--prompt", default="Say hello.")
+    parser.add_argument("--repeat-prompt", action="store_true",
+                        help="Send the identical prompt every time (exercises cache/coalescing)")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", default="load_test_results.json")
+    args = parser.parse_args()
+
+    print(f"Sending {args.requests} requests to {args.url} at concurrency {args.concurrency}...")
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    sys.exit(0 if report["failed"] == 0 else 1)
@@ -0,0 +1 @@
+"""Tool handlers for the process pool tests, loaded by worker processes as `Tests.pool_tools.handlers`"""
@@ -0,0 +1,51 @@
+"""
+Small tools that exercise the worker process lifecycle: results, errors,
+crashes, CPU and memory limits, hangs and progress reports.
+"""
+import mmap
+import os
+import time
+
+from .progress import report_progress
+
+def echo(params):
+    return {"params": params, "pid": os.getpid()}
+
+def fail(params):
+    raise ValueError(params.get("message", "tool failed"))
+
+def burn_cpu(params):
+    while True:
+        pass
+
+def exit_process(params):
+    os._exit(params.get("code", 3))
+
+def sleep(params):
+    time.sleep(params["seconds"])
+    return "woke up"
+
+def count(params):
+    for done in range(1, params["total"] + 1):
+        report_progress(done, params["total"], f"step {done}", partial=[done])
+    return params["total"]
+
+def allocate(params):
+    return len(bytearray(params["megabytes"] * 1024 * 1024))
+
+def map_file(params):
+    """Map a whole file, read one byte from every page and return its size"""
+    with open(params["path"], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        sum(mapped[offset] for offset in range(0, len(mapped), mmap.PAGESIZE))
+        return len(mapped)
+
+TOOL_HANDLERS = {
+    "echo": echo,
+    "fail": fail,
+    "burn_cpu": burn_cpu,
+    "exit_process": exit_process,
+    "sleep": sleep,
+    "count": count,
+    "allocate": allocate,
+    "map_file": map_file
+}
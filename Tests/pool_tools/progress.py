@@ -0,0 +1 @@
+from Tools.progress import progress_reporter, report_progress  # noqa: F401 -- the worker looks for these here
@@ -0,0 +1,145 @@
+"""
+Replay traffic captured by the proxy's recorder (the "recorder" section of
+Backend/proxy_config.json) against a running proxy.
+
+Requests are re-issued with their original spacing, optionally sped up or
+slowed down, and their status, latency and time-to-first-byte are reported
+next to the recorded values:
+
+    python Tests/replay_traffic.py logs/traffic.jsonl --speed 2 --output replay.json
+    python Tests/replay_traffic.py logs/traffic.jsonl --speed 0   # as fast as possible
+"""
+import argparse
+import asyncio
+import glob
+import json
+import sys
+import time
+
+import httpx
+
+from load_test import summarize
+
+def trace_files(path: str) -> list:
+    """The trace file plus its rotated backups, oldest first"""
+    backups = [name for name in glob.glob(f"{glob.escape(path)}.*") if name.rsplit(".", 1)[-1].isdigit()]
+    backups.sort(key=lambda name: int(name.rsplit(".", 1)[-1]), reverse=True)
+    return backups + [path]
+
+def load_trace(paths: list, paths_filter: list = None) -> list:
+    entries = []
+    for path in paths:
+        for file_name in trace_files(path):
+            with open(file_name, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if "body" not in entry:
+                        continue  # recorded with include_bodies off, nothing to send
+                    if paths_filter and entry["path"] not in paths_filter:
+                        continue
+                    entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+async def replay_one(client: httpx.AsyncClient, base_url: str, entry: dict, preserve_sessions: bool) -> dict:
+    headers = dict(entry.get("headers") or {})
+    if preserve_sessions and "X-Session-ID" not in headers and entry.get("client"):
+        # The proxy falls back to the client address; keep recorded clients apart
+        headers["X-Session-ID"] = entry["client"]
+
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(entry["method"], base_url + entry["path"],
+                                 json=entry["body"], headers=headers) as response:
+            async for _ in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+            status = response.status_code
+    except httpx.HTTPError as e:
+        return {"path": entry["path"], "status": None, "error": str(e),
+                "latency": time.perf_counter() - started}
+
+    return {
+        "path": entry["path"],
+        "status": status,
+        "latency": time.perf_counter() - started,
+        "ttfb": ttfb,
+        "recorded_status": entry.get("status"),
+        "recorded_latency": entry.get("duration"),
+        "recorded_ttfb": entry.get("ttfb")
+    }
+
+async def replay(entries: list, args) -> dict:
+    semaphore = asyncio.Semaphore(args.max_concurrency) if args.max_concurrency else None
+    first_ts = entries[0]["ts"]
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        started = time.perf_counter()
+
+        async def scheduled(entry: dict):
+            if args.speed > 0:
+                delay = (entry["ts"] - first_ts) / args.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if semaphore is None:
+                return await replay_one(client, args.base_url, entry, args.preserve_sessions)
+            async with semaphore:
+                return await replay_one(client, args.base_url, entry, args.preserve_sessions)
+
+        results = await asyncio.gather(*(scheduled(entry) for entry in entries))
+        elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    succeeded = [result for result in results if result["status"] == 200]
+
+    return {
+        "config": {"traces": args.traces, "speed": args.speed, "base_url": args.base_url},
+        "requests": len(results),
+        "elapsed_seconds": elapsed,
+        "recorded_span_seconds": entries[-1]["ts"] - first_ts,
+        "statuses": statuses,
+        "status_mismatches": sum(1 for result in results if result["status"] != result.get("recorded_status")),
+        "latency_seconds": summarize([result["latency"] for result in succeeded]),
+        "recorded_latency_seconds": summarize(
+            [result["recorded_latency"] for result in succeeded if result.get("recorded_latency") is not None]
+        ),
+        "ttfb_seconds": summarize([result["ttfb"] for result in succeeded if result.get("ttfb") is not None]),
+        "recorded_ttfb_seconds": summarize(
+            [result["recorded_ttfb"] for result in succeeded if result.get("recorded_ttfb") is not None]
+        )
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded proxy traffic")
+    parser.add_argument("traces", nargs="+", help="Trace files written by the proxy recorder")
+    parser.add_argument("--base-url", default="http://localhost:4892")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Time scale: 1 = original pacing, 2 = twice as fast, 0 = no delays")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Only replay these request paths (repeatable)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Cap on in-flight replayed requests (0 = unlimited)")
+    parser.add_argument("--no-preserve-sessions", dest="preserve_sessions", action="store_false",
+                        help="Do not map recorded client addresses to X-Session-ID")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", default=None, help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    entries = load_trace(args.traces, args.paths)
+    if not entries:
+        print("No replayable entries found (were bodies recorded?)")
+        sys.exit(1)
+
+    print(f"Replaying {len(entries)} requests at speed {args.speed}...")
+    report = asyncio.run(replay(entries, args))
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
@@ -0,0 +1,321 @@
+"""
+Unit tests for single-flight calls and shared upstream streams:
+
+    python -m pytest Tests/test_coalescing.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.coalescing import SingleFlight, StreamCoalescer
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "answer"
+
+        callers = [asyncio.ensure_future(flight.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*callers) == ["answer"] * 3
+        assert calls == 1
+        assert flight.stats() == {"in_flight": 0, "shared": 2}
+
+    asyncio.run(scenario())
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def work(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: work(1)), flight.do("b", lambda: work(2)))
+        assert results == [1, 2]
+        assert flight.shared == 0
+
+    asyncio.run(scenario())
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    async def scenario():
+        flight = SingleFlight("test")
+        attempts = 0
+
+        async def failing():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(
+            flight.do("key", failing), flight.do("key", failing), return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert attempts == 1
+
+        # A later call runs again instead of reusing the failure
+        with pytest.raises(ValueError):
+            await flight.do("key", failing)
+        assert attempts == 2
+
+    asyncio.run(scenario())
+
+def test_work_survives_until_the_last_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+class Source:
+    """A byte stream that records how far it was read and whether it was cleaned up"""
+
+    def __init__(self, chunks, gate=None):
+        self.chunks = chunks
+        self.gate = gate
+        self.produced = 0
+        self.cleaned_up = False
+
+    async def iterate(self):
+        for chunk in self.chunks:
+            if self.gate is not None:
+                await self.gate.wait()
+            self.produced += 1
+            yield chunk
+
+    async def cleanup(self):
+        self.cleaned_up = True
+
+    def opener(self, queued=None):
+        """open_source for StreamCoalescer.open, waiting on `queued` first if given"""
+        async def open_source():
+            if queued is not None:
+                await queued.wait()
+            return self.iterate(), self.cleanup
+        return open_source
+
+async def _collect(subscription):
+    return b"".join([chunk async for chunk in subscription])
+
+def test_identical_streams_share_one_upstream():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"a", b"b", b"c"], asyncio.Event())
+        opened = 0
+
+        async def open_source():
+            nonlocal opened
+            opened += 1
+            return source.iterate()
+
+        first = await coalescer.open("key", open_source)
+        second = await coalescer.open("key", open_source)
+        assert first.fanout is second.fanout
+        assert opened == 1
+
+        readers = [asyncio.ensure_future(_collect(first)), asyncio.ensure_future(_collect(second))]
+        source.gate.set()
+        assert await asyncio.gather(*readers) == [b"abc", b"abc"]
+        assert source.produced == 3
+        assert coalescer.stats() == {"in_flight": 0, "shared": 1}
+
+    asyncio.run(scenario())
+
+def test_late_subscriber_receives_the_whole_stream():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"first ", b"second"], asyncio.Event())
+
+        early = await coalescer.open("key", source.opener())
+        source.gate.set()
+        assert await early.__anext__() == b"first "
+
+        late = await coalescer.open("key", source.opener())
+        assert await _collect(late) == b"first second"
+        assert await _collect(early) == b"second"
+
+    asyncio.run(scenario())
+
+def test_source_is_only_read_once_iterated():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"a", b"b"])
+
+        subscription = await coalescer.open("key", source.opener())
+        await asyncio.sleep(0.01)
+        assert source.produced == 0
+
+        assert await _collect(subscription) == b"ab"
+        assert source.cleaned_up
+
+    asyncio.run(scenario())
+
+def test_stream_errors_reach_subscribers():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+
+        async def broken():
+            yield b"partial"
+            raise ConnectionError("upstream dropped")
+
+        async def open_source():
+            return broken()
+
+        received = []
+        with pytest.raises(ConnectionError):
+            async for chunk in await coalescer.open("key", open_source):
+                received.append(chunk)
+        assert received == [b"partial"]
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_failed_open_is_not_shared_with_later_requests():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+
+        async def refuse():
+            raise ConnectionError("upstream refused")
+
+        with pytest.raises(ConnectionError):
+            await coalescer.open("key", refuse)
+        assert coalescer.stats()["in_flight"] == 0
+
+        assert await _collect(await coalescer.open("key", Source([b"ok"]).opener())) == b"ok"
+
+    asyncio.run(scenario())
+
+def test_caller_cancelled_while_queued_never_opens_the_source():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        queued = asyncio.Event()
+        source = Source([b"chunk"] * 5)
+
+        caller = asyncio.ensure_future(coalescer.open("key", source.opener(queued)))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+        # The slot frees up after the caller left: nothing may be opened or read for it
+        queued.set()
+        await asyncio.sleep(0.01)
+        assert source.produced == 0
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_queued_open_survives_while_another_caller_waits():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        queued = asyncio.Event()
+        source = Source([b"a", b"b"])
+
+        leaving = asyncio.ensure_future(coalescer.open("key", source.opener(queued)))
+        staying = asyncio.ensure_future(coalescer.open("key", source.opener(queued)))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+
+        queued.set()
+        assert await _collect(await staying) == b"ab"
+
+    asyncio.run(scenario())
+
+def test_source_opened_as_the_last_caller_leaves_is_closed_unread():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"chunk"] * 5)
+
+        caller = asyncio.ensure_future(coalescer.open("key", source.opener()))
+        # Let the caller start the open, and the open finish, before the caller resumes
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.01)
+
+        assert source.produced == 0
+        assert source.cleaned_up
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_unread_subscription_closes_the_source():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"chunk"] * 5)
+
+        subscription = await coalescer.open("key", source.opener())
+        await subscription.aclose()
+        await asyncio.sleep(0.01)
+
+        assert source.produced == 0
+        assert source.cleaned_up
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_source_is_cancelled_when_every_subscriber_leaves():
+    async def scenario():
+        coalescer = StreamCoalescer("test")
+        source = Source([b"first", b"never"], asyncio.Event())
+
+        first = await coalescer.open("key", source.opener())
+        second = await coalescer.open("key", source.opener())
+        reader = asyncio.ensure_future(first.__anext__())
+        await asyncio.sleep(0)
+
+        reader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await reader
+        await first.aclose()
+        await asyncio.sleep(0)
+        # The second subscription still holds the stream open
+        assert not first.fanout.done
+
+        await second.aclose()
+        await asyncio.sleep(0.01)
+        assert first.fanout.task.cancelled()
+        assert source.produced == 0 and source.cleaned_up
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
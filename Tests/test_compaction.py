@@ -0,0 +1,117 @@
+"""
+Unit tests for compacting long chat histories to a token budget:
+
+    python -m pytest Tests/test_compaction.py
+"""
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.compaction import (SUMMARY_LINE_CHARS, ContextCompactor, count_messages_tokens, count_tokens,
+                                summarize_message, truncate_content)
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+def _turn(number, tool_output=None):
+    """One user turn: a question, optionally a tool call and its output, and the answer"""
+    messages = [{"role": "user", "content": f"Question {number}. Please answer it in detail."}]
+    if tool_output is not None:
+        messages += [
+            {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{number}", "type": "function",
+                 "function": {"name": "read_file", "arguments": '{"file_path": "notes.txt"}'}}
+            ]},
+            {"role": "tool", "tool_call_id": f"call_{number}", "content": tool_output}
+        ]
+    messages.append({"role": "assistant", "content": f"Answer {number}. Here is what I found."})
+    return messages
+
+def _chat(turns, tool_output=None):
+    return [SYSTEM] + [message for number in range(1, turns + 1) for message in _turn(number, tool_output)]
+
+def _compactor(**config):
+    return ContextCompactor({"keep_recent_turns": 2, "max_tool_output_tokens": 10, **config})
+
+def _is_summary(message):
+    return message["role"] == "system" and message["content"].startswith("Summary of the earlier conversation:")
+
+def test_chats_within_budget_are_forwarded_unchanged():
+    messages = _chat(6, tool_output="x" * 400)
+    tokens = count_messages_tokens(messages)
+    assert _compactor(default_budget=tokens).compact({"messages": messages}) is messages
+    assert _compactor(default_budget=tokens - 1).compact({"messages": messages}) != messages
+
+def test_budget_is_per_model_and_leaves_room_for_tools():
+    compactor = _compactor(default_budget=1000, model_budgets={"small": 100})
+    tools = [{"type": "function", "function": {"name": "read_file", "description": "x" * 200}}]
+    assert compactor.budget_for({"model": "small"}) == 100
+    assert compactor.budget_for({"model": "other", "tools": tools}) == 1000 - count_tokens(json.dumps(tools))
+    assert compactor.budget_for({"model": "small", "tools": tools * 10}) == 0
+
+def test_old_tool_outputs_are_truncated_first():
+    messages = _chat(4, tool_output="line of output\n" * 100)
+    budget = count_messages_tokens(messages) - 100
+    compacted = _compactor(default_budget=budget).compact({"messages": messages})
+
+    # Every message survives; only the tool outputs of the older turns are cut
+    assert len(compacted) == len(messages)
+    assert count_messages_tokens(compacted) <= budget
+    tool_outputs = [message["content"] for message in compacted if message["role"] == "tool"]
+    assert all("...[truncated" in content for content in tool_outputs[:2])
+    assert tool_outputs[2:] == ["line of output\n" * 100] * 2
+
+def test_earlier_turns_are_collapsed_into_a_summary():
+    messages = _chat(8)
+    # Room for the last two turns and a short summary, not for the whole history
+    budget = count_messages_tokens([SYSTEM] + messages[-4:]) + 100
+    assert budget < count_messages_tokens(messages)
+    compacted = _compactor(default_budget=budget).compact({"messages": messages})
+
+    # The system prompt, one summary, then the last two turns exactly as sent
+    assert compacted[0] is SYSTEM
+    assert _is_summary(compacted[1])
+    assert compacted[2:] == messages[-4:]
+    summary = compacted[1]["content"].splitlines()
+    assert summary[1:3] == ["- user: Question 1.", "- assistant: Answer 1."]
+    assert summary[-1] == "- assistant: Answer 6."
+
+def test_summary_keeps_its_most_recent_lines_within_its_limit():
+    messages = _chat(40)
+    compacted = _compactor(default_budget=count_messages_tokens(messages) // 2, summary_max_tokens=30) \
+        .compact({"messages": messages})
+    summary = compacted[1]["content"].splitlines()
+    assert count_tokens("\n".join(summary[1:])) <= 30
+    assert summary[-1] == "- assistant: Answer 38."
+
+def test_latest_turn_is_kept_when_nothing_else_fits():
+    messages = _chat(6)
+    last_turn = messages[-2:]
+    compacted = _compactor(default_budget=count_messages_tokens([SYSTEM] + last_turn)).compact({"messages": messages})
+    assert compacted == [SYSTEM] + last_turn
+
+    # Even a budget the latest turn alone exceeds keeps the system prompt and that turn
+    assert _compactor(default_budget=1).compact({"messages": messages}) == [SYSTEM] + last_turn
+
+def test_recent_tool_outputs_are_cut_before_recent_turns_are_dropped():
+    messages = _chat(2, tool_output="y" * 2000)
+    compacted = _compactor(default_budget=200).compact({"messages": messages})
+    assert [message["role"] for message in compacted] == [message["role"] for message in messages]
+    assert "...[truncated" in compacted[3]["content"]
+    assert compacted[-1] == messages[-1]
+
+def test_images_survive_truncation():
+    image = {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}
+    content = [{"type": "text", "text": "z" * 400}, image, {"type": "text", "text": "more"}]
+    truncated = truncate_content(content, 10)
+    assert truncated[1] is image
+    assert truncated[0]["text"].startswith("z" * 40) and "...[truncated" in truncated[0]["text"]
+    # The first part used up the budget
+    assert truncated[2]["text"] == "\n...[truncated 1 tokens]"
+
+def test_summary_lines_are_one_sentence():
+    assert summarize_message("user", "First  sentence.\nSecond one.") == "- user: First sentence."
+    long_line = summarize_message("tool", "w" * 500)
+    assert long_line == f"- tool: {'w' * SUMMARY_LINE_CHARS}..."
@@ -0,0 +1,168 @@
+"""
+Unit tests for the file content cache and its invalidation:
+
+    python -m pytest Tests/test_content_cache.py
+"""
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Tools.Utilities.content_cache import ContentCache
+from Tools.Utilities.file_reader import FileReader
+from Tools.Utilities.line_index import LineIndexStore
+
+class Counter:
+    """A compute function that records how often it ran"""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        with open(self.path) as f:
+            return {"text": f.read()}
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first version")
+    return str(path)
+
+def _disk_rows(cache):
+    return cache.disk.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM contents").fetchone()
+
+def _disk_total(cache):
+    return cache.disk.execute("SELECT bytes FROM contents_total").fetchone()[0]
+
+def test_unchanged_file_is_served_from_memory(document):
+    cache = ContentCache()
+    compute = Counter(document)
+    assert cache.fetch(document, "text", compute) == {"text": "first version"}
+    assert cache.fetch(document, "text", compute) == {"text": "first version"}
+    assert compute.calls == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_kinds_are_cached_separately(document):
+    cache = ContentCache()
+    compute = Counter(document)
+    cache.fetch(document, "text", compute)
+    cache.fetch(document, "analysis", compute)
+    assert compute.calls == 2
+    assert cache.stats()["entries"] == 2
+
+def test_changed_file_is_computed_again_and_replaces_the_stale_entry(document):
+    cache = ContentCache()
+    compute = Counter(document)
+    cache.fetch(document, "text", compute)
+
+    with open(document, "w") as f:
+        f.write("second, longer version")
+    assert cache.fetch(document, "text", compute) == {"text": "second, longer version"}
+    assert compute.calls == 2
+    # The result for the old version could never be hit again
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == len('{"text":"second, longer version"}')
+
+def test_invalidate_forgets_every_kind(document, tmp_path):
+    cache = ContentCache(disk_path=str(tmp_path / "cache.db"))
+    compute = Counter(document)
+    cache.fetch(document, "text", compute)
+    cache.fetch(document, "analysis", compute)
+
+    cache.invalidate(document)
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+    assert _disk_rows(cache) == (0, 0)
+    assert _disk_total(cache) == 0
+
+    cache.fetch(document, "text", compute)
+    assert compute.calls == 3
+    cache.close()
+
+def test_uncacheable_results_are_not_stored(document):
+    cache = ContentCache()
+    compute = Counter(document)
+    cache.fetch(document, "text", compute, cacheable=lambda value: False)
+    cache.fetch(document, "text", compute, cacheable=lambda value: False)
+    assert compute.calls == 2
+    assert cache.stats()["entries"] == 0
+
+def test_missing_files_are_not_cached(tmp_path):
+    cache = ContentCache()
+    assert cache.fetch(str(tmp_path / "missing.txt"), "text", lambda: "gone") == "gone"
+    assert cache.stats()["entries"] == 0
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    paths = []
+    for name in "abc":
+        path = tmp_path / f"{name}.txt"
+        path.write_text(name * 10)
+        paths.append(str(path))
+    entry_bytes = len('{"text":"aaaaaaaaaa"}')
+    cache = ContentCache(max_bytes=2 * entry_bytes)
+
+    cache.fetch(paths[0], "text", Counter(paths[0]))
+    cache.fetch(paths[1], "text", Counter(paths[1]))
+    cache.fetch(paths[0], "text", Counter(paths[0]))
+    cache.fetch(paths[2], "text", Counter(paths[2]))
+
+    assert cache.stats()["bytes"] == 2 * entry_bytes
+    kept = {real_path for _, real_path, _ in cache.entries.values()}
+    assert kept == {os.path.realpath(paths[0]), os.path.realpath(paths[2])}
+
+def test_disk_tier_survives_restarts(document, tmp_path):
+    disk_path = str(tmp_path / "cache.db")
+    ContentCache(disk_path=disk_path).fetch(document, "text", Counter(document))
+
+    restarted = ContentCache(disk_path=disk_path)
+    compute = Counter(document)
+    assert restarted.fetch(document, "text", compute) == {"text": "first version"}
+    assert compute.calls == 0
+    restarted.close()
+
+def test_disk_tier_keeps_one_row_per_file_and_kind(document, tmp_path):
+    cache = ContentCache(disk_path=str(tmp_path / "cache.db"))
+    compute = Counter(document)
+    cache.fetch(document, "text", compute)
+    with open(document, "w") as f:
+        f.write("second version")
+    cache.fetch(document, "text", compute)
+
+    count, size = _disk_rows(cache)
+    assert count == 1
+    assert _disk_total(cache) == size
+    cache.close()
+
+def test_disk_tier_stays_within_its_budget(tmp_path):
+    cache = ContentCache(disk_path=str(tmp_path / "cache.db"), max_disk_bytes=100)
+    for number in range(10):
+        path = tmp_path / f"{number}.txt"
+        path.write_text(str(number) * 20)
+        cache.fetch(str(path), "text", Counter(str(path)))
+
+    count, size = _disk_rows(cache)
+    assert size <= 100
+    assert _disk_total(cache) == size
+    # The most recent results are the ones kept
+    kept = [row[0] for row in cache.disk.execute("SELECT path FROM contents")]
+    assert os.path.realpath(str(tmp_path / "9.txt")) in kept
+    cache.close()
+
+def test_read_file_does_not_cache_errors(tmp_path):
+    cache = ContentCache()
+    reader = FileReader(cache=cache, line_indexes=LineIndexStore(min_bytes=2 ** 62))
+    unsupported = tmp_path / "image.bmp"
+    unsupported.write_bytes(b"BM")
+
+    assert reader.read_file(str(unsupported)).startswith("Error: Unsupported file type")
+    assert cache.stats()["entries"] == 0
+
+    text = tmp_path / "notes.txt"
+    text.write_text("hello")
+    assert reader.read_file(str(text)) == "hello"
+    assert reader.read_file(str(text)) == "hello"
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,161 @@
+"""
+Unit tests for ranged, line and tail reads, with and without a line index:
+
+    python -m pytest Tests/test_file_ranges.py
+"""
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Tools.Utilities.content_cache import ContentCache
+from Tools.Utilities.file_reader import FileReader, TextLayout
+from Tools.Utilities.line_index import LineIndexStore, build_line_index
+
+LINES = [f"line {number}\n" for number in range(1, 101)]
+
+@pytest.fixture(params=["scan", "index"])
+def reader(request, tmp_path):
+    """A reader that finds lines by scanning, or through a line index of every file"""
+    if request.param == "index":
+        # A small stride, so lookups start between two recorded offsets
+        indexes = LineIndexStore(str(tmp_path / "line_index"), stride=3, min_bytes=0)
+    else:
+        indexes = LineIndexStore(min_bytes=2 ** 62)
+    return FileReader(cache=ContentCache(), line_indexes=indexes, chunk_bytes=64)
+
+def _write(tmp_path, name, text, encoding="utf-8", newline=None):
+    path = tmp_path / name
+    with open(path, "w", encoding=encoding, newline=newline) as f:
+        f.write(text)
+    return str(path)
+
+def test_line_range(reader, tmp_path):
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    result = reader.read_file(path, start_line=10, end_line=12)
+    assert result["content"] == "line 10\nline 11\nline 12\n"
+    assert (result["start_line"], result["end_line"]) == (10, 12)
+    assert not result["eof"] and not result["truncated"]
+
+    rest = reader.read_file(path, start_line=99)
+    assert rest["content"] == "line 99\nline 100\n"
+    assert rest["eof"]
+
+def test_line_range_past_the_end_is_empty(reader, tmp_path):
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    result = reader.read_file(path, start_line=500)
+    assert result["content"] == ""
+    assert result["eof"]
+
+def test_tail(reader, tmp_path):
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    assert reader.read_file(path, tail=2)["content"] == "line 99\nline 100\n"
+
+    unterminated = _write(tmp_path, "unterminated.txt", "".join(LINES).rstrip("\n"))
+    assert reader.read_file(unterminated, tail=2)["content"] == "line 99\nline 100"
+    assert reader.read_file(unterminated, tail=1000)["content"] == "".join(LINES).rstrip("\n")
+
+def test_tail_is_numbered_once_the_file_is_indexed(tmp_path):
+    indexes = LineIndexStore(str(tmp_path / "line_index"), stride=3, min_bytes=0)
+    reader = FileReader(cache=ContentCache(), line_indexes=indexes)
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+
+    # Tails do not build an index on their own...
+    assert "start_line" not in reader.read_file(path, tail=3)
+    # ...but reuse one a line range built
+    reader.read_file(path, start_line=1, end_line=1)
+    result = reader.read_file(path, tail=3)
+    assert (result["start_line"], result["end_line"]) == (98, 100)
+
+def test_crlf_lines_are_normalized(reader, tmp_path):
+    path = _write(tmp_path, "crlf.txt", "".join(LINES), newline="\r\n")
+    assert reader.read_file(path, start_line=2, end_line=3)["content"] == "line 2\nline 3\n"
+    assert reader.read_file(path, tail=1)["content"] == "line 100\n"
+
+def test_utf16_line_range(reader, tmp_path):
+    path = _write(tmp_path, "wide.txt", "".join(LINES).replace("line", "línea"), encoding="utf-16")
+    result = reader.read_file(path, start_line=50, end_line=51)
+    assert result["content"] == "línea 50\nlínea 51\n"
+    assert result["encoding"] == "utf-16-le"
+    assert reader.read_file(path, tail=1)["content"] == "línea 100\n"
+
+def test_byte_range_is_moved_to_character_boundaries(reader, tmp_path):
+    path = _write(tmp_path, "accents.txt", "é" * 10)
+    result = reader.read_file(path, offset=3, length=2)
+    # Byte 3 is inside the second 'é', so the range starts at byte 2
+    assert (result["offset"], result["end_offset"]) == (2, 4)
+    assert result["content"] == "é"
+
+def test_line_ranges_are_cut_at_max_read_bytes_and_can_be_continued(tmp_path):
+    reader = FileReader(cache=ContentCache(), max_read_bytes=40,
+                        line_indexes=LineIndexStore(min_bytes=2 ** 62))
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+
+    first = reader.read_file(path, start_line=1)
+    assert first["truncated"]
+    assert first["content"] == "".join(LINES[:5])
+    assert first["end_line"] == 5
+
+    following = reader.read_file(path, offset=first["end_offset"], length=8)
+    assert following["content"] == "line 6\nl"
+
+def test_large_files_are_read_as_a_range(tmp_path):
+    reader = FileReader(cache=ContentCache(), max_read_bytes=16, max_full_read_bytes=100,
+                        line_indexes=LineIndexStore(min_bytes=2 ** 62))
+    path = _write(tmp_path, "large.log", "".join(LINES))
+    result = reader.read_file(path)
+    assert result["offset"] == 0 and result["end_offset"] == 16
+    assert result["truncated"]
+
+def test_conflicting_ranges_are_rejected(reader, tmp_path):
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    assert reader.read_file(path, offset=0, tail=1).startswith("Error: Give either")
+    assert reader.read_file(path, start_line=5, end_line=2) == "Error: end_line 2 is before start_line 5"
+
+def test_iter_file_streams_the_same_text(reader, tmp_path):
+    path = _write(tmp_path, "crlf.txt", "".join(LINES), newline="\r\n")
+    pieces = list(reader.iter_file(path, start_line=3, piece_bytes=7))
+    assert len(pieces) > 1
+    assert "".join(piece["content"] for piece in pieces) == "".join(LINES[2:])
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path):
+    directory = str(tmp_path / "line_index")
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    FileReader(cache=ContentCache(), line_indexes=LineIndexStore(directory, min_bytes=0)).read_file(path, start_line=2)
+    assert len(os.listdir(directory)) == 1
+
+    _write(tmp_path, "lines.txt", "inserted\n" + "".join(LINES))
+    # A new store has nothing in memory, so a stale sidecar would be used if it matched
+    reader = FileReader(cache=ContentCache(), line_indexes=LineIndexStore(directory, min_bytes=0))
+    assert reader.read_file(path, start_line=2, end_line=2)["content"] == "line 1\n"
+
+def test_index_counts_lone_carriage_returns():
+    data = b"a\rb\r\nc\nd"
+    index = build_line_index(data, TextLayout(data, "utf-8"), ("mem", len(data), 0, 0), stride=1, chunk_bytes=4)
+    # The "\r\n" straddles two chunks and still counts as one line break
+    assert (index.newlines, index.carriage_returns) == (2, 1)
+    assert index.line_count == 3
+    assert index.text_line_count == 4
+    assert list(index.offsets) == [0, 5, 7]
+
+@pytest.mark.parametrize("stride, chunk_bytes", [(1, 5), (3, 5), (3, 64), (7, 4096)])
+def test_index_records_every_stride_th_line_start(stride, chunk_bytes):
+    data = "".join(LINES).encode()
+    index = build_line_index(data, TextLayout(data, "utf-8"), ("mem", len(data), 0, 0), stride=stride,
+                             chunk_bytes=chunk_bytes)
+    starts = [0] + [position + 1 for position, byte in enumerate(data) if byte == ord("\n")]
+    assert list(index.offsets) == starts[::stride]
+    assert index.newlines == len(LINES)
+
+def test_sample_lines_of_a_small_file(reader, tmp_path):
+    path = _write(tmp_path, "lines.txt", "".join(LINES))
+    samples = reader.sample_lines(path, samples=3, lines=2)
+    # The final newline starts an empty 101st line, so the last excerpt is line 100 and that empty line
+    assert samples == [
+        {"start_line": 1, "content": "line 1\nline 2\n"},
+        {"start_line": 50, "content": "line 50\nline 51\n"},
+        {"start_line": 100, "content": "line 100\n"}
+    ]
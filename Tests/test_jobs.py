@@ -0,0 +1,233 @@
+"""
+Unit tests for background tool jobs: submission, progress, completion,
+failure, cancellation, result expiry and the job event stream:
+
+    python -m pytest Tests/test_jobs.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend import lmstudio_proxy as proxy
+from Backend.jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobLimitError, JobManager
+from Tools.progress import Cancelled
+
+class FakeTools:
+    """A `run` function for JobManager whose calls wait until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = []
+
+    async def __call__(self, name, params, reporter):
+        self.started.append(name)
+        if name == "steps":
+            for done in range(1, params["total"] + 1):
+                reporter({"done": done, "total": params["total"], "message": f"step {done}", "partial": done})
+                await self.release.wait()
+            return {"steps": params["total"]}
+        if name == "threaded":
+            # A thread-based tool: it notices a cancellation at its next progress report
+            def work():
+                while True:
+                    reporter({"message": "working"})
+                    time.sleep(0.01)
+            return await asyncio.to_thread(work)
+        await self.release.wait()
+        if name == "broken":
+            raise ValueError("tool failed")
+        return {"echo": params}
+
+async def _finished(job):
+    await asyncio.wait_for(job.task, 5)
+    return job
+
+def _types(job):
+    return [(event["event"], event.get("status") or event.get("message")) for event in job.events]
+
+def test_job_runs_to_completion_with_progress():
+    async def scenario():
+        tools = FakeTools()
+        manager = JobManager(tools)
+        job = await manager.submit("steps", {"total": 2})
+        assert job.status == QUEUED
+        await asyncio.sleep(0.01)
+        assert job.status == RUNNING
+        assert job.progress == {"done": 1, "total": 2, "message": "step 1"}
+        assert job.to_dict()["partial_results"] == 1 and "result" not in job.to_dict()
+
+        tools.release.set()
+        await _finished(job)
+        assert job.status == SUCCEEDED
+        assert job.to_dict()["result"] == {"steps": 2}
+        assert job.partial == [1, 2]
+        assert [event["seq"] for event in job.events] == list(range(len(job.events)))
+        assert _types(job) == [("status", QUEUED), ("status", RUNNING), ("progress", "step 1"),
+                               ("progress", "step 2"), ("status", SUCCEEDED)]
+        assert job.started <= job.finished
+
+    asyncio.run(scenario())
+
+def test_failed_job_keeps_its_error():
+    async def scenario():
+        tools = FakeTools()
+        tools.release.set()
+        job = await _finished(await JobManager(tools).submit("broken", {}))
+        assert job.status == FAILED
+        assert job.to_dict()["error"] == "tool failed"
+        assert "result" not in job.to_dict()
+
+    asyncio.run(scenario())
+
+def test_jobs_beyond_max_workers_wait_their_turn():
+    async def scenario():
+        tools = FakeTools()
+        manager = JobManager(tools, max_workers=1)
+        first = await manager.submit("echo", {"n": 1})
+        second = await manager.submit("echo", {"n": 2})
+        await asyncio.sleep(0.01)
+        assert (first.status, second.status) == (RUNNING, QUEUED)
+
+        tools.release.set()
+        await _finished(second)
+        assert tools.started == ["echo", "echo"]
+        assert second.result == {"echo": {"n": 2}}
+
+    asyncio.run(scenario())
+
+def test_cancelling_running_and_queued_jobs():
+    async def scenario():
+        tools = FakeTools()
+        manager = JobManager(tools, max_workers=1)
+        running = await manager.submit("echo", {})
+        queued = await manager.submit("echo", {})
+        await asyncio.sleep(0.01)
+
+        await manager.cancel(queued.id)
+        await manager.cancel(running.id)
+        await _finished(running)
+        await _finished(queued)
+        assert (running.status, queued.status) == (CANCELLED, CANCELLED)
+        # The queued job never started
+        assert tools.started == ["echo"]
+
+        # Cancelling a finished job leaves it as it is
+        assert (await manager.cancel(running.id)).status == CANCELLED
+
+    asyncio.run(scenario())
+
+def test_thread_tools_stop_at_their_next_progress_report():
+    async def scenario():
+        manager = JobManager(FakeTools())
+        job = await manager.submit("threaded", {})
+        await asyncio.sleep(0.05)
+        assert job.progress["message"] == "working"
+
+        await manager.cancel(job.id)
+        await _finished(job)
+        assert job.status == CANCELLED
+        # The worker thread ends too: its next report raises Cancelled
+        with pytest.raises(Cancelled):
+            manager.reporter_for(job)({"message": "still working?"})
+
+    asyncio.run(scenario())
+
+def test_max_jobs_limits_active_jobs():
+    async def scenario():
+        tools = FakeTools()
+        manager = JobManager(tools, max_jobs=2)
+        await manager.submit("echo", {})
+        await manager.submit("echo", {})
+        with pytest.raises(JobLimitError):
+            await manager.submit("echo", {})
+
+        tools.release.set()
+        await asyncio.gather(*(job.task for job in manager.jobs.values()))
+        # Finished jobs no longer count
+        await manager.submit("echo", {})
+
+    asyncio.run(scenario())
+
+def test_finished_jobs_expire_after_result_ttl(monkeypatch):
+    async def scenario():
+        tools = FakeTools()
+        tools.release.set()
+        manager = JobManager(tools, result_ttl=60)
+        job = await _finished(await manager.submit("echo", {}))
+        assert await manager.get(job.id) is job
+
+        finished_at = time.monotonic()
+        monkeypatch.setattr("Backend.jobs.time.monotonic", lambda: finished_at + 59)
+        assert await manager.get(job.id) is job
+        monkeypatch.setattr("Backend.jobs.time.monotonic", lambda: finished_at + 61)
+        assert await manager.get(job.id) is None
+        assert await manager.summaries() == []
+
+    asyncio.run(scenario())
+
+def test_events_resume_after_a_sequence_number():
+    async def scenario():
+        tools = FakeTools()
+        manager = JobManager(tools)
+        job = await manager.submit("steps", {"total": 2})
+        await asyncio.sleep(0.01)
+
+        received = []
+
+        async def subscribe():
+            async for event in manager.events(job, after=1):
+                received.append(event["seq"])
+
+        subscriber = asyncio.ensure_future(subscribe())
+        await asyncio.sleep(0.01)
+        assert received == [2]
+        tools.release.set()
+        await asyncio.wait_for(subscriber, 5)
+        assert received == [2, 3, 4]
+
+    asyncio.run(scenario())
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event"), fields.get("id"), json.loads(fields["data"])))
+    return events
+
+def test_job_api_streams_events_and_a_final_done(monkeypatch):
+    async def scenario():
+        tools = FakeTools()
+        monkeypatch.setattr(proxy, "job_manager", JobManager(tools))
+        transport = httpx.ASGITransport(app=proxy.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            response = await client.post("/v1/jobs", json={"name": "analyze_file", "params": {"file_path": "a.txt"}})
+            assert response.status_code == 202
+            submitted = response.json()
+            assert submitted["events_url"] == f"/v1/jobs/{submitted['id']}/events"
+
+            tools.release.set()
+            events = _parse_sse((await client.get(submitted["events_url"])).text)
+            assert [(event, data.get("status")) for event, _, data in events] == [
+                ("status", QUEUED), ("status", RUNNING), ("status", SUCCEEDED), ("done", SUCCEEDED)
+            ]
+            assert [event_id for _, event_id, _ in events] == ["0", "1", "2", None]
+            assert events[-1][2]["result"] == {"echo": {"file_path": "a.txt"}}
+
+            # A reconnecting client only gets what it missed
+            resumed = _parse_sse((await client.get(submitted["events_url"], headers={"Last-Event-ID": "1"})).text)
+            assert [event_id for _, event_id, _ in resumed] == ["2", None]
+
+            assert (await client.get(f"/v1/jobs/{submitted['id']}")).json()["status"] == SUCCEEDED
+            assert (await client.get("/v1/jobs/unknown")).status_code == 404
+            rejected = await client.post("/v1/jobs", json={"name": "analyze_file", "params": {}})
+            assert rejected.status_code == 422
+
+    asyncio.run(scenario())
@@ -0,0 +1,166 @@
+"""
+Unit tests for the tool worker process pool: results and errors, crashes and
+respawns, CPU and memory limits, timeouts and progress forwarding. The workers
+run the small tools in Tests/pool_tools:
+
+    python -m pytest Tests/test_process_pool.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.process_pool import ProcessToolPool, ToolProcessError, WorkerCrashedError, resource
+
+HANDLERS = "Tests.pool_tools.handlers"
+
+needs_limits = pytest.mark.skipif(resource is None, reason="per-call limits need the resource module")
+
+def _with_pool(scenario, handlers_module=HANDLERS, **options):
+    """Run `scenario(pool)` against a started one-worker pool, shutting it down afterwards"""
+    async def main():
+        pool = ProcessToolPool(handlers_module, **{"size": 1, **options})
+        await pool.start()
+        try:
+            return await scenario(pool)
+        finally:
+            pool.shutdown()
+    return asyncio.run(main())
+
+def test_results_come_back_from_a_prewarmed_worker():
+    async def scenario(pool):
+        first = await pool.run("echo", {"text": "hi"})
+        second = await pool.run("echo", {"text": "again"})
+        assert first["params"] == {"text": "hi"}
+        assert first["pid"] == second["pid"] != os.getpid()
+        assert pool.stats()["spawned"] == 1
+
+    _with_pool(scenario)
+
+def test_tool_errors_keep_the_worker():
+    async def scenario(pool):
+        before = (await pool.run("echo", {}))["pid"]
+        with pytest.raises(ToolProcessError, match="ValueError: bad input") as error:
+            await pool.run("fail", {"message": "bad input"})
+        assert error.value.error_type == "ValueError"
+        assert (await pool.run("echo", {}))["pid"] == before
+        assert pool.stats()["crashed"] == 0
+
+    _with_pool(scenario)
+
+def test_crashed_worker_is_replaced():
+    async def scenario(pool):
+        before = (await pool.run("echo", {}))["pid"]
+        with pytest.raises(WorkerCrashedError, match="running exit_process exited with code 3"):
+            await pool.run("exit_process", {"code": 3})
+        # The next call waits for the replacement instead of failing
+        assert (await pool.run("echo", {}))["pid"] != before
+        assert (pool.stats()["crashed"], pool.stats()["spawned"]) == (1, 2)
+
+    _with_pool(scenario)
+
+@needs_limits
+def test_cpu_limit_kills_a_runaway_call():
+    async def scenario(pool):
+        with pytest.raises(WorkerCrashedError, match="exceeded its 1s CPU time limit"):
+            await asyncio.wait_for(pool.run("burn_cpu", {}, cpu_seconds=1), 30)
+        assert pool.stats()["crashed"] == 1
+        assert (await pool.run("echo", {}))["params"] == {}
+
+    _with_pool(scenario)
+
+def test_timed_out_call_kills_its_worker():
+    async def scenario(pool):
+        before = (await pool.run("echo", {}))["pid"]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run("sleep", {"seconds": 60}), 0.5)
+        assert (await pool.run("echo", {}))["pid"] != before
+        assert pool.stats()["spawned"] == 2
+
+    _with_pool(scenario)
+
+def test_progress_reaches_the_callback():
+    updates = []
+
+    async def scenario(pool):
+        assert await pool.run("count", {"total": 3}) == 3
+
+    _with_pool(scenario, progress_callback=lambda **update: updates.append(update))
+    assert updates == [
+        {"done": done, "total": 3, "message": f"step {done}", "partial": [done]} for done in (1, 2, 3)
+    ]
+
+def test_refused_progress_abandons_the_call():
+    class Refused(Exception):
+        pass
+
+    def refuse(**update):
+        raise Refused()
+
+    async def scenario(pool):
+        before = (await pool.run("echo", {}))["pid"]
+        with pytest.raises(Refused):
+            await pool.run("count", {"total": 3})
+        assert (await pool.run("echo", {}))["pid"] != before
+
+    _with_pool(scenario, progress_callback=refuse)
+
+def test_workers_are_recycled_after_max_calls():
+    async def scenario(pool):
+        pids = [(await pool.run("echo", {}))["pid"] for _ in range(4)]
+        assert pids[0] == pids[1] != pids[2] == pids[3]
+        assert pool.stats()["recycled"] == 2
+
+    _with_pool(scenario, max_calls=2)
+
+@needs_limits
+def test_memory_limit_fails_large_allocations_and_replaces_the_worker():
+    async def scenario(pool):
+        before = (await pool.run("echo", {}))["pid"]
+        with pytest.raises(ToolProcessError) as error:
+            await pool.run("allocate", {"megabytes": 512}, memory_mb=128)
+        assert error.value.error_type == "MemoryError"
+        assert (await pool.run("allocate", {"megabytes": 16}, memory_mb=128)) == 16 * 1024 * 1024
+        assert (await pool.run("echo", {}))["pid"] != before
+
+    _with_pool(scenario)
+
+@needs_limits
+def test_memory_mapped_files_do_not_count_towards_the_limit(tmp_path):
+    path = tmp_path / "large.bin"
+    with open(path, "wb") as f:
+        f.truncate(512 * 1024 * 1024)
+
+    async def scenario(pool):
+        assert await pool.run("map_file", {"path": str(path)}, memory_mb=128) == 512 * 1024 * 1024
+
+    _with_pool(scenario)
+
+@needs_limits
+def test_analyze_file_maps_files_larger_than_its_memory_limit(tmp_path):
+    with open(os.path.join(PROJECT_ROOT, "tools", "tools_config.json")) as f:
+        execution = json.load(f)["execution"]
+    assert execution["tools"]["analyze_file"]["isolation"] == "process"
+    # Well above the line index's min_bytes, so analyze_file maps and indexes the whole file
+    memory_mb = 128
+    line = b"2024-01-02 12:00:00 INFO request served in 12 ms\n"
+    blocks = 3 * memory_mb * 1024 * 1024 // (1024 * len(line))
+    path = tmp_path / "large.log"
+    with open(path, "wb") as f:
+        for _ in range(blocks):
+            f.write(line * 1024)
+
+    async def scenario(pool):
+        return await pool.run("analyze_file", {"file_path": str(path)}, memory_mb=memory_mb)
+
+    analysis = _with_pool(scenario, handlers_module="Tools.tool_handlers",
+                          cpu_seconds=execution["process_pool"]["cpu_seconds"])
+    assert "error" not in analysis
+    assert analysis["result"]["size"] > 2 * memory_mb * 1024 * 1024
+    # Counted as TextStats counts them: the final newline starts an empty last line
+    assert analysis["result"]["summary"]["line_count"] == blocks * 1024 + 1
@@ -0,0 +1,177 @@
+"""
+Unit tests for the upstream admission scheduler:
+
+    python -m pytest Tests/test_scheduler.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.scheduler import AdmissionScheduler, QueueFullError, QueueTimeoutError
+from Backend.shared_state import SharedSlots
+
+async def _queue(scheduler, order, label, priority=None, session="default"):
+    """Start a waiter that records `label` once it is admitted and keeps its slot"""
+    async def wait():
+        admission = await scheduler.acquire(priority, session)
+        order.append(label)
+        return admission
+    task = asyncio.ensure_future(wait())
+    await asyncio.sleep(0)
+    return task
+
+def test_admits_up_to_max_concurrency_then_queues():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=2, max_queue=4)
+        first = await scheduler.acquire()
+        await scheduler.acquire()
+        assert scheduler.active == 2
+
+        order = []
+        waiter = await _queue(scheduler, order, "third")
+        assert scheduler.waiting == 1 and order == []
+
+        first.release()
+        await waiter
+        assert order == ["third"]
+        assert scheduler.active == 2 and scheduler.waiting == 0
+        assert scheduler.stats()["admitted"] == 3
+
+    asyncio.run(scenario())
+
+def test_release_is_idempotent():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=1)
+        admission = await scheduler.acquire()
+        admission.release()
+        admission.release()
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=1)
+        await scheduler.acquire()
+        waiter = await _queue(scheduler, [], "queued")
+
+        with pytest.raises(QueueFullError) as raised:
+            await scheduler.acquire()
+        assert raised.value.retry_after >= 1
+        assert scheduler.stats()["rejected"] == 1
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+def test_queue_timeout_removes_the_waiter():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=2, max_wait=0.05)
+        await scheduler.acquire()
+
+        with pytest.raises(QueueTimeoutError) as raised:
+            await scheduler.acquire()
+        assert raised.value.retry_after >= 1
+        assert scheduler.waiting == 0
+        assert scheduler.stats()["timed_out"] == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=2)
+        held = await scheduler.acquire()
+        waiter = await _queue(scheduler, [], "cancelled")
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.waiting == 0
+
+        held.release()
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+def test_interactive_requests_are_served_before_batch():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=4)
+        held = await scheduler.acquire()
+
+        order = []
+        batch = await _queue(scheduler, order, "batch", priority="batch")
+        interactive = await _queue(scheduler, order, "interactive", priority="interactive")
+        assert scheduler.stats()["queued_by_priority"] == {"interactive": 1, "batch": 1}
+
+        held.release()
+        (await interactive).release()
+        await batch
+        assert order == ["interactive", "batch"]
+
+    asyncio.run(scenario())
+
+def test_unknown_priority_uses_the_default_class():
+    scheduler = AdmissionScheduler(max_concurrency=1, max_queue=1, default_priority="batch")
+    assert scheduler.priority_of("urgent") == scheduler.priority_of("batch")
+
+def test_sessions_take_turns_within_a_priority_class():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=4)
+        held = await scheduler.acquire()
+
+        order = []
+        async def request(label, session):
+            async with scheduler.slot(session=session):
+                order.append(label)
+
+        waiters = []
+        for label, session in [("a1", "a"), ("a2", "a"), ("b1", "b")]:
+            waiters.append(asyncio.ensure_future(request(label, session)))
+            await asyncio.sleep(0)
+
+        held.release()
+        await asyncio.gather(*waiters)
+        assert order == ["a1", "b1", "a2"]
+
+    asyncio.run(scenario())
+
+def test_slot_context_manager_releases_on_error():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrency=1, max_queue=1)
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot():
+                assert scheduler.active == 1
+                raise RuntimeError("upstream failed")
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+def test_shared_slots_bound_admission_across_schedulers(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state.db")
+        first = AdmissionScheduler(max_concurrency=1, max_queue=1, max_wait=0.1,
+                                   shared_slots=SharedSlots(path, limit=1))
+        second = AdmissionScheduler(max_concurrency=1, max_queue=1, max_wait=0.1,
+                                    shared_slots=SharedSlots(path, limit=1))
+
+        admission = await first.acquire()
+        with pytest.raises(QueueTimeoutError):
+            await second.acquire()
+        # The local slot is handed back when the shared one times out
+        assert second.active == 0
+
+        admission.release()
+        for _ in range(50):
+            if first.shared_slots.held() == 0:
+                break
+            await asyncio.sleep(0.01)
+        (await second.acquire()).release()
+
+        first.shared_slots.close()
+        second.shared_slots.close()
+
+    asyncio.run(scenario())
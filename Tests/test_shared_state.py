@@ -0,0 +1,191 @@
+"""
+Unit tests for the state worker processes share through one SQLite database
+(multi-worker mode). Each worker has its own connection, so every test opens
+two on the same file:
+
+    python -m pytest Tests/test_shared_state.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.response_cache import ResponseCache
+from Backend.scheduler import AdmissionScheduler, QueueTimeoutError
+from Backend.shared_state import SharedJobStore, SharedSlots
+
+COMPLETION = {"id": "chatcmpl-1", "choices": [{"message": {"role": "assistant", "content": "cached"}}]}
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "proxy_state.db")
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def _snapshot(job_id, status="running"):
+    return {"id": job_id, "name": "analyze_file", "status": status, "created": time.time(),
+            "progress": {"done": 1, "total": 2, "message": None}, "partial_results": 1}
+
+def test_database_uses_wal(state_path):
+    slots = SharedSlots(state_path, limit=1)
+    assert slots.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    slots.close()
+
+def test_slots_are_shared_between_connections(state_path):
+    first, second = SharedSlots(state_path, limit=2), SharedSlots(state_path, limit=2)
+    lease = first.try_acquire()
+    assert second.try_acquire() is not None
+    assert first.try_acquire() is None and second.try_acquire() is None
+    assert first.held() == second.held() == 2
+
+    first.release(lease)
+    assert second.held() == 1
+    assert second.try_acquire() is not None
+    first.close()
+    second.close()
+
+def test_slot_names_are_counted_separately(state_path):
+    upstream, other = SharedSlots(state_path, limit=1), SharedSlots(state_path, limit=1, name="other")
+    assert upstream.try_acquire() is not None
+    assert other.try_acquire() is not None
+    upstream.close()
+    other.close()
+
+def test_waiting_for_a_slot_another_connection_frees(state_path):
+    async def scenario():
+        first, second = SharedSlots(state_path, limit=1), SharedSlots(state_path, limit=1, poll_interval=0.01)
+        lease = first.try_acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await second.acquire(timeout=0.05)
+
+        waiter = asyncio.ensure_future(second.acquire(timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        first.release(lease)
+        assert await waiter is not None
+        first.close()
+        second.close()
+
+    asyncio.run(scenario())
+
+def test_leases_of_dead_processes_are_reclaimed(state_path):
+    slots = SharedSlots(state_path, limit=1)
+    slots.db.execute(
+        "INSERT INTO slot_leases (token, name, pid, acquired) VALUES ('stale', 'upstream', ?, ?)",
+        (_dead_pid(), time.time())
+    )
+    assert slots.held() == 1
+    assert slots.try_acquire() is not None
+    assert slots.held() == 1
+    slots.close()
+
+def test_schedulers_share_one_upstream_limit(state_path):
+    async def scenario():
+        workers = [
+            AdmissionScheduler(max_concurrency=2, max_queue=4, max_wait=0.1,
+                               shared_slots=SharedSlots(state_path, limit=2, poll_interval=0.01))
+            for _ in range(2)
+        ]
+        held = [await workers[0].acquire(), await workers[1].acquire()]
+        # The second worker has a local slot free, but the total across workers is reached
+        with pytest.raises(QueueTimeoutError):
+            await workers[1].acquire()
+        assert workers[0].stats()["shared_active"] == 2
+
+        held[0].release()
+        await asyncio.sleep(0.05)
+        admission = await workers[1].acquire()
+        admission.release()
+        held[1].release()
+        await asyncio.sleep(0.05)
+        assert workers[0].stats()["shared_active"] == 0
+        for worker in workers:
+            worker.shared_slots.close()
+
+    asyncio.run(scenario())
+
+def test_response_cache_entries_are_shared(state_path):
+    async def scenario():
+        first = ResponseCache(max_bytes=1 << 20, ttl=60, disk_path=state_path)
+        second = ResponseCache(max_bytes=1 << 20, ttl=60, disk_path=state_path)
+        assert await second.get("key") is None
+        await first.put("key", COMPLETION)
+        assert await second.get("key") == COMPLETION
+        assert second.stats()["hits"] == 1
+        first.close()
+        second.close()
+
+    asyncio.run(scenario())
+
+def test_response_cache_entries_expire(state_path, monkeypatch):
+    async def scenario():
+        first = ResponseCache(max_bytes=1 << 20, ttl=60, disk_path=state_path)
+        second = ResponseCache(max_bytes=1 << 20, ttl=60, disk_path=state_path)
+        await first.put("key", COMPLETION)
+
+        now = time.time()
+        monkeypatch.setattr("Backend.response_cache.time.time", lambda: now + 61)
+        assert await first.get("key") is None
+        assert await second.get("key") is None
+        # Expired rows are deleted when a worker opens the file
+        third = ResponseCache(max_bytes=1 << 20, ttl=60, disk_path=state_path)
+        assert third.disk.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+        for cache in (first, second, third):
+            cache.close()
+
+    asyncio.run(scenario())
+
+def test_jobs_are_visible_to_other_connections(state_path):
+    owner, other = SharedJobStore(state_path), SharedJobStore(state_path)
+    owner.save(_snapshot("job-1"), event={"seq": 0, "event": "status", "status": "running"}, partials=["page 1"])
+    owner.save(_snapshot("job-1"), event={"seq": 1, "event": "progress", "done": 2}, partials=["page 2"],
+               first_partial=1)
+
+    assert other.load("job-1")["status"] == "running"
+    assert [event["seq"] for event in other.events_after("job-1", 0)] == [1]
+    assert other.partials("job-1") == ["page 1", "page 2"]
+    assert other.active_count() == 1
+    assert [job["id"] for job in other.list()] == ["job-1"]
+
+    # Cancelling through another worker flags the job for its owner
+    assert owner.cancel_requests() == []
+    other.request_cancel("job-1")
+    assert owner.cancel_requests() == ["job-1"]
+    assert other.load("job-1")["cancel_requested"] is True
+    owner.close()
+    other.close()
+
+def test_finished_jobs_expire_with_their_events(state_path):
+    owner, other = SharedJobStore(state_path), SharedJobStore(state_path)
+    owner.save(_snapshot("kept", "succeeded"), expires_at=time.time() + 60)
+    owner.save(_snapshot("expired", "succeeded"), expires_at=time.time() - 1,
+               event={"seq": 0, "event": "status", "status": "succeeded"}, partials=["partial"])
+
+    assert other.load("expired") is None
+    assert [job["id"] for job in other.list()] == ["kept"]
+    other.purge()
+    for table, column in (("jobs", "id"), ("job_events", "job_id"), ("job_partials", "job_id")):
+        assert owner.db.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} = 'expired'").fetchone()[0] == 0
+    assert owner.load("kept")["status"] == "succeeded"
+    owner.close()
+    other.close()
+
+def test_jobs_of_dead_workers_are_reported_failed(state_path):
+    store = SharedJobStore(state_path)
+    store.save(_snapshot("orphan"))
+    store.db.execute("UPDATE jobs SET owner_pid = ? WHERE id = 'orphan'", (_dead_pid(),))
+
+    snapshot = store.load("orphan")
+    assert snapshot["status"] == "failed"
+    assert "exited while running the job" in snapshot["error"]
+    assert store.active_count() == 0
+    store.close()
@@ -0,0 +1,119 @@
+"""
+Unit tests for the SSE helpers and the streamed completion accumulator:
+
+    python -m pytest Tests/test_sse.py
+"""
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.sse import SSE_DONE, CompletionAccumulator, completion_to_sse, format_sse
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 1700000000,
+    "model": "local-model",
+    "choices": [{
+        "index": 0,
+        "message": {
+            "role": "assistant",
+            "content": "Looking it up.",
+            "tool_calls": [{
+                "id": "call_1",
+                "type": "function",
+                "function": {"name": "web_search", "arguments": "{\"query\": \"feanor\"}"}
+            }]
+        },
+        "finish_reason": "tool_calls"
+    }],
+    "usage": {"prompt_tokens": 12, "completion_tokens": 7, "total_tokens": 19}
+}
+
+def _chunk(delta, finish_reason=None, **extra):
+    event = {
+        "id": "chatcmpl-2",
+        "object": "chat.completion.chunk",
+        "created": 1700000001,
+        "model": "local-model",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extra
+    }
+    return format_sse(event)
+
+def test_format_sse_names_and_numbers_events():
+    assert format_sse("[DONE]") == b"data: [DONE]\n\n"
+    assert format_sse({"a": 1}, event="progress", event_id=3) == b'event: progress\nid: 3\ndata: {"a":1}\n\n'
+
+def test_accumulator_rebuilds_content_split_across_chunks():
+    stream = b"".join([
+        _chunk({"role": "assistant"}),
+        _chunk({"content": "Hello"}),
+        # Upstreams may send raw UTF-8 rather than \u escapes
+        'data: {"choices":[{"index":0,"delta":{"content":", wörld"}}]}\n\n'.encode('utf-8'),
+        _chunk({}, finish_reason="stop", usage={"total_tokens": 5}),
+        SSE_DONE
+    ])
+
+    accumulator = CompletionAccumulator()
+    events = []
+    # Feed byte by byte so events and multi-byte characters are split at every position
+    for position in range(len(stream)):
+        events.extend(accumulator.feed(stream[position:position + 1]))
+
+    assert len(events) == 4
+    assert accumulator.done and accumulator.is_complete
+    completion = accumulator.to_completion()
+    assert completion["id"] == "chatcmpl-2"
+    assert completion["object"] == "chat.completion"
+    assert completion["choices"] == [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "Hello, wörld"},
+        "finish_reason": "stop"
+    }]
+    assert completion["usage"] == {"total_tokens": 5}
+
+def test_accumulator_merges_tool_call_argument_fragments():
+    accumulator = CompletionAccumulator()
+    accumulator.feed(_chunk({"tool_calls": [
+        {"index": 0, "id": "call_a", "function": {"name": "read_file", "arguments": "{\"file_"}}
+    ]}))
+    accumulator.feed(_chunk({"tool_calls": [
+        {"index": 1, "id": "call_b", "function": {"name": "web_search", "arguments": "{}"}},
+        {"index": 0, "function": {"arguments": "path\": \"a.txt\"}"}}
+    ]}))
+    accumulator.feed(_chunk({}, finish_reason="tool_calls"))
+
+    calls = accumulator.to_completion()["choices"][0]["message"]["tool_calls"]
+    assert [call["id"] for call in calls] == ["call_a", "call_b"]
+    assert json.loads(calls[0]["function"]["arguments"]) == {"file_path": "a.txt"}
+    assert calls[1]["function"]["name"] == "web_search"
+
+def test_accumulator_ignores_comments_and_malformed_events():
+    accumulator = CompletionAccumulator()
+    events = accumulator.feed(b": keep-alive\n\ndata: {not json\n\n" + _chunk({"content": "ok"}))
+    assert len(events) == 1
+    assert accumulator.to_completion()["choices"][0]["message"]["content"] == "ok"
+
+def test_truncated_stream_is_not_complete():
+    accumulator = CompletionAccumulator()
+    accumulator.feed(_chunk({"content": "partial"}))
+    assert not accumulator.is_complete
+    assert not accumulator.done
+    assert not CompletionAccumulator().is_complete
+
+def test_completion_round_trips_through_sse():
+    accumulator = CompletionAccumulator()
+    for event in completion_to_sse(COMPLETION):
+        accumulator.feed(event)
+
+    assert accumulator.done and accumulator.is_complete
+    rebuilt = accumulator.to_completion()
+    assert rebuilt["choices"][0]["message"]["content"] == "Looking it up."
+    assert rebuilt["choices"][0]["finish_reason"] == "tool_calls"
+    assert rebuilt["choices"][0]["message"]["tool_calls"][0]["function"] == COMPLETION["choices"][0]["message"]["tool_calls"][0]["function"]
+    assert rebuilt["usage"] == COMPLETION["usage"]
+    assert (rebuilt["id"], rebuilt["model"], rebuilt["created"]) == ("chatcmpl-1", "local-model", 1700000000)
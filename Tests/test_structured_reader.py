@@ -0,0 +1,196 @@
+"""
+Unit tests for the CSV, JSON and JSONL row readers and row queries:
+
+    python -m pytest Tests/test_structured_reader.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Tools.Utilities.content_cache import ContentCache
+from Tools.Utilities.file_reader import FileReader
+from Tools.Utilities.line_index import LineIndexStore
+from Tools.Utilities.structured_reader import StructuredReader, cell_value, compile_where
+
+RECORDS = [
+    {"id": 1, "name": "Alice", "score": 9.5, "joined": "2024-01-02", "active": True},
+    {"id": 2, "name": "Bob", "score": None, "joined": "2024-02-03", "active": False},
+    {"id": 3, "name": "Carol", "score": 7, "joined": "2024-03-04", "active": True}
+]
+
+CSV_TEXT = (
+    "id,name,score,joined,active\n"
+    "1,Alice,9.5,2024-01-02,true\n"
+    "2,Bob,,2024-02-03,false\n"
+    "3,Carol,7,2024-03-04,true\n"
+)
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def _rows(reader, path, file_format):
+    with reader.open(path, "utf-8") as f:
+        return list(reader.rows(f, file_format))
+
+def _columns(schema):
+    return {column["name"]: column for column in schema["columns"]}
+
+@pytest.fixture
+def reader():
+    return StructuredReader()
+
+@pytest.fixture(params=["csv", "json", "jsonl"])
+def table(request, tmp_path):
+    """The same three records as a CSV, JSON array or JSON Lines file"""
+    if request.param == "csv":
+        return _write(tmp_path, "people.csv", CSV_TEXT)
+    if request.param == "json":
+        return _write(tmp_path, "people.json", json.dumps(RECORDS, indent=2))
+    return _write(tmp_path, "people.jsonl", "".join(json.dumps(record) + "\n" for record in RECORDS))
+
+def test_every_format_reads_the_same_rows(reader, table):
+    file_format = os.path.splitext(table)[1][1:]
+    assert _rows(reader, table, file_format) == RECORDS
+
+def test_schema_infers_types_nulls_and_ranges(reader, table):
+    schema = reader.schema(table, "utf-8")
+    assert (schema["row_count"], schema["row_count_estimated"], schema["sampled_rows"]) == (3, False, 3)
+    columns = _columns(schema)
+    assert list(columns) == ["id", "name", "score", "joined", "active"]
+    assert columns["id"]["type"] == "integer"
+    assert (columns["id"]["min"], columns["id"]["max"]) == (1, 3)
+    assert columns["score"]["type"] == "number"
+    assert columns["score"]["null_rate"] == round(1 / 3, 4)
+    assert columns["joined"]["type"] == "date"
+    assert columns["active"]["type"] == "boolean"
+    assert columns["name"]["examples"] == ["Alice", "Bob", "Carol"]
+
+def test_schema_estimates_the_row_count_beyond_the_sample(tmp_path):
+    path = _write(tmp_path, "many.csv", "n,label\n" + "".join(f"{number % 10},row {number % 10} of the table\n"
+                                                             for number in range(20000)))
+    schema = StructuredReader(sample_rows=1000).schema(path, "utf-8")
+    assert schema["sampled_rows"] == 1000
+    assert schema["row_count_estimated"]
+    # The stream reads ahead of the sample, so the estimate is somewhat low
+    assert 15000 < schema["row_count"] <= 20000
+
+def test_header_only_csv_keeps_its_columns(reader, tmp_path):
+    path = _write(tmp_path, "empty.csv", "id,name\n")
+    schema = reader.schema(path, "utf-8")
+    assert schema["row_count"] == 0
+    assert [(column["name"], column["type"]) for column in schema["columns"]] == [("id", "unknown"), ("name", "unknown")]
+
+def test_csv_dialects_and_ragged_rows(reader, tmp_path):
+    path = _write(tmp_path, "ragged.tsv", "a\t\ta\n1\t2\n4\t5\t6\t7\n")
+    assert _rows(reader, path, "csv") == [
+        {"a": 1, "column_2": 2, "a_3": None},
+        {"a": 4, "column_2": 5, "a_3": 6, "column_4": 7}
+    ]
+
+def test_cell_values():
+    assert cell_value(" 42 ") == 42
+    assert cell_value("-1.5e3") == -1500.0
+    assert cell_value("007") == "007"
+    assert cell_value("N/A") is None
+    assert cell_value("TRUE") is True
+
+def test_json_array_is_streamed_in_small_chunks(tmp_path):
+    records = [{"id": number, "text": "x" * (number % 7), "value": number * 1.5} for number in range(200)]
+    path = _write(tmp_path, "large.json", json.dumps(records))
+    reader = StructuredReader(chunk_chars=16)
+    assert _rows(reader, path, "json") == records
+
+def test_json_document_rows_come_from_its_first_record_list(reader, tmp_path):
+    path = _write(tmp_path, "wrapped.json", json.dumps({"meta": {"page": 1}, "items": RECORDS}))
+    assert _rows(reader, path, "json") == RECORDS
+
+def test_scalars_become_value_rows(reader, tmp_path):
+    path = _write(tmp_path, "scalars.jsonl", "1\n\n\"two\"\n")
+    assert _rows(reader, path, "jsonl") == [{"value": 1}, {"value": "two"}]
+
+@pytest.mark.parametrize("name, text, message", [
+    ("broken.jsonl", '{"id": 1}\n{"id": \n', "Invalid JSON on line 2"),
+    ("broken.json", '[{"id": 1}, {"id": ', "Invalid JSON"),
+    ("open.json", '[{"id": 1}', "the array is not closed")
+])
+def test_malformed_files_raise_value_errors(reader, tmp_path, name, text, message):
+    path = _write(tmp_path, name, text)
+    with pytest.raises(ValueError, match=message):
+        _rows(reader, path, os.path.splitext(name)[1][1:])
+
+def test_where_conditions():
+    matches = compile_where([
+        {"column": "score", "op": ">=", "value": 7},
+        {"column": "name", "op": "in", "value": ["Alice", "Carol"]}
+    ])
+    assert [matches(record) for record in RECORDS] == [True, False, True]
+    # Values that cannot be compared do not match
+    assert not compile_where([{"column": "name", "op": ">", "value": 1}])(RECORDS[0])
+    with pytest.raises(ValueError, match="Unknown operator"):
+        compile_where([{"column": "name", "op": "~"}])
+    with pytest.raises(ValueError, match="needs a value"):
+        compile_where([{"column": "name", "op": "=="}])
+
+def test_query_pages_through_matching_rows(reader, table):
+    where = [{"column": "active", "op": "==", "value": True}]
+    first = reader.query(table, "utf-8", columns=["name"], where=where, row_limit=1)
+    assert first["rows"] == [{"name": "Alice"}]
+    assert first["next_row_offset"] == 1
+
+    second = reader.query(table, "utf-8", columns=["name"], where=where, row_offset=1, row_limit=1)
+    assert second["rows"] == [{"name": "Carol"}]
+    assert second["next_row_offset"] is None
+
+def test_read_file_row_queries(tmp_path):
+    reader = FileReader(cache=ContentCache(), line_indexes=LineIndexStore(min_bytes=2 ** 62))
+    path = _write(tmp_path, "people.csv", CSV_TEXT)
+
+    result = reader.read_file(path, columns=["id"], where=[{"column": "score", "op": "is_null"}])
+    assert result["rows"] == [{"id": 2}]
+    assert result["schema"]["row_count"] == 3
+
+    assert reader.read_file(path, columns=["email"]).startswith("Error: Unknown column(s) ['email']")
+    assert reader.read_file(path, columns=["id"], tail=1).startswith("Error: Give either")
+    notes = _write(tmp_path, "notes.txt", "text")
+    assert reader.read_file(notes, row_limit=1) == "Error: Rows can only be read from CSV, JSON and JSONL files, not .txt"
+
+def _large_file_reader(max_document_bytes):
+    """A reader whose large-file thresholds are scaled down to a few hundred bytes"""
+    return FileReader(cache=ContentCache(), max_read_bytes=64, max_full_read_bytes=256,
+                      line_indexes=LineIndexStore(min_bytes=2 ** 62),
+                      structured=StructuredReader(chunk_chars=32, max_document_bytes=max_document_bytes))
+
+def test_large_json_array_is_paged_by_rows(tmp_path):
+    path = _write(tmp_path, "large.json", json.dumps(RECORDS * 10))
+    result = _large_file_reader(max_document_bytes=10 ** 6).read_file(path)
+    assert result["format"] == "json"
+    assert result["rows"][:3] == RECORDS
+    assert result["schema"]["row_count"] == 30
+
+@pytest.mark.parametrize("max_document_bytes", [10 ** 6, 512], ids=["under_document_limit", "over_document_limit"])
+def test_large_json_document_is_read_as_a_range(tmp_path, max_document_bytes):
+    path = _write(tmp_path, "large.json", json.dumps({"settings": {"name": "x" * 2000}}, indent=2))
+    assert os.path.getsize(path) > 256
+    if max_document_bytes == 512:
+        assert os.path.getsize(path) > max_document_bytes
+
+    result = _large_file_reader(max_document_bytes).read_file(path)
+    # A bounded first chunk to continue from, not one huge row or a streaming error
+    assert (result["offset"], result["end_offset"]) == (0, 64)
+    assert result["truncated"]
+    assert result["content"].startswith('{\n  "settings"')
+
+def test_streamable_formats(reader, tmp_path):
+    assert reader.streamable(_write(tmp_path, "array.json", '﻿ \n [1, 2]'), "utf-8")
+    assert not reader.streamable(_write(tmp_path, "document.json", '{"rows": [1]}'), "utf-8")
+    assert not reader.streamable(_write(tmp_path, "empty.json", "  \n"), "utf-8")
+    assert reader.streamable(_write(tmp_path, "rows.jsonl", '{"a": 1}\n'), "utf-8")
+    assert reader.streamable(_write(tmp_path, "rows.csv", "a\n1\n"), "utf-8")
+    assert not reader.streamable(_write(tmp_path, "notes.txt", "[1]"), "utf-8")
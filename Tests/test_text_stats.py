@@ -0,0 +1,125 @@
+"""
+Parity tests for the streaming line, word and character counts (TextStats and
+FileReader.scan_text) against the counts analyze_file used to take from the
+whole decoded file: len(content.split('\\n')), len(content.split()) and
+len(content):
+
+    python -m pytest Tests/test_text_stats.py
+"""
+import codecs
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Tools.Utilities.content_cache import ContentCache
+from Tools.Utilities.file_reader import FileReader, TextStats
+from Tools.Utilities.line_index import LineIndexStore
+
+TEXTS = {
+    "lf": "first line\nsecond line\n\nfourth",
+    "crlf": "first line\r\nsecond line\r\n\r\nfourth",
+    "lone_cr": "first line\rsecond line\r\rfourth",
+    "mixed": "a\r\nb\rc\nd\r",
+    "trailing_newline": "one two\nthree\n",
+    "only_newlines": "\n\r\n\r",
+    "multibyte": "héllo wörld\n日本語 テキスト\r\nemoji 🎉 end",
+    "unicode_whitespace": "no break em　space\nline separator",
+    "ascii_separators": "file\x1cgroup\x1drecord\x1eunit\x1fend",
+    "empty": ""
+}
+
+def _old_counts(content):
+    """The counts analyze_file took from the whole file read in text mode"""
+    return {
+        "line_count": len(content.split('\n')) if content else 0,
+        "char_count": len(content) if content else 0,
+        "word_count": len(content.split()) if content else 0
+    }
+
+def _read_text_mode(path, encoding):
+    with open(path, 'r', encoding=encoding) as f:
+        return f.read()
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+@pytest.mark.parametrize("name", TEXTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 64])
+def test_byte_chunks_match_the_old_counts(name, size):
+    text = TEXTS[name]
+    stats = TextStats()
+    for chunk in _chunks(text.encode("utf-8"), size):
+        stats.add(chunk)
+    # Universal newlines, as the old text-mode read saw the file
+    assert stats.summary() == _old_counts(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+@pytest.mark.parametrize("name", TEXTS)
+@pytest.mark.parametrize("size", [1, 3])
+def test_text_chunks_match_the_old_counts(name, size):
+    text = TEXTS[name]
+    stats = TextStats()
+    for chunk in _chunks(text, size):
+        stats.add(chunk)
+    assert stats.summary() == _old_counts(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+def test_crlf_split_across_chunks_is_one_line_break():
+    stats = TextStats()
+    for chunk in (b"a\r", b"\nb"):
+        stats.add(chunk)
+    assert stats.summary() == {"line_count": 2, "char_count": 3, "word_count": 2}
+
+def test_multibyte_character_split_across_chunks():
+    encoded = "é".encode("utf-8")
+    stats = TextStats(errors="strict")
+    stats.add(b"caf" + encoded[:1])
+    stats.add(encoded[1:] + b" ok")
+    assert stats.summary() == {"line_count": 1, "char_count": 7, "word_count": 2}
+
+def _reader(**options):
+    """A reader that streams every file in tiny chunks, so boundaries fall everywhere"""
+    return FileReader(cache=ContentCache(), line_indexes=LineIndexStore(min_bytes=2 ** 62), **options)
+
+@pytest.mark.parametrize("name", [name for name in TEXTS if name != "empty"])
+@pytest.mark.parametrize("encoding, file_encoding", [
+    ("utf-8", "utf-8"),
+    ("utf-8-sig", "utf-8-sig"),
+    ("utf-16", "utf-16"),
+    ("utf-16-le", "utf-16")
+], ids=["utf-8", "utf-8-bom", "utf-16-bom", "utf-16-le-bom"])
+def test_analyze_file_matches_the_old_counts(tmp_path, name, encoding, file_encoding):
+    path = tmp_path / f"{name}.txt"
+    raw = TEXTS[name].encode(encoding)
+    if encoding == "utf-16-le":
+        raw = codecs.BOM_UTF16_LE + raw
+    path.write_bytes(raw)
+
+    analysis = _reader(chunk_bytes=3, sample_bytes=4).analyze_file(str(path))["result"]
+    assert analysis["summary"] == _old_counts(_read_text_mode(path, file_encoding))
+    assert analysis["content"] == _read_text_mode(path, file_encoding)
+
+@pytest.mark.parametrize("chunk_bytes", [1, 2, 3, 7])
+def test_scan_text_counts_utf8_split_across_chunks(tmp_path, chunk_bytes):
+    path = tmp_path / "multibyte.txt"
+    path.write_bytes(TEXTS["multibyte"].encode("utf-8"))
+    reader = _reader(chunk_bytes=chunk_bytes)
+    with open(path, "rb") as f:
+        sample = f.read(chunk_bytes)
+        content, summary, all_ascii = reader.scan_text(f, sample, "utf-8", os.path.getsize(path))
+    expected = _read_text_mode(path, "utf-8")
+    assert summary == _old_counts(expected)
+    assert content == expected
+    assert not all_ascii
+
+def test_scan_text_keeps_counting_past_the_content_head(tmp_path):
+    path = tmp_path / "long.txt"
+    text = "word " * 1000 + "\r\n" + "é" * 500 + "\rend\n"
+    path.write_bytes(text.encode("utf-8"))
+    reader = _reader(chunk_bytes=7, sample_bytes=8, max_content_chars=100)
+    result = reader.analyze_file(str(path))["result"]
+    assert result["summary"] == _old_counts(_read_text_mode(path, "utf-8"))
+    assert result["content_truncated"]
+    assert result["content"] == "word " * 20
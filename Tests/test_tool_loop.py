@@ -0,0 +1,54 @@
+"""
+Unit tests for the server-side tool loop against an in-process fake model
+server (httpx.MockTransport):
+
+    python -m pytest Tests/test_tool_loop.py
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend import lmstudio_proxy as proxy
+from Backend.upstreams import Upstream, UpstreamPool
+
+BODY = {"model": "local-model", "messages": [{"role": "user", "content": "How many lines does notes.txt have?"}]}
+
+@pytest.fixture
+def node(monkeypatch):
+    """A single upstream, so every round goes to it"""
+    node = Upstream("a", "http://a")
+    monkeypatch.setattr(proxy, "upstream_pool", UpstreamPool([node], retries=0))
+    return node
+
+def _run_loop(handler, max_rounds=2):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await proxy.run_tool_loop(client, dict(BODY), max_rounds, "interactive", "test")
+    return asyncio.run(run())
+
+def _answer(content):
+    return {"choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+def test_final_answer_is_returned(node):
+    assert _run_loop(lambda request: httpx.Response(200, json=_answer("42")))["choices"][0]["message"]["content"] == "42"
+    assert (node.requests, node.failures, node.outstanding) == (1, 0, 0)
+
+def test_client_errors_keep_their_status_and_body(node):
+    with pytest.raises(proxy.UpstreamError) as error:
+        _run_loop(lambda request: httpx.Response(400, json={"error": "context length exceeded"}))
+    assert error.value.status_code == 400
+    assert "context length exceeded" in error.value.detail
+    # The node answered; the request was at fault
+    assert (node.failures, node.consecutive_failures, node.outstanding) == (0, 0, 0)
+
+def test_server_errors_count_against_the_node(node):
+    with pytest.raises(proxy.UpstreamError) as error:
+        _run_loop(lambda request: httpx.Response(501, text="tools are not supported"))
+    assert (error.value.status_code, error.value.detail) == (501, "tools are not supported")
+    assert (node.failures, node.consecutive_failures, node.outstanding) == (1, 1, 0)
@@ -0,0 +1,133 @@
+"""
+Unit tests for the precompiled tool parameter validators:
+
+    python -m pytest Tests/test_tool_validation.py
+"""
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend.tool_validation import ToolValidationError, compile_schema, compile_validators
+from Tools.tool_handlers import TOOL_SCHEMAS
+
+SCHEMAS = [{
+    "type": "function",
+    "function": {
+        "name": "search",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "minLength": 1, "maxLength": 20},
+                "url": {"type": "string", "pattern": "^https?://"},
+                "limit": {"type": "integer", "minimum": 1, "maximum": 10},
+                "mode": {"type": "string", "enum": ["fast", "thorough"]},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "options": {
+                    "type": "object",
+                    "properties": {"strict": {"type": "boolean"}},
+                    "additionalProperties": {"type": "number"}
+                }
+            },
+            "required": ["query"]
+        }
+    }
+}, {
+    "type": "function",
+    "function": {"name": "ping"}
+}]
+
+VALIDATORS = compile_validators(SCHEMAS)
+
+def _errors(params, tool="search"):
+    with pytest.raises(ToolValidationError) as raised:
+        VALIDATORS[tool](params)
+    assert raised.value.tool == tool
+    return raised.value.errors
+
+def test_valid_parameters_pass():
+    VALIDATORS["search"]({
+        "query": "elves",
+        "url": "https://example.com",
+        "limit": 3,
+        "mode": "fast",
+        "tags": ["a", "b"],
+        "options": {"strict": True, "weight": 0.5}
+    })
+    VALIDATORS["ping"]({})
+
+def test_missing_parameter_points_at_the_misspelt_key():
+    missing, unexpected = _errors({"querry": "elves"})
+    assert missing["type"] == "missing"
+    assert missing["loc"] == ["query"]
+    assert missing["got"] == "querry"
+    assert unexpected["type"] == "unexpected"
+    assert unexpected["suggestion"] == "query"
+
+def test_unknown_parameter_suggests_the_closest_name():
+    [error] = _errors({"query": "elves", "limt": 3})
+    assert error["type"] == "unexpected"
+    assert error["loc"] == ["limt"]
+    assert error["suggestion"] == "limit"
+
+def test_tool_without_parameters_rejects_arguments():
+    [error] = _errors({"host": "localhost"}, tool="ping")
+    assert error["type"] == "unexpected"
+
+@pytest.mark.parametrize("params, error_type, location", [
+    ({"query": 5}, "type", ["query"]),
+    ({"query": ""}, "too_short", ["query"]),
+    ({"query": "x" * 21}, "too_long", ["query"]),
+    ({"query": "q", "url": "ftp://example.com"}, "pattern", ["url"]),
+    ({"query": "q", "limit": 0}, "minimum", ["limit"]),
+    ({"query": "q", "limit": 11}, "maximum", ["limit"]),
+    ({"query": "q", "limit": True}, "type", ["limit"]),
+    ({"query": "q", "limit": 2.5}, "type", ["limit"]),
+    ({"query": "q", "tags": ["a", 1]}, "type", ["tags", 1]),
+    ({"query": "q", "options": {"strict": "yes"}}, "type", ["options", "strict"]),
+    ({"query": "q", "options": {"weight": "heavy"}}, "type", ["options", "weight"])
+])
+def test_constraint_violations(params, error_type, location):
+    [error] = _errors(params)
+    assert error["type"] == error_type
+    assert error["loc"] == location
+
+def test_enum_suggests_the_closest_value():
+    [error] = _errors({"query": "q", "mode": "thorogh"})
+    assert error["type"] == "enum"
+    assert error["suggestion"] == "thorough"
+
+def test_every_violation_is_reported_in_the_message():
+    with pytest.raises(ToolValidationError) as raised:
+        VALIDATORS["search"]({"limit": 0, "mode": "slow"})
+    assert len(raised.value.errors) == 3
+    message = str(raised.value)
+    assert message.startswith("Invalid parameters for search: ")
+    assert "query: missing required parameter 'query'" in message
+    assert "limit: must be >= 1" in message
+
+def test_non_object_parameters_are_rejected():
+    [error] = _errors(["elves"])
+    assert error["type"] == "type"
+    assert error["loc"] == []
+
+def test_union_types():
+    check = compile_schema({"type": ["string", "null"]})
+    errors = []
+    check(None, (), errors)
+    check("text", (), errors)
+    assert errors == []
+    check(1, (), errors)
+    assert errors[0]["msg"] == "expected string or null, got integer"
+
+def test_built_in_tool_schemas_compile():
+    validators = compile_validators(TOOL_SCHEMAS)
+    assert set(validators) == {schema["function"]["name"] for schema in TOOL_SCHEMAS}
+
+    validators["read_pdf"]({"pdf_path": "paper.pdf"})
+    with pytest.raises(ToolValidationError) as raised:
+        validators["read_pdf"]({"pdf": "paper.pdf"})
+    assert raised.value.errors[0]["got"] == "pdf"
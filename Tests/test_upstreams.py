@@ -0,0 +1,197 @@
+"""
+Unit tests for upstream routing, ejection, health checks and retries on
+another node, against in-process fake model servers (httpx.MockTransport):
+
+    python -m pytest Tests/test_upstreams.py
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from Backend import lmstudio_proxy as proxy
+from Backend.upstreams import NoUpstreamAvailable, Upstream, UpstreamPool
+
+def _models_transport(down=()):
+    """Answer /v1/models for every node except those whose host is in `down`"""
+    def handler(request):
+        if request.url.host in down:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"data": [{"id": f"model-{request.url.host}"}]})
+    return httpx.MockTransport(handler)
+
+def _check_all(pool, transport):
+    async def check():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await pool.check_all(client)
+    return asyncio.run(check())
+
+def test_health_is_unknown_until_the_first_check():
+    pool = UpstreamPool([Upstream("a", "http://a"), Upstream("b", "http://b")])
+    snapshot = pool.health_snapshot()
+    assert snapshot["connected"] is False
+    assert snapshot["checked"] is False
+    assert [node["healthy"] for node in snapshot["upstreams"]] == [None, None]
+
+    assert _check_all(pool, _models_transport(down={"a"}))
+    snapshot = pool.health_snapshot()
+    assert snapshot["connected"] is True
+    assert snapshot["checked"] is True
+    assert [node["healthy"] for node in snapshot["upstreams"]] == [False, True]
+    assert [model["id"] for model in pool.models_snapshot()] == ["model-b"]
+
+def test_all_nodes_down_is_not_connected():
+    pool = UpstreamPool([Upstream("a", "http://a")])
+    assert not _check_all(pool, _models_transport(down={"a"}))
+    assert pool.health_snapshot()["connected"] is False
+
+def _fail(pool, node, times, status_code=None):
+    for _ in range(times):
+        pool.start(node)
+        pool.finish(node, False, status_code=status_code)
+
+def test_least_outstanding_node_is_chosen():
+    a, b, c = Upstream("a", "http://a"), Upstream("b", "http://b"), Upstream("c", "http://c", weight=2)
+    pool = UpstreamPool([a, b, c])
+    pool.start(a)
+    pool.start(b)
+    pool.start(b)
+    # c carries one request at twice the weight: the lightest relative load
+    pool.start(c)
+    assert pool.choose(None) is c
+    pool.start(c)
+    pool.start(c)
+    assert pool.choose(None) is a
+    assert pool.choose(None, exclude={"a"}) is c
+
+    pool.finish(b, True)
+    pool.finish(b, True)
+    assert pool.choose(None) is b
+
+def test_full_nodes_are_skipped():
+    a, b = Upstream("a", "http://a", max_outstanding=1), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b])
+    pool.start(a)
+    for _ in range(3):
+        pool.start(b)
+    assert pool.choose(None) is b
+
+def test_consecutive_failures_eject_a_node():
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b], eject_after_failures=3, eject_seconds=60)
+    # b is busier, so a is chosen for as long as it is in rotation
+    pool.start(b)
+    _fail(pool, a, 2)
+    # A success in between resets the count
+    pool.start(a)
+    pool.finish(a, True)
+    _fail(pool, a, 2)
+    assert pool.choose(None) is a
+    _fail(pool, a, 1)
+    assert pool.stats()[0]["ejected_for"] > 0
+    assert [pool.choose(None) for _ in range(5)] == [b] * 5
+
+    with pytest.raises(NoUpstreamAvailable) as error:
+        pool.choose(None, exclude={"b"})
+    assert 55 <= error.value.retry_after <= 60
+
+def test_overloaded_node_is_ejected_at_once_for_its_retry_after():
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b], eject_after_failures=3)
+    pool.start(a)
+    pool.finish(a, False, status_code=429, retry_after=30)
+    assert 29 <= pool.stats()[0]["ejected_for"] <= 30
+    assert pool.choose(None) is b
+
+def test_ejection_ends_after_its_backoff(monkeypatch):
+    a = Upstream("a", "http://a")
+    pool = UpstreamPool([a], eject_after_failures=1, eject_seconds=10, max_eject_seconds=15)
+    now = [1000.0]
+    monkeypatch.setattr("Backend.upstreams.time.monotonic", lambda: now[0])
+
+    _fail(pool, a, 1)
+    with pytest.raises(NoUpstreamAvailable):
+        pool.choose(None)
+    now[0] += 10
+    assert pool.choose(None) is a
+
+    # Failing again right away doubles the ejection, up to max_eject_seconds
+    _fail(pool, a, 1)
+    assert a.ejected_until == now[0] + 15
+    now[0] += 15
+    pool.start(a)
+    pool.finish(a, True)
+    _fail(pool, a, 1)
+    assert a.ejected_until == now[0] + 10
+
+def test_node_is_readmitted_after_a_successful_check():
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b])
+    _check_all(pool, _models_transport(down={"a"}))
+    assert [pool.choose(None) for _ in range(5)] == [b] * 5
+    with pytest.raises(NoUpstreamAvailable):
+        pool.choose(None, exclude={"b"})
+
+    _check_all(pool, _models_transport())
+    assert pool.choose(None, exclude={"b"}) is a
+    assert pool.health_snapshot()["upstreams"][0]["healthy"] is True
+
+def test_models_reported_by_checks_route_requests():
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b])
+    _check_all(pool, _models_transport())
+    assert pool.choose("model-b") is b
+    # A model nobody reports may go to any node
+    assert pool.choose("other") in (a, b)
+
+def _send(pool, monkeypatch, handler):
+    """send_to_upstream through `pool`, against `handler` as every node"""
+    monkeypatch.setattr(proxy, "upstream_pool", pool)
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            response, node = await proxy.send_to_upstream(client, {"model": "m", "messages": []})
+            return response.status_code, node
+    return asyncio.run(send())
+
+def _completions(statuses):
+    """Answer completions with statuses[host], refusing connections where it is None"""
+    def handler(request):
+        status = statuses[request.url.host]
+        if status is None:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(status, json={"choices": []})
+    return handler
+
+@pytest.mark.parametrize("failure", [None, 503], ids=["unreachable", "server_error"])
+def test_failed_request_is_retried_on_another_node(monkeypatch, failure):
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b], retries=1)
+    # Make a the first choice
+    b.outstanding = 1
+
+    status, node = _send(pool, monkeypatch, _completions({"a": failure, "b": 200}))
+    assert (status, node) == (200, b)
+    assert (a.requests, a.failures, a.outstanding) == (1, 1, 0)
+    # b still counts the request until the caller finishes it
+    assert (b.requests, b.outstanding) == (1, 2)
+
+def test_last_retryable_error_is_raised(monkeypatch):
+    pool = UpstreamPool([Upstream("a", "http://a"), Upstream("b", "http://b")], retries=1)
+    with pytest.raises(proxy.UpstreamError) as error:
+        _send(pool, monkeypatch, _completions({"a": 502, "b": 502}))
+    assert error.value.status_code == 502
+    assert [node["failures"] for node in pool.stats()] == [1, 1]
+    assert [node["outstanding"] for node in pool.stats()] == [0, 0]
+
+def test_client_errors_are_not_retried(monkeypatch):
+    a, b = Upstream("a", "http://a"), Upstream("b", "http://b")
+    pool = UpstreamPool([a, b], retries=1)
+    b.outstanding = 1
+    assert _send(pool, monkeypatch, _completions({"a": 400, "b": 200})) == (400, a)
+    assert b.requests == 0
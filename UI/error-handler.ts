@@ -7,23 +7,10 @@ export interface ErrorHandlerResult {
 
 export class ErrorHandler {
     private static readonly PROXY_URL = 'http://127.0.0.1:4892';
-    private static readonly LM_STUDIO_URL = 'http://127.0.0.1:4891';
 
     static async checkLMStudioConnection(): Promise<boolean> {
         try {
-            // First check LM Studio
-            console.log('Checking LM Studio connection...');
-            const lmStudioResponse = await fetch(`${this.LM_STUDIO_URL}/v1/models`, {
-                method: 'GET',
-                headers: { 'Content-Type': 'application/json' }
-            });
-
-            if (!lmStudioResponse.ok) {
-                console.error('LM Studio connection failed:', lmStudioResponse.statusText);
-                return false;
-            }
-
-            // Then check proxy
+            // The proxy answers from its background upstream checks, so this adds no load to LM Studio
             console.log('Checking proxy connection...');
             const proxyResponse = await fetch(`${this.PROXY_URL}/health`);
             if (!proxyResponse.ok) {
@@ -92,7 +92,7 @@ async function getActiveModel(forceRefresh = false): Promise<string> {
     try {
         // First get all available models if not cached
         if (!modelCache.availableModels || forceRefresh) {
-            const modelsResponse = await fetch(`${LM_STUDIO_URL}/v1/models`, {
+            const modelsResponse = await fetch(`${PROXY_URL}/v1/models`, {
                 method: 'GET',
                 headers: { 'Content-Type': 'application/json' }
             });
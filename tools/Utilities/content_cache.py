@@ -0,0 +1,326 @@
+"""
+Cache of text and analyses extracted from files, keyed on the file's identity.
+
+An entry is keyed on (kind, real path, size, mtime_ns, inode): any write to the
+file changes its stat, so a stale result is never returned and nothing has to
+be hashed. Results live in a byte-bounded in-memory LRU and, when `disk_path`
+is set, in a SQLite file shared by every process using the tools (the proxy's
+thread pool and its tool worker processes) that survives restarts. Triggers
+keep the disk tier's byte total in a one-row table, so checking the budget on
+a write does not read the stored results.
+
+With `watch` enabled and the optional `watchdog` package installed, entries of
+files that change or disappear are dropped straight away instead of lingering
+until they are evicted.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional: invalidation by stat key alone still keeps results correct
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction output changes, so older cached results are ignored
+CACHE_VERSION = 3
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools_config.json')
+
+def file_identity(path: str) -> tuple:
+    """(real path, size, mtime_ns, inode) of a file; raises OSError if it cannot be stat'ed"""
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return real_path, stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+class _InvalidateOnChange(FileSystemEventHandler):
+    def __init__(self, cache: "ContentCache"):
+        self.cache = cache
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path:
+                self.cache.invalidate(path)
+
+class ContentCache:
+    """
+    Two-tier cache of per-file results (extracted text, analysis dictionaries).
+
+    Args:
+        max_bytes (int): Memory tier budget, measured on the JSON-encoded results
+        disk_path (str, optional): SQLite file for the persistent tier
+        max_disk_bytes (int): Disk tier budget; least recently used entries go first
+        watch (bool): Drop entries when their files change (needs `watchdog`)
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, disk_path: Optional[str] = None,
+                 max_disk_bytes: int = 1024 * 1024 * 1024, watch: bool = False):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # key -> (kind, real path, encoded result)
+        self.file_keys = {}  # real path -> {kind: key} of the entries in memory
+        self.current_bytes = 0
+        # The memory tier and the disk connection have separate locks, so memory
+        # hits never wait for a disk write
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute("PRAGMA busy_timeout=5000")
+            self._create_tables()
+
+        self.observer = None
+        self.watched_dirs = set()
+        if watch:
+            if Observer is None:
+                logger.warning("Content cache watching needs the 'watchdog' package; relying on stat keys")
+            else:
+                self.observer = Observer()
+                self.observer.daemon = True
+                self.observer.start()
+
+    def _create_tables(self):
+        self.disk.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in self.disk.execute("PRAGMA table_info(contents)")]
+            if columns and "size" not in columns:
+                # Written by an older version without byte accounting; it is only a cache
+                self.disk.execute("DROP TABLE contents")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS contents (key TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+                "path TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.disk.execute("CREATE INDEX IF NOT EXISTS contents_path ON contents (path, kind)")
+            self.disk.execute("CREATE INDEX IF NOT EXISTS contents_accessed ON contents (accessed)")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS contents_total (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "bytes INTEGER NOT NULL)"
+            )
+            self.disk.execute(
+                "INSERT OR IGNORE INTO contents_total (id, bytes) "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM contents"
+            )
+            self.disk.execute(
+                "CREATE TRIGGER IF NOT EXISTS contents_added AFTER INSERT ON contents "
+                "BEGIN UPDATE contents_total SET bytes = bytes + new.size; END"
+            )
+            self.disk.execute(
+                "CREATE TRIGGER IF NOT EXISTS contents_removed AFTER DELETE ON contents "
+                "BEGIN UPDATE contents_total SET bytes = bytes - old.size; END"
+            )
+            self.disk.execute("COMMIT")
+        except BaseException:
+            self.disk.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _key(kind: str, identity: tuple) -> str:
+        return json.dumps([CACHE_VERSION, kind, *identity])
+
+    def fetch(self, path: str, kind: str, compute: Callable[[], Any],
+              cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached result of `compute` for this version of the file, computing it on a miss.
+
+        Args:
+            path (str): File the result is derived from
+            kind (str): What the result is (e.g. "read_file"), including any
+                settings that change it
+            compute (Callable): Produces the result; must return JSON-serialisable data
+            cacheable (Callable, optional): Whether a computed result may be stored
+                (e.g. not error messages)
+        """
+        try:
+            identity = file_identity(path)
+        except OSError:
+            return compute()
+        key = self._key(kind, identity)
+
+        encoded = self._get(key)
+        if encoded is not None:
+            return json.loads(encoded)
+
+        value = compute()
+        try:
+            # Only store what was read from a file that did not change meanwhile
+            if cacheable(value) and file_identity(path) == identity:
+                self._put(key, kind, identity[0], json.dumps(value, separators=(',', ':')))
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"Not caching {kind} of {path}: {str(e)}")
+        return value
+
+    def _get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+        row = None
+        if self.disk is not None:
+            try:
+                with self.disk_lock:
+                    row = self.disk.execute(
+                        "SELECT kind, path, value FROM contents WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        self.disk.execute("UPDATE contents SET accessed = ? WHERE key = ?", (time.time(), key))
+            except sqlite3.Error as e:
+                logger.warning(f"Content cache read failed: {str(e)}")
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, *row)
+            self.hits += 1
+            return row[2]
+
+    def _remember(self, key: str, kind: str, real_path: str, encoded: str):
+        """Insert into the memory tier, evicting least recently used entries (lock held)"""
+        # Results for older versions of the file can never be hit again
+        stale = self.file_keys.get(real_path, {}).get(kind)
+        if stale is not None:
+            self._forget(stale)
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        while self.entries and self.current_bytes + size > self.max_bytes:
+            self._forget(next(iter(self.entries)))
+        self.entries[key] = (kind, real_path, encoded)
+        self.file_keys.setdefault(real_path, {})[kind] = key
+        self.current_bytes += size
+
+    def _forget(self, key: str):
+        kind, real_path, encoded = self.entries.pop(key)
+        self.current_bytes -= len(encoded)
+        kinds = self.file_keys[real_path]
+        del kinds[kind]
+        if not kinds:
+            del self.file_keys[real_path]
+
+    def _put(self, key: str, kind: str, real_path: str, encoded: str):
+        with self.lock:
+            self._remember(key, kind, real_path, encoded)
+        if self.disk is not None:
+            with self.disk_lock:
+                try:
+                    self.disk.execute("BEGIN IMMEDIATE")
+                    self.disk.execute("DELETE FROM contents WHERE path = ? AND kind = ?", (real_path, kind))
+                    self.disk.execute(
+                        "INSERT INTO contents (key, kind, path, value, size, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, kind, real_path, encoded, len(encoded), time.time())
+                    )
+                    self.disk.execute("COMMIT")
+                    self._evict_disk()
+                except sqlite3.Error as e:
+                    if self.disk.in_transaction:
+                        self.disk.execute("ROLLBACK")
+                    logger.warning(f"Content cache write failed: {str(e)}")
+        self._watch(real_path)
+
+    def _evict_disk(self):
+        """Delete least recently used rows until the disk tier is within budget (disk lock held)"""
+        (total,) = self.disk.execute("SELECT bytes FROM contents_total").fetchone()
+        if total <= self.max_disk_bytes:
+            return
+        self.disk.execute("BEGIN IMMEDIATE")
+        (total,) = self.disk.execute("SELECT bytes FROM contents_total").fetchone()
+        while total > self.max_disk_bytes:
+            oldest = self.disk.execute("SELECT key, size FROM contents ORDER BY accessed LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                self.disk.execute("DELETE FROM contents WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_disk_bytes:
+                    break
+        self.disk.execute("COMMIT")
+
+    def _watch(self, real_path: str):
+        if self.observer is None:
+            return
+        directory = os.path.dirname(real_path)
+        with self.lock:
+            if directory in self.watched_dirs:
+                return
+            self.watched_dirs.add(directory)
+        try:
+            self.observer.schedule(_InvalidateOnChange(self), directory, recursive=False)
+        except OSError as e:
+            logger.debug(f"Cannot watch {directory}: {str(e)}")
+
+    def invalidate(self, path: str):
+        """Forget every cached result derived from `path`"""
+        real_path = os.path.realpath(path)
+        with self.lock:
+            for key in list(self.file_keys.get(real_path, {}).values()):
+                self._forget(key)
+        if self.disk is not None:
+            try:
+                with self.disk_lock:
+                    self.disk.execute("DELETE FROM contents WHERE path = ?", (real_path,))
+            except sqlite3.Error as e:
+                logger.warning(f"Content cache invalidation failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+        if self.disk is not None:
+            self.disk.close()
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def default_cache() -> Optional[ContentCache]:
+    """
+    The process-wide cache configured by the `content_cache` section of
+    tools_config.json, or None when it is disabled.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                with open(CONFIG_PATH, 'r') as f:
+                    config = json.load(f).get("content_cache", {})
+            except (OSError, ValueError):
+                config = {}
+            if not config.get("enabled", False):
+                _default_cache = False
+            else:
+                disk_path = config.get("disk_path")
+                if disk_path and not os.path.isabs(disk_path):
+                    # Relative to the project root, like the proxy's other state files
+                    disk_path = os.path.join(os.path.dirname(os.path.dirname(CONFIG_PATH)), disk_path)
+                _default_cache = ContentCache(
+                    max_bytes=config.get("max_bytes", 256 * 1024 * 1024),
+                    disk_path=disk_path,
+                    max_disk_bytes=config.get("max_disk_bytes", 1024 * 1024 * 1024),
+                    watch=config.get("watch", False)
+                )
+        return _default_cache or None
@@ -1,84 +1,796 @@
 import os
-from typing import Optional
+import codecs
+import logging
+import mmap
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterator, List, Optional, Union
 from docx import Document
 from striprtf.striprtf import rtf_to_text
 import markdown
 import chardet
 import mimetypes
 import json
+import re
+
+from ..progress import report_progress
+from .content_cache import ContentCache, default_cache
+from .line_index import LineIndex, LineIndexStore, build_line_index, default_line_indexes
+from .structured_reader import StructuredReader, structured_format
+
+logger = logging.getLogger(__name__)
+
+# Byte order marks, longest first (the UTF-32 LE mark starts with the UTF-16 LE one)
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF8, 'UTF-8-SIG'),
+    (codecs.BOM_UTF32_LE, 'UTF-32'),
+    (codecs.BOM_UTF32_BE, 'UTF-32'),
+    (codecs.BOM_UTF16_LE, 'UTF-16'),
+    (codecs.BOM_UTF16_BE, 'UTF-16')
+)
+
+# ASCII characters that str.split() treats as whitespace but bytes.split() does not
+ASCII_SEPARATORS = re.compile(rb'[\x1c-\x1f]')
+
+# Raw lines (and characters) of a CSV, JSON or JSONL file shown by analyze_file next to its schema
+TABLE_PREVIEW_LINES = 20
+TABLE_PREVIEW_CHARS = 16 * 1024
+
+# Codecs whose characters all have the same width; the rest are byte-oriented
+# (UTF-8 and the single and multi-byte legacy encodings, where b'\n' is always a newline)
+FIXED_WIDTH_CODECS = {'utf-16-le': 2, 'utf-16-be': 2, 'utf-32-le': 4, 'utf-32-be': 4}
+
+class TextStats:
+    """
+    Streaming line, word and character counts over a file's chunks.
+    
+    Chunks are either raw bytes of a UTF-8 (or ASCII) file or decoded text.
+    The counts match `split('\n')`, `split()` and `len()` of the whole file
+    read in text mode, where universal newlines turn "\r\n" and "\r" into
+    "\n", including across chunk boundaries. Plain ASCII byte chunks are
+    counted without decoding; others go through an incremental UTF-8 decoder,
+    so Unicode whitespace (e.g. no-break spaces) separates words as it does
+    for `str.split()`.
+    
+    Args:
+        errors (str): How the decoder treats bytes that are not UTF-8; with
+            'strict', `add` raises UnicodeDecodeError on them
+    """
+    
+    def __init__(self, errors: str = 'replace'):
+        self.newlines = 0
+        self.chars = 0
+        self.words = 0
+        self.ends_with_cr = False
+        self.in_word = False
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors=errors)
+    
+    def add(self, chunk: Union[bytes, str]):
+        if isinstance(chunk, bytes):
+            # bytes.split() only knows ASCII whitespace, and not the \x1c-\x1f separators
+            if not chunk.isascii() or ASCII_SEPARATORS.search(chunk) or self.decoder.getstate()[0]:
+                chunk = self.decoder.decode(chunk)
+        if not chunk:
+            return
+        lf, cr = (b'\n', b'\r') if isinstance(chunk, bytes) else ('\n', '\r')
+        crlf = chunk.count(cr + lf)
+        if self.ends_with_cr and chunk[:1] == lf:
+            crlf += 1
+        
+        words = len(chunk.split())
+        if self.in_word and not chunk[:1].isspace():
+            # The first word continues the previous chunk's last word
+            words -= 1
+        
+        self.newlines += chunk.count(lf) + chunk.count(cr) - crlf
+        self.chars += len(chunk) - crlf
+        self.words += words
+        self.ends_with_cr = chunk[-1:] == cr
+        self.in_word = not chunk[-1:].isspace()
+    
+    @property
+    def line_count(self) -> int:
+        return self.newlines + 1 if self.chars else 0
+    
+    def summary(self) -> dict:
+        return {"line_count": self.line_count, "char_count": self.chars, "word_count": self.words}
+
+def text_stats(text: str) -> TextStats:
+    stats = TextStats()
+    stats.add(text)
+    return stats
+
+def normalize_newlines(text: str) -> str:
+    """Apply universal newlines, as reading in text mode does"""
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+class TextLayout:
+    """
+    Where a text file's characters and newlines sit in its bytes, so a range of
+    it can be found and decoded without decoding anything before it.
+    
+    Args:
+        data (bytes | mmap): The file's contents
+        encoding (str): Encoding detected for the file
+    """
+    
+    def __init__(self, data, encoding: str):
+        codec = codecs.lookup(encoding).name
+        self.start = 0  # First byte after the byte order mark
+        if codec == 'utf-8-sig':
+            codec = 'utf-8'
+            self.start = len(codecs.BOM_UTF8) if data[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+        elif codec in ('utf-16', 'utf-32'):
+            width = 2 if codec == 'utf-16' else 4
+            mark = data[:width]
+            big_endian = mark in (codecs.BOM_UTF16_BE, codecs.BOM_UTF32_BE)
+            if big_endian or mark in (codecs.BOM_UTF16_LE, codecs.BOM_UTF32_LE):
+                self.start = width
+            codec = f"{codec}-{'be' if big_endian else 'le'}"
+        self.codec = codec
+        self.width = FIXED_WIDTH_CODECS.get(codec, 1)
+        self.newline = '\n'.encode(codec)
+        self.carriage_return = '\r'.encode(codec)
+    
+    def align(self, data, position: int) -> int:
+        """Move a byte position back to the start of the character it falls in"""
+        position = max(position, self.start)
+        if self.width > 1:
+            position -= (position - self.start) % self.width
+            if self.codec.startswith('utf-16') and self.start < position < len(data) - 1:
+                # Do not split a surrogate pair: step back from a low surrogate
+                high_byte = data[position] if self.codec == 'utf-16-be' else data[position + 1]
+                if 0xDC <= high_byte <= 0xDF:
+                    position -= 2
+            return position
+        if self.codec == 'utf-8':
+            first = max(self.start, position - 3)
+            while first < position < len(data) and data[position] & 0xC0 == 0x80:
+                position -= 1
+        return position
+    
+    def find_newline(self, data, start: int, end: int) -> int:
+        """Offset of the first newline in data[start:end], or -1"""
+        while True:
+            index = data.find(self.newline, start, end)
+            if index < 0 or (index - self.start) % self.width == 0:
+                return index
+            start = index + 1
+    
+    def rfind_newline(self, data, start: int, end: int) -> int:
+        """Offset of the last newline in data[start:end], or -1"""
+        while True:
+            index = data.rfind(self.newline, start, end)
+            if index < 0 or (index - self.start) % self.width == 0:
+                return index
+            end = index + len(self.newline) - 1
+    
+    def decoder(self):
+        return codecs.getincrementaldecoder(self.codec)(errors='replace')
 
 class FileReader:
-    def __init__(self):
+    def __init__(self, max_content_chars: int = 1_000_000, sample_bytes: int = 64 * 1024,
+                 chunk_bytes: int = 1024 * 1024, cache: Optional[ContentCache] = None,
+                 max_read_bytes: int = 1024 * 1024, max_full_read_bytes: int = 16 * 1024 * 1024,
+                 line_indexes: Optional[LineIndexStore] = None, structured: Optional[StructuredReader] = None):
+        """
+        Args:
+            max_content_chars (int): Characters of content `analyze_file` returns;
+                longer files are still counted in full and flagged `content_truncated`
+            sample_bytes (int): Bytes examined to detect a file's encoding
+            chunk_bytes (int): Read size while streaming through a file
+            cache (ContentCache, optional): Cache of results per file version; defaults
+                to the one configured in tools_config.json (if enabled)
+            max_read_bytes (int): Most bytes a ranged `read_file` returns
+            max_full_read_bytes (int): Larger text files are not read whole; `read_file`
+                returns their first `max_read_bytes` as a range to continue from
+            line_indexes (LineIndexStore, optional): Line indexes of large text files; defaults
+                to the store configured in tools_config.json (if enabled)
+            structured (StructuredReader, optional): Reader of CSV, JSON and JSONL rows
+        """
         # Initialize supported file types
         self.text_extensions = {
             '.txt', '.md', '.markdown', '.py', '.js', '.html', '.css', '.json', 
             '.xml', '.yaml', '.yml', '.ini', '.cfg', '.conf', '.log', '.csv',
-            '.rtf', '.tex', '.sh', '.bat', '.ps1', '.r', '.sql'
+            '.rtf', '.tex', '.sh', '.bat', '.ps1', '.r', '.sql', '.tsv', '.jsonl', '.ndjson'
         }
+        self.max_content_chars = max_content_chars
+        self.sample_bytes = sample_bytes
+        self.chunk_bytes = chunk_bytes
+        self.max_read_bytes = max_read_bytes
+        self.max_full_read_bytes = max_full_read_bytes
+        self.cache = cache or default_cache()
+        self.line_indexes = line_indexes or default_line_indexes()
+        self.structured = structured or StructuredReader()
+    
+    def encoding_of_sample(self, sample: bytes, complete: bool) -> str:
+        """
+        Detect an encoding from the first bytes of a file.
+        
+        Byte order marks, ASCII and valid UTF-8 are recognised directly; only
+        other samples go through chardet.
+        
+        Args:
+            sample (bytes): The start of the file
+            complete (bool): Whether the sample is the whole file
+        """
+        if not sample:
+            return 'utf-8'
+        for mark, encoding in BYTE_ORDER_MARKS:
+            if sample.startswith(mark):
+                return encoding
+        if sample.isascii():
+            # Later bytes may not be ASCII; UTF-8 decodes the sample the same way
+            return 'ascii' if complete else 'utf-8'
+        try:
+            # A multi-byte character may be cut off at the end of a partial sample
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        return chardet.detect(sample)['encoding'] or 'utf-8'
         
     def detect_encoding(self, file_path: str) -> str:
-        """Detect the file encoding."""
+        """Detect the file encoding from a bounded sample of its first bytes."""
         with open(file_path, 'rb') as f:
-            raw = f.read()
-            result = chardet.detect(raw)
-            return result['encoding'] or 'utf-8'
+            sample = f.read(self.sample_bytes + 1)
+        return self.encoding_of_sample(sample[:self.sample_bytes], len(sample) <= self.sample_bytes)
+    
+    def encoding_after_error(self, error: UnicodeDecodeError) -> str:
+        """Detect an encoding again from the bytes around where decoding failed"""
+        start = max(0, error.start - 1024)
+        sample = error.object[start:error.start + self.sample_bytes]
+        encoding = chardet.detect(sample)['encoding'] or 'latin-1'
+        if codecs.lookup(encoding).name in ('ascii', codecs.lookup(error.encoding).name):
+            # chardet did not find a better fit than what failed; Latin-1 decodes any byte
+            encoding = 'ISO-8859-1'
+        return encoding
+    
+    def decode_text(self, raw: bytes) -> str:
+        """Decode a whole file's bytes, falling back to chardet on all of them if the sample misled"""
+        encoding = self.encoding_of_sample(raw[:self.sample_bytes], len(raw) <= self.sample_bytes)
+        try:
+            text = raw.decode(encoding)
+        except UnicodeDecodeError:
+            text = raw.decode(chardet.detect(raw)['encoding'] or 'utf-8')
+        return normalize_newlines(text)
+    
+    def docx_text(self, doc) -> str:
+        text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+        for table in doc.tables:
+            for row in table.rows:
+                text += '\n' + ' | '.join([cell.text for cell in row.cells])
+        return text
 
-    def read_file(self, file_path: str) -> Optional[str]:
+    def read_file(self, file_path: str, offset: int = None, length: int = None, start_line: int = None,
+                  end_line: int = None, tail: int = None, columns: List[str] = None, where: List[dict] = None,
+                  row_offset: int = None, row_limit: int = None) -> Optional[Union[str, dict]]:
         """
         Reads and returns the contents of a file at the given path.
         
+        With any of the range parameters, or for a text file larger than
+        `max_full_read_bytes`, only part of the file is read (see `read_range`).
+        With any of the row parameters, or when such a large file is a CSV,
+        JSONL or JSON array file, rows are read instead (see `read_rows`).
+        
         Args:
             file_path (str): Path to the file to read
+            offset (int, optional): Byte offset to start reading at
+            length (int, optional): Bytes to read from `offset`
+            start_line (int, optional): First line to read (1-based)
+            end_line (int, optional): Last line to read (inclusive)
+            tail (int, optional): Read the last `tail` lines
+            columns (List[str], optional): Columns of the rows to return
+            where (List[dict], optional): {"column", "op", "value"} conditions rows must meet
+            row_offset (int, optional): Matching rows to skip
+            row_limit (int, optional): Most rows to return
             
         Returns:
-            Optional[str]: Contents of the file if successful, None if file cannot be read
+            Optional[Union[str, dict]]: Contents of the file if successful (a `read_range`
+                or `read_rows` result for partial reads), None if file cannot be read
         """
         try:
             if not os.path.exists(file_path):
                 return f"Error: File {file_path} does not exist"
-                
-            extension = os.path.splitext(file_path)[1].lower()
-            mime_type, _ = mimetypes.guess_type(file_path)
-            
-            # Handle different file types
-            if extension == '.docx':
-                doc = Document(file_path)
-                text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-                for table in doc.tables:
-                    for row in table.rows:
-                        text += '\n' + ' | '.join([cell.text for cell in row.cells])
-                return text
-                
-            elif extension == '.rtf':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    rtf_text = f.read()
-                return rtf_to_text(rtf_text)
-                
-            elif extension in ['.md', '.markdown']:
-                encoding = self.detect_encoding(file_path)
-                with open(file_path, 'r', encoding=encoding) as f:
-                    md_text = f.read()
-                    # Convert Markdown to plain text while preserving structure
-                    html = markdown.markdown(md_text)
-                    # Could use BeautifulSoup here to better format HTML if needed
-                    return html
-                    
-            elif extension == '.pdf':
-                return "PDF parsing not implemented yet"
-                
-            elif extension in self.text_extensions or (mime_type and mime_type.startswith('text/')):
-                # Handle all text-based files with encoding detection
-                encoding = self.detect_encoding(file_path)
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-                    
-            else:
-                return f"Error: Unsupported file type {extension}"
+            ranged = any(value is not None for value in (offset, length, start_line, end_line, tail))
+            query = any(value is not None for value in (columns, where, row_offset, row_limit))
+            large = self.is_text_file(file_path) and os.path.getsize(file_path) > self.max_full_read_bytes
+            # Large tables are paged by rows, unless they are JSON documents that cannot be
+            # streamed; those are read as a range like other large text files
+            if query or (large and not ranged and
+                         self.structured.streamable(file_path, self.detect_encoding(file_path))):
+                if ranged:
+                    return "Error: Give either a byte or line range or a row query (columns, where, row_offset, " \
+                           "row_limit), not both"
+                if structured_format(file_path) is None:
+                    extension = os.path.splitext(file_path)[1].lower()
+                    return f"Error: Rows can only be read from CSV, JSON and JSONL files, not {extension or 'this file type'}"
+                return self.read_rows(file_path, columns, where, row_offset or 0, row_limit or 100)
+            if ranged or large:
+                if not self.is_text_file(file_path):
+                    extension = os.path.splitext(file_path)[1].lower()
+                    return f"Error: Ranges can only be read from text files, not {extension or 'this file type'}"
+                return self.read_range(file_path, offset, length, start_line, end_line, tail)
+            if self.cache is None:
+                return self._read_file(file_path)
+            # Unchanged files (same size, mtime and inode) are not parsed again
+            return self.cache.fetch(file_path, "read_file", lambda: self._read_file(file_path))
                 
         except UnicodeDecodeError as e:
             return f"Error: File encoding issue - {str(e)}"
+        except ValueError as e:
+            return f"Error: {str(e)}"
         except Exception as e:
             return f"Error reading file: {str(e)}"
+    
+    def _read_file(self, file_path: str) -> str:
+        """Extract a file's text; raises on failure so errors are never cached"""
+        extension = os.path.splitext(file_path)[1].lower()
+        mime_type, _ = mimetypes.guess_type(file_path)
+        
+        # Handle different file types
+        if extension == '.docx':
+            return self.docx_text(Document(file_path))
+            
+        elif extension == '.rtf':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                rtf_text = f.read()
+            return rtf_to_text(rtf_text)
+            
+        elif extension in ['.md', '.markdown']:
+            with open(file_path, 'rb') as f:
+                md_text = self.decode_text(f.read())
+            # Convert Markdown to plain text while preserving structure
+            html = markdown.markdown(md_text)
+            # Could use BeautifulSoup here to better format HTML if needed
+            return html
+                
+        elif extension == '.pdf':
+            return "PDF parsing not implemented yet"
+            
+        elif extension in self.text_extensions or (mime_type and mime_type.startswith('text/')):
+            # Handle all text-based files with encoding detection; one read, sampled detection
+            with open(file_path, 'rb') as f:
+                return self.decode_text(f.read())
+                
+        else:
+            # read_file reports this as "Error: Unsupported file type ..."
+            raise ValueError(f"Unsupported file type {extension}")
+
+    def is_text_file(self, file_path: str) -> bool:
+        """Whether a file's bytes are its text (so parts of it can be read directly)"""
+        extension = os.path.splitext(file_path)[1].lower()
+        mime_type, _ = mimetypes.guess_type(file_path)
+        # RTF is markup; its text comes from striprtf
+        return extension != '.rtf' and (
+            extension in self.text_extensions or bool(mime_type and mime_type.startswith('text/'))
+        )
+    
+    @contextmanager
+    def open_text(self, file_path: str):
+        """
+        Map a text file into memory, read-only.
+        
+        Yields:
+            tuple: (the contents as an mmap, or b'' for an empty file; its TextLayout;
+                the file's identity as `file_identity` gives it, from the open file)
+        """
+        with open(file_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            identity = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if stat.st_size == 0:
+                # Empty files cannot be mapped
+                yield b'', TextLayout(b'', 'utf-8'), identity
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sample = data[:self.sample_bytes]
+                layout = TextLayout(data, self.encoding_of_sample(sample, stat.st_size <= len(sample)))
+                yield data, layout, identity
+    
+    def line_index(self, data, layout: TextLayout, identity: tuple, build: bool = True) -> Optional[LineIndex]:
+        """The line index of a mapped file, if line indexes are enabled and the file is large enough"""
+        if self.line_indexes is None:
+            return None
+        return self.line_indexes.get(data, layout, identity, build)
+    
+    def line_offset(self, data, layout: TextLayout, line: int, position: int = None, current: int = 1) -> int:
+        """
+        Byte offset where a line starts, or the file size if there are fewer lines.
+        
+        Args:
+            data (bytes | mmap): The file's contents
+            layout (TextLayout): Their layout
+            line (int): Line to find (1-based)
+            position (int, optional): Where to start scanning: the start of line `current`
+            current (int): Line number at `position`
+        """
+        position = layout.start if position is None else position
+        size = len(data)
+        if layout.width == 1:
+            # Skip whole chunks by counting their newlines
+            report_every = 16 * self.chunk_bytes
+            while position < size:
+                chunk_end = min(position + self.chunk_bytes, size)
+                newlines = data[position:chunk_end].count(layout.newline)
+                if current + newlines >= line:
+                    break
+                current += newlines
+                if size > report_every and chunk_end // report_every != position // report_every:
+                    report_progress(chunk_end, size, f"Scanned {chunk_end // (1024 * 1024)} of "
+                                                     f"{size // (1024 * 1024)} MB for line {line}")
+                position = chunk_end
+        while current < line:
+            index = layout.find_newline(data, position, size)
+            if index < 0:
+                return size
+            position = index + len(layout.newline)
+            current += 1
+        return position
+    
+    def range_index(self, data, layout: TextLayout, identity: tuple, start_line: int = None,
+                    end_line: int = None, tail: int = None) -> Optional[LineIndex]:
+        """The line index a ranged read uses: built for line ranges, only reused for tails"""
+        if start_line is not None or end_line is not None:
+            return self.line_index(data, layout, identity)
+        if tail is not None:
+            return self.line_index(data, layout, identity, build=False)
+        return None
+    
+    def find_range(self, data, layout: TextLayout, offset: int = None, length: int = None,
+                   start_line: int = None, end_line: int = None, tail: int = None, limit: int = None,
+                   index: LineIndex = None) -> dict:
+        """
+        Find the bytes selected by `read_file`'s range parameters.
+        
+        Both ends fall on character boundaries. Without any parameter the whole
+        file is selected.
+        
+        Args:
+            data (bytes | mmap): The file's contents
+            layout (TextLayout): Their layout
+            offset, length, start_line, end_line, tail: As for `read_file`
+            limit (int, optional): Most bytes to select; line ranges and tails are
+                cut at a line boundary where possible
+            index (LineIndex, optional): The file's line index, to find lines
+                without scanning (and number the lines of a tail)
+        
+        Returns:
+            dict: offset and end_offset of the selection, whether `limit` truncated
+                it, and start_line for line ranges (and tails, given an index)
+        
+        Raises:
+            ValueError: If the parameters conflict
+        """
+        modes = (offset is not None or length is not None, start_line is not None or end_line is not None,
+                 tail is not None)
+        if sum(modes) > 1:
+            raise ValueError("Give either offset/length, start_line/end_line or tail, not several of them")
+        if start_line is not None and end_line is not None and end_line < start_line:
+            raise ValueError(f"end_line {end_line} is before start_line {start_line}")
+        
+        size = len(data)
+        newline = len(layout.newline)
+        selected = {}
+        truncated = False
+        if tail is not None:
+            end = size
+            search_end = size
+            if layout.rfind_newline(data, max(layout.start, size - newline), size) >= 0:
+                # A final newline ends the last line rather than starting another one
+                search_end = size - newline
+            start = layout.start
+            for _ in range(tail):
+                found = layout.rfind_newline(data, layout.start, search_end)
+                if found < 0:
+                    start = layout.start
+                    break
+                start = found + newline
+                search_end = found
+            if limit is not None and end - start > limit:
+                # Keep the last whole lines that fit
+                cut = layout.find_newline(data, end - limit, end)
+                start = cut + newline if 0 <= cut and cut + newline < end else end - limit
+                truncated = True
+            if index is not None:
+                selected["start_line"] = index.line_at(start, data, layout)
+        elif modes[1]:
+            first = start_line or 1
+            if index is not None:
+                start = index.line_offset(data, layout, first)
+                end = size if end_line is None else index.line_offset(data, layout, end_line + 1)
+            else:
+                start = self.line_offset(data, layout, first)
+                end = size if end_line is None else self.line_offset(data, layout, end_line + 1, start, first)
+            if limit is not None and end - start > limit:
+                # Keep the first whole lines that fit
+                cut = layout.rfind_newline(data, start, start + limit)
+                end = cut + newline if cut >= 0 else start + limit
+                truncated = True
+            selected["start_line"] = first
+        else:
+            start = min(offset or 0, size)
+            end = size if length is None else min(size, start + length)
+            if limit is not None and end - start > limit:
+                end = start + limit
+                truncated = True
+        
+        start = layout.align(data, start)
+        end = size if end >= size else max(start, layout.align(data, end))
+        carriage_return = len(layout.carriage_return)
+        if start < end < size and data[end - carriage_return:end] == layout.carriage_return and \
+                data[end:end + newline] == layout.newline:
+            # Keep a "\r\n" in one range, so it is not read as two line breaks
+            end += newline if end - carriage_return == start else -carriage_return
+        selected.update({"offset": start, "end_offset": end, "truncated": truncated})
+        return selected
+    
+    def decode_range(self, data, layout: TextLayout, start: int, end: int,
+                     piece_bytes: int = None) -> Iterator[tuple]:
+        """
+        Decode data[start:end] piece by piece, applying universal newlines.
+        
+        Yields:
+            tuple: (byte offset of the piece, its text)
+        """
+        piece_bytes = piece_bytes or self.chunk_bytes
+        decoder = layout.decoder()
+        held_back = False
+        position = start
+        while position < end:
+            piece_end = end if end - position <= piece_bytes else layout.align(data, position + piece_bytes)
+            if piece_end <= position:
+                piece_end = position + piece_bytes
+            text = decoder.decode(data[position:piece_end], final=piece_end >= end)
+            piece_start = position
+            if held_back:
+                text = '\r' + text
+                piece_start -= len(layout.carriage_return)
+            # Hold a final '\r' back for the next piece, which may start with its '\n'
+            held_back = piece_end < end and text.endswith('\r')
+            if held_back:
+                text = text[:-1]
+            if text:
+                yield piece_start, normalize_newlines(text)
+            position = piece_end
+    
+    def read_range(self, file_path: str, offset: int = None, length: int = None, start_line: int = None,
+                   end_line: int = None, tail: int = None) -> dict:
+        """
+        Read part of a text file: a byte range, a line range or its last lines.
+        
+        The file is memory-mapped, so only the selected bytes are read and
+        decoded, whatever the size of the file. At most `max_read_bytes` are
+        returned; pass `end_offset` back as `offset` to continue.
+        
+        Args:
+            file_path (str): Path to the file to read
+            offset (int, optional): Byte offset to start at (moved back to a character boundary)
+            length (int, optional): Bytes to read from `offset`
+            start_line (int, optional): First line to read (1-based; lines end at '\n')
+            end_line (int, optional): Last line to read (inclusive)
+            tail (int, optional): Read the last `tail` lines
+            
+        Returns:
+            dict: content, encoding, size, offset and end_offset (bytes), eof,
+                truncated (cut at `max_read_bytes`), and start_line/end_line
+                for line ranges (and for tails of indexed files)
+        
+        Raises:
+            ValueError: If the range parameters conflict
+        """
+        with self.open_text(file_path) as (data, layout, identity):
+            index = self.range_index(data, layout, identity, start_line, end_line, tail)
+            selected = self.find_range(data, layout, offset, length, start_line, end_line, tail,
+                                       limit=self.max_read_bytes, index=index)
+            start, end = selected["offset"], selected["end_offset"]
+            content = ''.join(text for _, text in self.decode_range(data, layout, start, end))
+            result = {
+                "file_path": file_path,
+                "encoding": layout.codec,
+                "size": len(data),
+                **selected,
+                "eof": end >= len(data),
+                "content": content
+            }
+            if "start_line" in selected:
+                newlines = data[start:end].count(layout.newline)
+                ends_with_newline = end - start >= len(layout.newline) and \
+                    data[end - len(layout.newline):end] == layout.newline
+                lines = newlines + (0 if ends_with_newline or start == end else 1)
+                result["end_line"] = selected["start_line"] + lines - 1
+            return result
+    
+    def iter_file(self, file_path: str, offset: int = None, length: int = None, start_line: int = None,
+                  end_line: int = None, tail: int = None, columns: List[str] = None, where: List[dict] = None,
+                  row_offset: int = None, row_limit: int = None, piece_bytes: int = 64 * 1024) -> Iterator[dict]:
+        """
+        Stream a text file, or the part of it selected as for `read_range`, in decoded pieces.
+        
+        No read limit applies: memory use is bounded by `piece_bytes` whatever
+        the size of the file or of the selection. Given any row parameter, the
+        matching rows of a CSV, JSON or JSONL file are streamed instead (all of
+        them unless `row_limit` is set).
+        
+        Yields:
+            dict: {"offset": byte offset of the piece, "content": its text}, or
+                {"row_index": index in the file, "row": the projected row}
+        
+        Raises:
+            ValueError: If the file is not a text file or the range parameters conflict
+        """
+        if any(value is not None for value in (columns, where, row_offset, row_limit)):
+            if structured_format(file_path) is None:
+                raise ValueError(f"Rows can only be read from CSV, JSON and JSONL files, not {file_path}")
+            rows = self.structured.matching_rows(file_path, self.detect_encoding(file_path), columns, where)
+            first = row_offset or 0
+            last = None if row_limit is None else first + row_limit
+            for index, row in islice(rows, first, last):
+                yield {"row_index": index, "row": row}
+            return
+        if not self.is_text_file(file_path):
+            raise ValueError(f"Only text files can be streamed, not {os.path.splitext(file_path)[1] or file_path}")
+        with self.open_text(file_path) as (data, layout, identity):
+            index = self.range_index(data, layout, identity, start_line, end_line, tail)
+            selected = self.find_range(data, layout, offset, length, start_line, end_line, tail, index=index)
+            for position, text in self.decode_range(data, layout, selected["offset"], selected["end_offset"],
+                                                    piece_bytes):
+                yield {"offset": position, "content": text}
+
+    def table_schema(self, file_path: str, encoding: str = None) -> dict:
+        """
+        Infer the columns of a CSV, JSON or JSONL file from a sample of its rows
+        (see `StructuredReader.schema`).
+        
+        Raises:
+            ValueError: If the file does not parse as its format
+        """
+        encoding = encoding or self.detect_encoding(file_path)
+        line_count = None
+        if structured_format(file_path) == 'jsonl':
+            with self.open_text(file_path) as (data, layout, identity):
+                index = self.line_index(data, layout, identity) or build_line_index(data, layout, identity)
+                ends_with_newline = layout.rfind_newline(
+                    data, max(layout.start, len(data) - len(layout.newline)), len(data)
+                ) >= 0
+                line_count = index.newlines + (0 if ends_with_newline or not index.line_count else 1)
+        return self.structured.schema(file_path, encoding, line_count)
+    
+    def read_rows(self, file_path: str, columns: List[str] = None, where: List[dict] = None,
+                  row_offset: int = 0, row_limit: int = 100) -> dict:
+        """
+        Read a page of the rows of a CSV, JSON or JSONL file, streaming through it.
+        
+        Args:
+            file_path (str): Path to the file
+            columns (List[str], optional): Only return these columns
+            where (List[dict], optional): Only return rows meeting all of these
+                {"column", "op", "value"} conditions (see `compile_where`)
+            row_offset (int): Matching rows to skip
+            row_limit (int): Most rows to return
+            
+        Returns:
+            dict: file_path, format, columns, rows, row_offset, next_row_offset
+                (None on the last page), and the file's schema on the first page
+        
+        Raises:
+            ValueError: For unknown columns, bad conditions or a file that does not parse
+        """
+        encoding = self.detect_encoding(file_path)
+        schema = self.table_schema(file_path, encoding)
+        known = [column["name"] for column in schema["columns"]]
+        named = list(columns or []) + [condition.get("column") for condition in where or []]
+        unknown = [name for name in named if name not in known]
+        if unknown and known:
+            raise ValueError(f"Unknown column(s) {unknown}; the sampled rows have {known}")
+        
+        result = {
+            "file_path": file_path,
+            "format": schema["format"],
+            **self.structured.query(file_path, encoding, columns, where, row_offset, row_limit)
+        }
+        if not row_offset:
+            result["schema"] = schema
+        return result
+    
+    def table_summary(self, file_path: str, encoding: str) -> Optional[tuple]:
+        """
+        The schema of a CSV, JSON or JSONL file as analyze_file reports it, with
+        its first lines as content.
+        
+        Returns:
+            Optional[tuple]: (content, summary, whether the content is cut off), or
+                None if the file does not parse as its format
+        """
+        try:
+            summary = self.table_schema(file_path, encoding)
+        except ValueError as e:
+            logger.info(f"Analyzing {file_path} as plain text: {str(e)}")
+            return None
+        preview = self.read_range(file_path, start_line=1, end_line=TABLE_PREVIEW_LINES)
+        content = preview["content"][:TABLE_PREVIEW_CHARS]
+        return content, summary, not preview["eof"] or len(preview["content"]) > TABLE_PREVIEW_CHARS
+    
+    def sample_lines(self, file_path: str, samples: int = 8, lines: int = 3) -> List[dict]:
+        """
+        Excerpts of a text file taken at evenly spaced lines, from its start to its end.
+
+        Works for text files of any size: those under the line index's `min_bytes`
+        are indexed on the fly (scanning them is quick) and not kept in the store.
+
+        Args:
+            file_path (str): Path to the text file
+            samples (int): Number of excerpts
+            lines (int): Lines per excerpt
+
+        Returns:
+            List[dict]: {"start_line", "content"} per excerpt, in file order
+        """
+        with self.open_text(file_path) as (data, layout, identity):
+            index = self.line_index(data, layout, identity) or build_line_index(data, layout, identity)
+            return self._sample_lines(data, layout, index, samples, lines)
+
+    def _sample_lines(self, data, layout: TextLayout, index: LineIndex, samples: int, lines: int) -> List[dict]:
+        """Excerpts of `lines` lines taken at `samples` evenly spaced lines, found through the index"""
+        last_start = max(1, index.line_count - lines + 1)
+        starts = sorted({1 + (last_start - 1) * i // max(1, samples - 1) for i in range(samples)})
+        excerpts = []
+        for line in starts if index.line_count else []:
+            start = index.line_offset(data, layout, line)
+            end = index.line_offset(data, layout, line + lines)
+            if end - start > self.sample_bytes:
+                # A few very long lines: the start of them is preview enough
+                end = layout.align(data, start + self.sample_bytes)
+            content = ''.join(text for _, text in self.decode_range(data, layout, start, end))
+            excerpts.append({"start_line": line, "content": content})
+        return excerpts
+    
+    def summarize_large_text(self, file_path: str, windows: int = 16) -> tuple:
+        """
+        Summarize a large text file without reading all of it.
+        
+        The line count comes from the file's line index, counting lines as
+        `scan_text` does (a lone '\r' ends one too); character and word
+        counts are extrapolated from `windows` evenly spaced windows of
+        `sample_bytes` each, and excerpts from across the file are included.
+        
+        Args:
+            file_path (str): Path to the text file
+            windows (int): Windows sampled for the character and word estimates
+            
+        Returns:
+            tuple: (content head of at most `max_content_chars` characters, summary dict)
+        """
+        with self.open_text(file_path) as (data, layout, identity):
+            index = self.line_index(data, layout, identity) or build_line_index(data, layout, identity)
+            size = len(data)
+            
+            head = []
+            head_chars = 0
+            for _, text in self.decode_range(data, layout, layout.start, size):
+                head.append(text)
+                head_chars += len(text)
+                if head_chars > self.max_content_chars:
+                    break
+            
+            chars = words = sampled = 0
+            span = max(0, size - layout.start - self.sample_bytes)
+            for window in range(windows):
+                start = layout.align(data, layout.start + span * window // max(1, windows - 1))
+                end = min(size, layout.align(data, start + self.sample_bytes))
+                stats = text_stats(''.join(text for _, text in self.decode_range(data, layout, start, end)))
+                chars += stats.chars
+                words += stats.words
+                sampled += end - start
+            scale = (size - layout.start) / sampled if sampled else 0
+            
+            summary = {
+                "line_count": index.text_line_count,
+                "char_count": round(chars * scale),
+                "word_count": round(words * scale),
+                "estimated": ["char_count", "word_count"],
+                "samples": self._sample_lines(data, layout, index, 8, 3)
+            }
+            return normalize_newlines(''.join(head))[:self.max_content_chars], summary
 
     def format_file_analysis(self, file_info: dict) -> str:
         """
@@ -137,11 +849,22 @@ class FileReader:
                 f"• Lines: {summary['line_count']}",
                 f"• Characters: {summary['char_count']:,}"
             ])
+        elif "columns" in summary:
+            approximate = "~" if summary["row_count_estimated"] else ""
+            output.extend([
+                f"• Format: {summary['format'].upper()}",
+                f"• Rows: {approximate}{summary['row_count']:,}",
+                f"• Columns: {len(summary['columns'])}"
+            ])
+            for column in summary["columns"]:
+                output.append(f"  - {column['name']}: {column['type']}, {column['null_rate']:.0%} null")
         else:
+            # Counts of large files are extrapolated from samples
+            approximate = "~" if summary.get("estimated") else ""
             output.extend([
                 f"• Lines: {summary['line_count']}",
-                f"• Words: {summary['word_count']:,}",
-                f"• Characters: {summary['char_count']:,}"
+                f"• Words: {approximate}{summary['word_count']:,}",
+                f"• Characters: {approximate}{summary['char_count']:,}"
             ])
         
         # Add preview of content if available
@@ -163,6 +886,12 @@ class FileReader:
         """
         Analyzes a file and returns key information about it.
         
+        The file is opened and read once. Its encoding is detected from the first
+        `sample_bytes`, and text files are counted chunk by chunk, so only the
+        first `max_content_chars` characters of content are ever held in memory.
+        Text files of the line index's `min_bytes` or more are not scanned: see
+        `summarize_large_text`.
+        
         Args:
             file_path (str): Path to the file to analyze
             
@@ -172,49 +901,95 @@ class FileReader:
                 - mime_type: MIME type of the file
                 - size: Size in bytes
                 - encoding: Detected file encoding
-                - content: File contents
+                - content: File contents (at most `max_content_chars` characters)
+                - content_truncated: Whether the content was cut off
                 - summary: File-type specific statistics
         """
+        if self.cache is None:
+            return self._analyze_file(file_path)
+        return self.cache.fetch(
+            file_path,
+            f"analyze_file:{self.max_content_chars}",
+            lambda: self._analyze_file(file_path),
+            cacheable=lambda analysis: "error" not in analysis
+        )
+    
+    def _analyze_file(self, file_path: str) -> dict:
         try:
             extension = os.path.splitext(file_path)[1].lower()
             mime_type, _ = mimetypes.guess_type(file_path)
-            content = self.read_file(file_path)
             
-            # Basic file info
+            with open(file_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                sample = f.read(self.sample_bytes)
+                encoding = self.encoding_of_sample(sample, stat.st_size <= len(sample))
+                
+                # CSV, JSON and JSONL files are summarized by their schema
+                structured = self.table_summary(file_path, encoding) if structured_format(file_path) else None
+                
+                # File type specific analysis
+                truncated = False
+                if extension == '.docx':
+                    f.seek(0)
+                    doc = Document(f)
+                    content = self.docx_text(doc)
+                    stats = text_stats(content)
+                    summary = {
+                        "paragraphs": len(doc.paragraphs),
+                        "tables": len(doc.tables),
+                        "sections": len(doc.sections),
+                        "line_count": stats.line_count,
+                        "char_count": stats.chars
+                    }
+                elif extension in ['.md', '.markdown']:
+                    # Counted on the Markdown source; the content is the rendered HTML
+                    md_text = self.decode_text(sample + f.read())
+                    content = markdown.markdown(md_text)
+                    summary = {
+                        "line_count": text_stats(md_text).line_count,
+                        "char_count": len(md_text),
+                        "headers": md_text.count('\n#') + md_text.startswith('#'),
+                        "links": md_text.count(']('),
+                        "code_blocks": md_text.count('```') // 2
+                    }
+                elif structured is not None:
+                    content, summary, truncated = structured
+                elif self.is_text_file(file_path) and self.line_indexes is not None and \
+                        stat.st_size >= self.line_indexes.min_bytes:
+                    # Too large to scan on every change: counted from the line index and samples
+                    content, summary = self.summarize_large_text(file_path)
+                    truncated = True
+                elif self.is_text_file(file_path):
+                    try:
+                        content, summary, all_ascii = self.scan_text(f, sample, encoding, stat.st_size)
+                    except UnicodeDecodeError as e:
+                        # The sample misled (e.g. an ASCII head before Latin-1 text): detect
+                        # again from where decoding failed and count the file once more
+                        encoding = self.encoding_after_error(e)
+                        f.seek(0)
+                        sample = f.read(self.sample_bytes)
+                        content, summary, all_ascii = self.scan_text(f, sample, encoding, stat.st_size,
+                                                                     strict=False)
+                    truncated = summary["char_count"] > self.max_content_chars
+                    if all_ascii and summary["char_count"] and encoding == 'utf-8':
+                        encoding = 'ascii'
+                else:
+                    # RTF, PDF and unsupported types: whatever read_file makes of them
+                    content = self.read_file(file_path)
+                    summary = text_stats(content).summary()
+            
+            truncated = truncated or len(content) > self.max_content_chars
             file_info = {
                 "file_type": extension,
                 "mime_type": mime_type,
-                "size": os.path.getsize(file_path),
-                "encoding": self.detect_encoding(file_path),
-                "content": content,
-                "last_modified": os.path.getmtime(file_path)
+                "size": stat.st_size,
+                "encoding": encoding,
+                "content": content[:self.max_content_chars],
+                "content_truncated": truncated,
+                "last_modified": stat.st_mtime,
+                "summary": summary
             }
             
-            # File type specific analysis
-            if extension == '.docx':
-                doc = Document(file_path)
-                file_info["summary"] = {
-                    "paragraphs": len(doc.paragraphs),
-                    "tables": len(doc.tables),
-                    "sections": len(doc.sections),
-                    "line_count": len(content.split('\n')),
-                    "char_count": len(content)
-                }
-            elif extension in ['.md', '.markdown']:
-                file_info["summary"] = {
-                    "line_count": len(content.split('\n')),
-                    "char_count": len(content),
-                    "headers": content.count('#'),  # Approximate header count
-                    "links": content.count(']('),   # Approximate link count
-                    "code_blocks": content.count('```')  # Approximate code block count
-                }
-            else:
-                file_info["summary"] = {
-                    "line_count": len(content.split('\n')) if content else 0,
-                    "char_count": len(content) if content else 0,
-                    "word_count": len(content.split()) if content else 0
-                }
-            
             return {
                 "result": file_info,
                 "formatted_output": self.format_file_analysis(file_info)
@@ -224,4 +999,68 @@ class FileReader:
             return {
                 "error": f"Failed to analyze file: {str(e)}",
                 "formatted_output": f"Error: Failed to analyze file - {str(e)}"
-            } 
\ No newline at end of file
+            }
+    
+    def scan_text(self, f, sample: bytes, encoding: str, size: int, strict: bool = True):
+        """
+        Count a text file in one streaming pass, keeping only the head of its content.
+        
+        UTF-8 and ASCII files are counted on the raw bytes; other encodings go
+        through an incremental decoder.
+        
+        Args:
+            f: The file, opened in binary mode and positioned after `sample`
+            sample (bytes): The bytes already read
+            encoding (str): Encoding detected from the sample
+            size (int): File size, for progress reports
+            strict (bool): Raise on bytes the encoding cannot decode, rather than
+                replacing them with U+FFFD
+            
+        Returns:
+            tuple: (content head, summary dict, whether every byte was ASCII)
+            
+        Raises:
+            UnicodeDecodeError: If `strict` and part of the file is not in `encoding`
+        """
+        errors = 'strict' if strict else 'replace'
+        codec = codecs.lookup(encoding).name
+        raw_counts = codec in ('utf-8', 'ascii')
+        if codec == 'utf-8-sig':
+            # Strip the byte order mark, then count the rest as plain UTF-8
+            sample = sample[len(codecs.BOM_UTF8):]
+            raw_counts = True
+        decoder = codecs.getincrementaldecoder('utf-8' if raw_counts else encoding)(errors=errors)
+        
+        report_every = 16 * self.chunk_bytes
+        stats = TextStats(errors)
+        head = []
+        head_stats = TextStats()
+        all_ascii = True
+        done = 0
+        chunk = sample or f.read(self.chunk_bytes)
+        while chunk:
+            done += len(chunk)
+            # UTF-8 is only decoded for as much content as is kept
+            if head_stats.chars <= self.max_content_chars or not raw_counts:
+                text = decoder.decode(chunk)
+                if head_stats.chars <= self.max_content_chars:
+                    head.append(text)
+                    head_stats.add(text)
+                if not raw_counts:
+                    stats.add(text)
+            if raw_counts:
+                all_ascii = all_ascii and chunk.isascii()
+                stats.add(chunk)
+            if size > report_every and done // report_every != (done - len(chunk)) // report_every:
+                report_progress(done, size, f"Scanned {done // (1024 * 1024)} of {size // (1024 * 1024)} MB")
+            chunk = f.read(self.chunk_bytes)
+        if not raw_counts or head_stats.chars <= self.max_content_chars:
+            # Flush the decoder only if it saw the whole file (not just the head of a UTF-8 one)
+            tail = decoder.decode(b'', final=True)
+            if not raw_counts:
+                stats.add(tail)
+            if head_stats.chars <= self.max_content_chars:
+                head.append(tail)
+        
+        content = normalize_newlines(''.join(head))[:self.max_content_chars]
+        return content, stats.summary(), raw_counts and all_ascii
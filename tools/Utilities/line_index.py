@@ -0,0 +1,316 @@
+"""
+Line-offset index of large text files, for jumping straight to a line.
+
+The index holds the byte offset of every `stride`-th line start as a compact
+`array('Q')`, plus the file's newline count and its count of lone carriage
+returns (which also end lines when the file is read in text mode). It is built once, in one pass of
+chunked newline scanning over the memory-mapped file, and saved as a sidecar
+in the index directory (not next to the file, which may be read-only). An
+index is keyed on the file's (real path, size, mtime_ns, inode), like the
+content cache, so it is reused until the file changes and rebuilt after.
+
+Finding line N is then one array lookup and at most `stride - 1` newline
+searches, whatever the size of the file.
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, islice
+from typing import Optional
+
+from ..progress import report_progress
+
+logger = logging.getLogger(__name__)
+
+# Bump when the sidecar layout changes, so older files are rebuilt
+INDEX_VERSION = 2
+
+# magic, version, stride, layout start, newline count, lone carriage returns, size, mtime_ns, inode
+HEADER = struct.Struct('<4sIIIQQQqQ')
+MAGIC = b'FLIX'
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools_config.json')
+
+class LineIndex:
+    """
+    Start offsets of every `stride`-th line of one version of a text file.
+
+    Args:
+        identity (tuple): (real path, size, mtime_ns, inode) of the indexed file
+        stride (int): Lines between two recorded offsets
+        start (int): Offset of the first line (after any byte order mark)
+        newlines (int): Newlines in the file
+        offsets (array): offsets[i] is where line i * stride + 1 starts
+        carriage_returns (int): Carriage returns not followed by a newline
+    """
+
+    def __init__(self, identity: tuple, stride: int, start: int, newlines: int, offsets: array,
+                 carriage_returns: int = 0):
+        self.identity = identity
+        self.stride = stride
+        self.start = start
+        self.newlines = newlines
+        self.offsets = offsets
+        self.carriage_returns = carriage_returns
+
+    @property
+    def size(self) -> int:
+        return self.identity[1]
+
+    @property
+    def line_count(self) -> int:
+        """Lines as `split('\\n')` counts them (so a final newline starts an empty last line)"""
+        return self.newlines + 1 if self.size > self.start else 0
+
+    @property
+    def text_line_count(self) -> int:
+        """Lines of the file read in text mode, where a lone '\\r' also ends a line (as TextStats counts)"""
+        return self.newlines + self.carriage_returns + 1 if self.size > self.start else 0
+
+    def line_offset(self, data, layout, line: int) -> int:
+        """
+        Byte offset where a line starts, or the file size if there are fewer lines.
+
+        Args:
+            data (bytes | mmap): The indexed file's contents
+            layout (TextLayout): Their layout
+            line (int): Line to find (1-based)
+        """
+        if line <= 1:
+            return self.start
+        if line > self.newlines + 1:
+            return self.size
+        checkpoint = (line - 1) // self.stride
+        position = self.offsets[checkpoint]
+        for _ in range(line - 1 - checkpoint * self.stride):
+            position = layout.find_newline(data, position, self.size) + len(layout.newline)
+        return position
+
+    def line_at(self, offset: int, data, layout) -> int:
+        """Number of the line containing a byte offset"""
+        low, high = 0, len(self.offsets) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.offsets[middle] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        line, position = low * self.stride + 1, self.offsets[low]
+        while True:
+            index = layout.find_newline(data, position, offset)
+            if index < 0:
+                return line
+            line += 1
+            position = index + len(layout.newline)
+
+    def to_bytes(self) -> bytes:
+        _, size, mtime_ns, inode = self.identity
+        header = HEADER.pack(MAGIC, INDEX_VERSION, self.stride, self.start, self.newlines, self.carriage_returns,
+                             size, mtime_ns, inode)
+        return header + self.offsets.tobytes()
+
+    @classmethod
+    def from_file(cls, f, identity: tuple) -> Optional["LineIndex"]:
+        """Read a sidecar, or return None if it is not an index of this version of the file"""
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            return None
+        magic, version, stride, start, newlines, carriage_returns, size, mtime_ns, inode = HEADER.unpack(header)
+        if magic != MAGIC or version != INDEX_VERSION or (size, mtime_ns, inode) != tuple(identity[1:]):
+            return None
+        offsets = array('Q')
+        offsets.frombytes(f.read())
+        if len(offsets) != newlines // stride + 1:
+            return None
+        return cls(identity, stride, start, newlines, offsets, carriage_returns)
+
+def build_line_index(data, layout, identity: tuple, stride: int = 32,
+                     chunk_bytes: int = 4 * 1024 * 1024) -> LineIndex:
+    """
+    Index a memory-mapped text file in one pass.
+
+    Byte-oriented encodings are scanned chunk by chunk: the chunk is split on
+    b'\\n', and the running total of the piece lengths (accumulate, sliced to
+    every `stride`-th newline by islice) is computed in C, so the Python loop
+    only runs once per recorded offset rather than once per line. UTF-16 and
+    UTF-32 files fall back to searching newline by newline.
+
+    Args:
+        data (bytes | mmap): The file's contents
+        layout (TextLayout): Their layout
+        identity (tuple): file_identity of the file, stored with the index
+        stride (int): Record the start of every `stride`-th line
+        chunk_bytes (int): Bytes scanned at a time
+    """
+    size = len(data)
+    offsets = array('Q', [layout.start])
+    newlines = 0
+    carriage_returns = 0
+    report_every = 16 * chunk_bytes
+    position = layout.start
+    if layout.width == 1:
+        crlf = layout.carriage_return + layout.newline
+        while position < size:
+            end = min(position + chunk_bytes, size)
+            chunk = data[position:end]
+            # Count "\r\n" split across chunks with the chunk before
+            carriage_returns += chunk.count(layout.carriage_return) - chunk.count(crlf)
+            if chunk[:1] == layout.newline and position > layout.start and \
+                    data[position - 1:position] == layout.carriage_return:
+                carriage_returns -= 1
+            pieces = chunk.split(layout.newline)
+            found = len(pieces) - 1
+            # The newline that starts the next recorded line, counted within this chunk
+            first = stride - newlines % stride
+            if first <= found:
+                ends = islice(accumulate(map(len, pieces)), first - 1, found, stride)
+                offsets.extend(position + end + n for n, end in zip(range(first, found + 1, stride), ends))
+            newlines += found
+            if size > report_every and end // report_every != position // report_every:
+                report_progress(end, size, f"Indexed {end // (1024 * 1024)} of {size // (1024 * 1024)} MB")
+            position = end
+    else:
+        while True:
+            index = layout.find_newline(data, position, size)
+            if index < 0:
+                break
+            position = index + len(layout.newline)
+            newlines += 1
+            if newlines % stride == 0:
+                offsets.append(position)
+        position = layout.start
+        while True:
+            index = data.find(layout.carriage_return, position, size)
+            if index < 0:
+                break
+            position = index + 1
+            if (index - layout.start) % layout.width == 0:
+                position = index + layout.width
+                if data[position:position + layout.width] != layout.newline:
+                    carriage_returns += 1
+    return LineIndex(identity, stride, layout.start, newlines, offsets, carriage_returns)
+
+class LineIndexStore:
+    """
+    Line indexes of large text files, kept as sidecars in `directory` and in
+    a small in-memory LRU.
+
+    Args:
+        directory (str, optional): Where sidecars are written; None keeps them in memory only
+        stride (int): Lines between two recorded offsets
+        min_bytes (int): Smaller files are not indexed (scanning them is quick)
+        max_loaded (int): Indexes kept in memory
+    """
+
+    def __init__(self, directory: Optional[str] = None, stride: int = 32, min_bytes: int = 16 * 1024 * 1024,
+                 max_loaded: int = 8):
+        self.directory = directory
+        self.stride = stride
+        self.min_bytes = min_bytes
+        self.max_loaded = max_loaded
+        self.loaded = OrderedDict()  # identity -> LineIndex
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def sidecar_path(self, real_path: str) -> str:
+        name = hashlib.sha1(real_path.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.directory, f"{name}.idx")
+
+    def get(self, data, layout, identity: tuple, build: bool = True) -> Optional[LineIndex]:
+        """
+        The index of this version of the file: loaded, read from its sidecar,
+        or (if `build`) built and saved now.
+
+        Args:
+            data (bytes | mmap): The file's contents
+            layout (TextLayout): Their layout
+            identity (tuple): file_identity of the file, taken from the open file
+            build (bool): Build a missing index
+
+        Returns:
+            Optional[LineIndex]: None for files under `min_bytes`, or when the
+                index is missing and `build` is False
+        """
+        if identity[1] < self.min_bytes:
+            return None
+        with self.lock:
+            index = self.loaded.get(identity)
+            if index is not None:
+                self.loaded.move_to_end(identity)
+                return index
+        index = self._load(identity)
+        if index is None:
+            if not build:
+                return None
+            index = build_line_index(data, layout, identity, self.stride)
+            self._save(index)
+        with self.lock:
+            self.loaded[identity] = index
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+        return index
+
+    def _load(self, identity: tuple) -> Optional[LineIndex]:
+        if not self.directory:
+            return None
+        try:
+            with open(self.sidecar_path(identity[0]), 'rb') as f:
+                return LineIndex.from_file(f, identity)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable line index of {identity[0]}: {str(e)}")
+            return None
+
+    def _save(self, index: LineIndex):
+        if not self.directory:
+            return
+        path = self.sidecar_path(index.identity[0])
+        temporary = None
+        try:
+            # Written aside and renamed, so readers in other processes never see half an index
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(index.to_bytes())
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not save the line index of {index.identity[0]}: {str(e)}")
+            if temporary is not None and os.path.exists(temporary):
+                os.unlink(temporary)
+
+_default_store = None
+_default_lock = threading.Lock()
+
+def default_line_indexes() -> Optional[LineIndexStore]:
+    """
+    The process-wide store configured by the `line_index` section of
+    tools_config.json, or None when it is disabled.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            try:
+                with open(CONFIG_PATH, 'r') as f:
+                    config = json.load(f).get("line_index", {})
+            except (OSError, ValueError):
+                config = {}
+            if not config.get("enabled", False):
+                _default_store = False
+            else:
+                directory = config.get("directory")
+                if directory and not os.path.isabs(directory):
+                    # Relative to the project root, like the content cache
+                    directory = os.path.join(os.path.dirname(os.path.dirname(CONFIG_PATH)), directory)
+                _default_store = LineIndexStore(
+                    directory=directory,
+                    stride=config.get("stride", 32),
+                    min_bytes=config.get("min_bytes", 16 * 1024 * 1024)
+                )
+        return _default_store or None
@@ -1,7 +1,14 @@
 from typing import Optional
 import PyPDF2
 
+from ..progress import report_progress
+from .content_cache import ContentCache, default_cache
+
 class PDFReader:
+    def __init__(self, cache: Optional[ContentCache] = None):
+        # Extracted text per file version, so re-attached documents are not parsed again
+        self.cache = cache or default_cache()
+
     def read_pdf(self, pdf_path: str) -> Optional[str]:
         """
         Extracts text content from a PDF file
@@ -13,12 +20,21 @@ class PDFReader:
             Optional[str]: Extracted text content
         """
         try:
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
+            if self.cache is None:
+                return self._read_pdf(pdf_path)
+            return self.cache.fetch(pdf_path, "read_pdf", lambda: self._read_pdf(pdf_path))
                 
         except Exception as e:
-            return f"Error reading PDF: {str(e)}" 
\ No newline at end of file
+            return f"Error reading PDF: {str(e)}"
+
+    def _read_pdf(self, pdf_path: str) -> str:
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            total = len(reader.pages)
+            pages = []
+            for number, page in enumerate(reader.pages, start=1):
+                page_text = page.extract_text() + "\n"
+                pages.append(page_text)
+                # Jobs see pages as they are read; a no-op for direct calls
+                report_progress(number, total, f"Read page {number} of {total}", partial=page_text)
+            return "".join(pages)
@@ -2,6 +2,9 @@ import os
 from typing import Dict, List
 from git import Repo
 
+from .file_reader import FileReader
+from ..progress import report_progress
+
 class RepoAnalyzer:
     def analyze_repo(self, repo_path: str) -> Dict:
         """
@@ -21,15 +24,18 @@ class RepoAnalyzer:
             repo = Repo(repo_path)
             
             # Get list of files
+            reader = FileReader()
             files = []
             for root, _, filenames in os.walk(repo_path):
                 for filename in filenames:
                     if not filename.startswith('.'):
                         file_path = os.path.join(root, filename)
-                        files.append({
+                        entry = {
                             "path": file_path,
-                            "content": FileReader().read_file(file_path)
-                        })
+                            "content": reader.read_file(file_path)
+                        }
+                        files.append(entry)
+                        report_progress(len(files), message=f"Read {file_path}", partial=entry)
             
             # Get commit history
             commits = [{
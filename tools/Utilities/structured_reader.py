@@ -0,0 +1,463 @@
+"""
+Streaming readers for tabular files: CSV (and TSV), JSON and JSON Lines.
+
+Rows are read one at a time from a text stream, so memory use does not grow
+with the file: CSV goes through the csv module, JSON Lines line by line, and
+JSON arrays through an incremental parser that decodes one element at a time
+from a bounded buffer. Column names, types, null rates and examples are
+inferred from the first `sample_rows` rows; row counts are exact when the
+sample covers the file and extrapolated from the bytes read otherwise.
+
+Rows can be projected to selected columns and filtered with conditions such as
+{"column": "status", "op": "==", "value": "failed"}, all of which must hold.
+"""
+import csv
+import json
+import operator
+import os
+import re
+from collections import Counter
+from itertools import islice
+from typing import Callable, Iterator, List, Optional
+
+# Extensions read as tables, and their format
+STRUCTURED_FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl'
+}
+
+# CSV cells read as missing values (compared lower-cased, after stripping)
+NULL_STRINGS = {'', 'null', 'none', 'nan', 'na', 'n/a'}
+
+INTEGER = re.compile(r'[-+]?(0|[1-9]\d*)$')
+# No leading zeros, so identifiers such as "007" stay strings
+NUMBER = re.compile(r'[-+]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+DATE = re.compile(r'\d{4}-\d{2}-\d{2}$')
+DATETIME = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$')
+
+# Cells can hold whole documents; the csv module's default limit is 128 KB
+csv.field_size_limit(max(csv.field_size_limit(), 16 * 1024 * 1024))
+
+def _contains(value, target) -> bool:
+    if isinstance(value, str):
+        return str(target) in value
+    if isinstance(value, list):
+        return target in value
+    return False
+
+# Condition operators: (row value, condition value) -> bool
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "contains": _contains,
+    "startswith": lambda value, target: isinstance(value, str) and value.startswith(str(target)),
+    "in": lambda value, target: value in target,
+    "is_null": lambda value, target: value is None,
+    "not_null": lambda value, target: value is not None
+}
+
+def structured_format(file_path: str) -> Optional[str]:
+    """'csv', 'json' or 'jsonl' for tabular files, None for anything else"""
+    return STRUCTURED_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+def cell_value(text: str):
+    """Value of a CSV cell: None, a bool, an int, a float or the text itself"""
+    stripped = text.strip()
+    lowered = stripped.lower()
+    if lowered in NULL_STRINGS:
+        return None
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if INTEGER.match(stripped):
+        return int(stripped)
+    if NUMBER.match(stripped):
+        return float(stripped)
+    return text
+
+def kind_of(value) -> str:
+    """Type of a parsed value, with ISO dates and timestamps told apart from other strings"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if isinstance(value, str):
+        if DATE.match(value):
+            return 'date'
+        if DATETIME.match(value):
+            return 'datetime'
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+class ColumnStats:
+    """Types, nulls, examples and range of one column over the sampled rows"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.present = 0
+        self.nulls = 0
+        self.types = Counter()
+        self.examples = []
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.present += 1
+        kind = kind_of(value)
+        if kind == 'null':
+            self.nulls += 1
+            return
+        self.types[kind] += 1
+        if kind in ('integer', 'number', 'date', 'datetime'):
+            try:
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+            except TypeError:
+                # Numbers and dates in the same column have no common order
+                pass
+        if kind not in ('array', 'object') and len(self.examples) < 3:
+            example = value[:80] if isinstance(value, str) else value
+            if example not in self.examples:
+                self.examples.append(example)
+
+    @property
+    def kind(self) -> str:
+        kinds = set(self.types)
+        if kinds == {'integer', 'number'}:
+            return 'number'
+        if len(kinds) == 1:
+            return kinds.pop()
+        if kinds:
+            return 'mixed'
+        # A header column of a CSV file without data rows has no values to type
+        return 'null' if self.present else 'unknown'
+
+    def summary(self, rows: int) -> dict:
+        """
+        Args:
+            rows (int): Rows sampled; rows without this column count as nulls
+        """
+        missing = rows - self.present
+        result = {
+            "name": self.name,
+            "type": self.kind,
+            "null_rate": round((self.nulls + missing) / rows, 4) if rows else 0.0
+        }
+        if len(self.types) > 1:
+            result["types"] = dict(self.types)
+        if self.minimum is not None:
+            result["min"] = self.minimum
+            result["max"] = self.maximum
+        result["examples"] = self.examples
+        return result
+
+def compile_where(conditions: Optional[List[dict]]) -> Callable[[dict], bool]:
+    """
+    Turn a list of {"column", "op", "value"} conditions into a row predicate.
+
+    Values that cannot be compared (a string against a number, a null against
+    anything) do not match, rather than failing the read.
+
+    Raises:
+        ValueError: For an unknown operator or a missing value
+    """
+    checks = []
+    for condition in conditions or []:
+        column, op = condition.get("column"), condition.get("op")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}; expected one of {sorted(OPERATORS)}")
+        if op not in ("is_null", "not_null") and "value" not in condition:
+            raise ValueError(f"Condition on {column!r} with {op!r} needs a value")
+        if op == "in" and not isinstance(condition.get("value"), list):
+            raise ValueError(f"Condition on {column!r} with 'in' needs a list value")
+        checks.append((column, OPERATORS[op], condition.get("value")))
+
+    def matches(row: dict) -> bool:
+        for column, compare, target in checks:
+            try:
+                if not compare(row.get(column), target):
+                    return False
+            except TypeError:
+                return False
+        return True
+    return matches
+
+class StructuredReader:
+    """
+    Streams rows of CSV, JSON and JSONL files and infers their schema.
+
+    Args:
+        sample_rows (int): Rows examined to infer the schema
+        chunk_chars (int): Characters read at a time by the JSON array parser
+        max_document_bytes (int): Largest JSON document that is not an array
+            (only arrays are parsed incrementally)
+    """
+
+    def __init__(self, sample_rows: int = 1000, chunk_chars: int = 64 * 1024,
+                 max_document_bytes: int = 64 * 1024 * 1024):
+        self.sample_rows = sample_rows
+        self.chunk_chars = chunk_chars
+        self.max_document_bytes = max_document_bytes
+
+    def open(self, file_path: str, encoding: str):
+        """Open a file as a text stream; its binary `buffer` tells how far it has been read"""
+        return open(file_path, 'r', encoding=encoding, errors='replace', newline='')
+
+    def streamable(self, file_path: str, encoding: str) -> bool:
+        """
+        Whether rows can be streamed from a file without reading it whole: any
+        CSV or JSONL file, and JSON files holding an array.
+        """
+        file_format = structured_format(file_path)
+        if file_format != 'json':
+            return file_format is not None
+        with self.open(file_path, encoding) as f:
+            while True:
+                chunk = f.read(self.chunk_chars)
+                if not chunk:
+                    return False
+                start = chunk.lstrip('\ufeff \t\r\n')
+                if start:
+                    return start[0] == '['
+
+    def rows(self, f, file_format: str) -> Iterator[dict]:
+        """
+        Parse the rows of an open text stream.
+
+        Args:
+            f: File opened with `open`
+            file_format (str): 'csv', 'json' or 'jsonl'
+
+        Yields:
+            dict: One row; CSV cells are typed (see `cell_value`), and JSON values
+                that are not objects become {"value": ...}
+        """
+        if file_format == 'csv':
+            return self._csv_rows(f)
+        if file_format == 'jsonl':
+            return self._jsonl_rows(f)
+        return self._json_rows(f)
+
+    def _csv_reader(self, f) -> tuple:
+        """
+        Sniff a CSV file's dialect and read its header.
+
+        Returns:
+            tuple: (csv reader positioned at the first record, column names; [] for an empty file)
+        """
+        sample = f.read(self.chunk_chars)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel_tab if sample.count('\t') > sample.count(',') else csv.excel
+        reader = csv.reader(f, dialect)
+        try:
+            header = next(reader)
+        except StopIteration:
+            return reader, []
+        except csv.Error as e:
+            raise ValueError(f"Not a valid CSV file: {str(e)}")
+        # Blank and repeated header cells still need distinct keys
+        columns = []
+        for position, name in enumerate(header, start=1):
+            name = name.strip() or f"column_{position}"
+            columns.append(name if name not in columns else f"{name}_{position}")
+        return reader, columns
+
+    def _csv_rows(self, f, header: tuple = None) -> Iterator[dict]:
+        reader, columns = header or self._csv_reader(f)
+        try:
+            for cells in reader:
+                if not cells:
+                    continue
+                row = {}
+                for position, cell in enumerate(cells):
+                    name = columns[position] if position < len(columns) else f"column_{position + 1}"
+                    row[name] = cell_value(cell)
+                for name in columns[len(cells):]:
+                    row[name] = None
+                yield row
+        except csv.Error as e:
+            raise ValueError(f"CSV parse error on line {reader.line_num}: {str(e)}")
+
+    def _jsonl_rows(self, f) -> Iterator[dict]:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {number}: {e.msg}")
+            yield value if isinstance(value, dict) else {"value": value}
+
+    def _json_rows(self, f) -> Iterator[dict]:
+        decoder = json.JSONDecoder()
+        buffer = f.read(self.chunk_chars)
+        position = len(buffer) - len(buffer.lstrip())
+        if buffer[position:position + 1] != '[':
+            # Not an array: the document is read whole; its first list of objects holds the rows
+            if os.fstat(f.fileno()).st_size > self.max_document_bytes:
+                raise ValueError("Only JSON files holding an array can be streamed; this document is too large")
+            try:
+                document = json.loads(buffer + f.read())
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON: {e.msg} (line {e.lineno})")
+            if isinstance(document, dict):
+                records = next((value for value in document.values()
+                                if isinstance(value, list) and value and isinstance(value[0], dict)), None)
+                items = records if records is not None else [document]
+            else:
+                items = document if isinstance(document, list) else [document]
+            for item in items:
+                yield item if isinstance(item, dict) else {"value": item}
+            return
+
+        position += 1
+        at_end = False
+        while True:
+            # Skip the separator before the next element
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+                position += 1
+            complete = False
+            if position < len(buffer):
+                if buffer[position] == ']':
+                    return
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number at the very end of the buffer may continue in the next chunk
+                    complete = end < len(buffer) or at_end
+                except json.JSONDecodeError as e:
+                    if at_end:
+                        raise ValueError(f"Invalid JSON: {e.msg}")
+            if not complete:
+                if at_end:
+                    raise ValueError("Invalid JSON: the array is not closed")
+                # Read at least as much as is buffered, so a huge element is parsed O(n) times in total
+                more = f.read(max(self.chunk_chars, len(buffer) - position))
+                at_end = not more
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield value if isinstance(value, dict) else {"value": value}
+            position = end
+            if position > self.chunk_chars:
+                buffer, position = buffer[position:], 0
+
+    def schema(self, file_path: str, encoding: str, line_count: Optional[int] = None) -> dict:
+        """
+        Infer a file's columns from its first `sample_rows` rows.
+
+        Args:
+            file_path (str): CSV, JSON or JSONL file
+            encoding (str): Its text encoding
+            line_count (int, optional): Lines in the file, not counting the empty one after
+                a final newline (e.g. from its line index); gives JSON Lines files an
+                exact row count
+
+        Returns:
+            dict: format, row_count, row_count_estimated, sampled_rows and one
+                {"name", "type", "null_rate", "examples", ...} entry per column
+
+        Raises:
+            ValueError: If the file does not parse as its format
+        """
+        file_format = structured_format(file_path)
+        columns = {}
+        sampled = 0
+        with self.open(file_path, encoding) as f:
+            if file_format == 'csv':
+                # Columns come from the header, so they are known even without data rows
+                header = self._csv_reader(f)
+                columns = {name: ColumnStats(name) for name in header[1]}
+                rows = self._csv_rows(f, header)
+            else:
+                rows = self.rows(f, file_format)
+            for row in islice(rows, self.sample_rows):
+                sampled += 1
+                for name, value in row.items():
+                    stats = columns.get(name)
+                    if stats is None:
+                        stats = columns[name] = ColumnStats(name)
+                    stats.add(value)
+            exhausted = next(rows, None) is None
+            size = os.fstat(f.fileno()).st_size
+            consumed = f.buffer.tell()
+
+        if exhausted:
+            row_count, estimated = sampled, False
+        elif file_format == 'jsonl' and line_count is not None:
+            # One record per line
+            row_count, estimated = line_count, False
+        else:
+            # The bytes the sample took, scaled to the whole file
+            row_count, estimated = round(sampled * size / max(consumed, 1)), True
+        return {
+            "format": file_format,
+            "row_count": row_count,
+            "row_count_estimated": estimated,
+            "sampled_rows": sampled,
+            "columns": [stats.summary(sampled) for stats in columns.values()]
+        }
+
+    def matching_rows(self, file_path: str, encoding: str, columns: List[str] = None,
+                      where: List[dict] = None) -> Iterator[tuple]:
+        """
+        Stream the rows that match every condition, projected to `columns`.
+
+        Yields:
+            tuple: (index of the row in the file, the projected row)
+
+        Raises:
+            ValueError: For bad conditions or a file that does not parse
+        """
+        matches = compile_where(where)
+        with self.open(file_path, encoding) as f:
+            for index, row in enumerate(self.rows(f, structured_format(file_path))):
+                if matches(row):
+                    yield index, row if not columns else {name: row.get(name) for name in columns}
+
+    def query(self, file_path: str, encoding: str, columns: List[str] = None, where: List[dict] = None,
+              row_offset: int = 0, row_limit: int = 100) -> dict:
+        """
+        Read a page of the rows that match `where`, projected to `columns`.
+
+        Scanning stops as soon as the page is full, so early pages of huge
+        files are quick and memory stays bounded by `row_limit`.
+
+        Returns:
+            dict: columns, rows, row_offset and next_row_offset (None on the last page)
+        """
+        rows = []
+        more = False
+        pages = self.matching_rows(file_path, encoding, columns, where)
+        try:
+            for position, (_, row) in enumerate(pages):
+                if position < row_offset:
+                    continue
+                if len(rows) == row_limit:
+                    more = True
+                    break
+                rows.append(row)
+        finally:
+            pages.close()
+        result_columns = list(columns) if columns else list(dict.fromkeys(name for row in rows for name in row))
+        return {
+            "columns": result_columns,
+            "rows": rows,
+            "row_offset": row_offset,
+            "next_row_offset": row_offset + len(rows) if more else None
+        }
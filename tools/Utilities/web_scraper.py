@@ -1,16 +1,25 @@
+import asyncio
+import weakref
+
 import requests
+import httpx
 from bs4 import BeautifulSoup
 from typing import Dict, Optional
 import logging
 from urllib.parse import urlparse
 import time
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
 class WebScraper:
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': USER_AGENT
         })
+        # An httpx client is bound to the event loop it first runs on, so each
+        # loop (the proxy's, or a worker's per-call asyncio.run) gets its own
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> client
         
     def scrape_webpage(self, url: str, selector: Optional[str] = None) -> Dict:
         """
@@ -42,38 +51,7 @@ class WebScraper:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
             
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            # Get content based on selector if provided
-            if selector:
-                content = soup.select(selector)
-                text = "\n".join(element.get_text(strip=True) for element in content)
-            else:
-                # Get main content
-                text = soup.get_text(separator='\n', strip=True)
-            
-            # Get links
-            links = [
-                {
-                    "text": a.get_text(strip=True),
-                    "href": a.get('href')
-                }
-                for a in soup.find_all('a', href=True)
-            ]
-            
-            return {
-                "title": soup.title.string if soup.title else None,
-                "text": text,
-                "links": links[:50],  # Limit number of links
-                "status": "success",
-                "url": url,
-                "timestamp": time.time()
-            }
+            return self._parse_page(response.text, url, selector)
             
         except requests.RequestException as e:
             return {
@@ -107,4 +85,119 @@ class WebScraper:
                 "text": result["text"],
                 "title": result["title"]
             }
-        return result 
\ No newline at end of file
+        return result
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Async HTTP client of the running event loop, used by the coroutine variants"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers={'User-Agent': USER_AGENT},
+                follow_redirects=True,
+                timeout=10
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the running event loop's client; call before the loop ends"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def _parse_page(self, html: str, url: str, selector: Optional[str] = None) -> Dict:
+        """Extract title, text and links from a fetched page"""
+        # Parse with BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+            
+        # Get content based on selector if provided
+        if selector:
+            content = soup.select(selector)
+            text = "\n".join(element.get_text(strip=True) for element in content)
+        else:
+            # Get main content
+            text = soup.get_text(separator='\n', strip=True)
+        
+        # Get links
+        links = [
+            {
+                "text": a.get_text(strip=True),
+                "href": a.get('href')
+            }
+            for a in soup.find_all('a', href=True)
+        ]
+        
+        return {
+            "title": soup.title.string if soup.title else None,
+            "text": text,
+            "links": links[:50],  # Limit number of links
+            "status": "success",
+            "url": url,
+            "timestamp": time.time()
+        }
+
+    async def scrape_webpage_async(self, url: str, selector: Optional[str] = None) -> Dict:
+        """
+        Coroutine version of scrape_webpage that does not block the event loop:
+        the page is downloaded with httpx and parsed on a worker thread.
+        
+        Args:
+            url (str): The URL to scrape
+            selector (str, optional): CSS selector to target specific content
+            
+        Returns:
+            Dict: Same structure as scrape_webpage
+        """
+        try:
+            # Validate URL
+            parsed_url = urlparse(url)
+            if not all([parsed_url.scheme, parsed_url.netloc]):
+                return {
+                    "status": "error",
+                    "error": "Invalid URL format",
+                    "timestamp": time.time()
+                }
+            
+            response = await self.async_client.get(url)
+            response.raise_for_status()
+            
+            # Parsing a large page takes long enough to stall the event loop
+            return await asyncio.to_thread(self._parse_page, response.text, url, selector)
+            
+        except httpx.HTTPError as e:
+            return {
+                "status": "error",
+                "error": f"Request failed: {str(e)}",
+                "timestamp": time.time()
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"Scraping failed: {str(e)}",
+                "timestamp": time.time()
+            }
+
+    async def extract_text_async(self, url: str) -> Dict:
+        """
+        Coroutine version of extract_text.
+        
+        Args:
+            url (str): The URL to scrape
+            
+        Returns:
+            Dict: Same structure as extract_text
+        """
+        result = await self.scrape_webpage_async(url)
+        if result["status"] == "success":
+            return {
+                "status": "success",
+                "text": result["text"],
+                "title": result["title"]
+            }
+        return result
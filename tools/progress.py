@@ -0,0 +1,51 @@
+"""
+Progress reporting for long-running tools.
+
+A tool calls `report_progress` as it works (per page, per file, ...). When it
+runs as a job the proxy installs a reporter for the call, so updates and
+partial results reach the job's pollers and subscribers; otherwise the call
+does nothing. The reporter travels in a context variable, which the proxy
+copies into the worker thread that runs the tool.
+"""
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+class Cancelled(Exception):
+    """Raised inside a tool by `report_progress` once its job has been cancelled"""
+
+_reporter: contextvars.ContextVar[Optional[Callable[[dict], None]]] = contextvars.ContextVar(
+    "tool_progress_reporter", default=None
+)
+
+def report_progress(done: Optional[int] = None, total: Optional[int] = None,
+                    message: Optional[str] = None, partial: Any = None):
+    """
+    Report how far the current tool call has got.
+
+    Args:
+        done (int, optional): Units of work finished so far (pages, files, ...)
+        total (int, optional): Total units of work, if known
+        message (str, optional): Short human-readable status
+        partial (Any, optional): A piece of the result that is already usable
+
+    Raises:
+        Cancelled: If the job running this tool has been cancelled, so
+            thread-based tools stop at their next progress report
+    """
+    reporter = _reporter.get()
+    if reporter is None:
+        return
+    update = {"done": done, "total": total, "message": message}
+    if partial is not None:
+        update["partial"] = partial
+    reporter(update)
+
+@contextmanager
+def progress_reporter(reporter: Callable[[dict], None]):
+    """Route `report_progress` calls made in this context to `reporter`"""
+    token = _reporter.set(reporter)
+    try:
+        yield
+    finally:
+        _reporter.reset(token)
@@ -0,0 +1,171 @@
+"""
+Tool registry: every tool declares its schema next to its handler.
+
+Built-in tools register with the `@tool` decorator in tool_handlers.py.
+Third-party packages can add tools through the "feanor.tools" entry point
+group; each entry point names a module (or object) whose import registers
+its tools the same way. Handlers should keep heavy imports out of module
+scope and build their helpers with `lazy`, so importing the registry stays
+cheap and a dependency is only loaded when a tool that needs it first runs.
+"""
+import importlib
+import json
+import logging
+from importlib.metadata import entry_points
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "feanor.tools"
+
+class ToolSpec:
+    """A registered tool: its OpenAI function schema, its handler and its optional streaming variant"""
+
+    def __init__(self, name: str, description: str, parameters: dict, handler: Callable):
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.handler = handler
+        self.streamer = None
+
+    def schema(self) -> dict:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters
+            }
+        }
+
+_tools: Dict[str, ToolSpec] = {}
+_lazy_objects = []
+_plugins_loaded = False
+
+def tool(name: str, description: str, properties: dict, required: Optional[List[str]] = None):
+    """
+    Register the decorated function as the handler of tool `name`.
+
+    Args:
+        name (str): Tool name the model calls
+        description (str): What the tool does, shown to the model
+        properties (dict): JSON schema of each parameter
+        required (List[str], optional): Parameters that must be given
+    """
+    def register(handler: Callable) -> Callable:
+        if name in _tools:
+            raise ValueError(f"Tool {name} is already registered")
+        parameters = {"type": "object", "properties": properties}
+        if required:
+            parameters["required"] = list(required)
+        _tools[name] = ToolSpec(name, description, parameters, handler)
+        return handler
+    return register
+
+def streams(name: str):
+    """
+    Register the decorated function as the streaming variant of tool `name`.
+
+    It takes the same parameters as the tool's handler and returns an iterator
+    of JSON-serialisable pieces, which the proxy sends to clients as they are
+    produced (POST /v1/functions/{name}/stream). Register the tool first.
+    """
+    def register(streamer: Callable) -> Callable:
+        if name not in _tools:
+            raise ValueError(f"Tool {name} is not registered")
+        _tools[name].streamer = streamer
+        return streamer
+    return register
+
+class _Lazy:
+    def __init__(self, target: str):
+        self.target = target
+        self.value = None
+        self.loaded = False
+
+    def __call__(self):
+        if not self.loaded:
+            module_name, _, attribute = self.target.partition(":")
+            factory = getattr(importlib.import_module(module_name), attribute)
+            self.value = factory()
+            self.loaded = True
+        return self.value
+
+def lazy(target: str) -> Callable[[], object]:
+    """
+    Defer importing and building a helper until a handler first needs it.
+
+    Args:
+        target (str): "package.module:Factory"; the factory is called without arguments
+
+    Returns:
+        Callable: Returns the (cached) built object
+    """
+    loader = _Lazy(target)
+    _lazy_objects.append(loader)
+    return loader
+
+def preload():
+    """Import and build every lazy helper now (used by prewarmed worker processes)"""
+    for loader in _lazy_objects:
+        try:
+            loader()
+        except Exception as e:
+            logger.warning(f"Could not preload {loader.target}: {str(e)}")
+
+async def close_helpers():
+    """
+    Release what built helpers hold for the running event loop (e.g. async
+    HTTP clients), through their `aclose` coroutine. Await it before the loop ends.
+    """
+    for loader in _lazy_objects:
+        close = getattr(loader.value, "aclose", None) if loader.loaded else None
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception as e:
+            logger.warning(f"Could not close {loader.target}: {str(e)}")
+
+def load_plugins():
+    """Import the tools of installed packages that declare "feanor.tools" entry points"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            entry_point.load()
+        except Exception as e:
+            logger.error(f"Failed to load tool plugin {entry_point.name}: {str(e)}")
+
+def handlers() -> Dict[str, Callable]:
+    """Tool name -> handler for every registered tool"""
+    return {name: spec.handler for name, spec in _tools.items()}
+
+def streamers() -> Dict[str, Callable]:
+    """Tool name -> streaming variant, for the tools that have one"""
+    return {name: spec.streamer for name, spec in _tools.items() if spec.streamer is not None}
+
+def schemas() -> List[dict]:
+    """OpenAI `tools` entries for every registered tool, in registration order"""
+    return [spec.schema() for spec in _tools.values()]
+
+def write_tools_config(path: str) -> bool:
+    """
+    Regenerate the "tools" list of tools_config.json from the registry.
+
+    The rest of the file (e.g. the "execution" section) is kept, and the file
+    is left untouched when the schemas have not changed.
+
+    Returns:
+        bool: Whether the file was rewritten
+    """
+    with open(path, 'r') as f:
+        config = json.load(f)
+    if config.get("tools") == schemas():
+        return False
+    config["tools"] = schemas()
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=4)
+    return True
@@ -1,48 +1,158 @@
-from .Utilities.file_reader import FileReader
-from .Utilities.pdf_reader import PDFReader
-from .Utilities.repo_analyzer import RepoAnalyzer
-from .Utilities.web_scraper import WebScraper
-from .Utilities.resume_analyzer import ResumeAnalyzer
-
-file_reader = FileReader()
-pdf_reader = PDFReader()
-repo_analyzer = RepoAnalyzer()
-web_scraper = WebScraper()
-resume_analyzer = ResumeAnalyzer()
+import os
 
+from .registry import handlers, lazy, load_plugins, schemas, streamers, streams, tool, write_tools_config
+
+# Tool helpers (and their python-docx, PyPDF2, GitPython, BeautifulSoup, ...
+# dependencies) are only imported when a tool first needs them
+file_reader = lazy(f"{__package__}.Utilities.file_reader:FileReader")
+pdf_reader = lazy(f"{__package__}.Utilities.pdf_reader:PDFReader")
+repo_analyzer = lazy(f"{__package__}.Utilities.repo_analyzer:RepoAnalyzer")
+web_scraper = lazy(f"{__package__}.Utilities.web_scraper:WebScraper")
+resume_analyzer = lazy(f"{__package__}.Utilities.resume_analyzer:ResumeAnalyzer")
+
+@tool(
+    "read_file",
+    "Reads the contents of a file at the given path. Large text files can be read in parts: by byte offset and "
+    "length, by line range, or their last lines with tail. Partial reads return the content with its byte "
+    "offsets; pass end_offset back as offset to continue. CSV, TSV, JSON and JSONL files can be queried as rows: "
+    "pick columns, filter with where conditions and page with row_offset and row_limit.",
+    {
+        "file_path": {"type": "string", "description": "Path to the file to read", "minLength": 1},
+        "offset": {"type": "integer", "description": "Byte offset to start reading at", "minimum": 0},
+        "length": {"type": "integer", "description": "Number of bytes to read from offset", "minimum": 1},
+        "start_line": {"type": "integer", "description": "First line to read (1-based)", "minimum": 1},
+        "end_line": {"type": "integer", "description": "Last line to read (inclusive)", "minimum": 1},
+        "tail": {"type": "integer", "description": "Read only the last N lines of the file", "minimum": 1},
+        "columns": {
+            "type": "array",
+            "description": "Columns of a CSV/JSON/JSONL file to return",
+            "items": {"type": "string", "minLength": 1}
+        },
+        "where": {
+            "type": "array",
+            "description": "Conditions rows must all meet",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "column": {"type": "string", "minLength": 1},
+                    "op": {"type": "string", "enum": ["==", "!=", "<", "<=", ">", ">=", "contains", "startswith",
+                                                      "in", "is_null", "not_null"]},
+                    "value": {"description": "Value to compare with (a list for 'in')"}
+                },
+                "required": ["column", "op"]
+            }
+        },
+        "row_offset": {"type": "integer", "description": "Matching rows to skip", "minimum": 0},
+        "row_limit": {"type": "integer", "description": "Matching rows to return", "minimum": 1, "maximum": 1000}
+    },
+    required=["file_path"]
+)
 def handle_read_file(params):
-    return file_reader.read_file(params["file_path"])
+    return file_reader().read_file(**params)
 
+@streams("read_file")
+def stream_read_file(params):
+    return file_reader().iter_file(**params)
+
+@tool(
+    "analyze_file",
+    "Analyzes a file and returns key information about it",
+    {"file_path": {"type": "string", "description": "Path to the file to analyze", "minLength": 1}},
+    required=["file_path"]
+)
 def handle_analyze_file(params):
-    return file_reader.analyze_file(params["file_path"])
+    return file_reader().analyze_file(params["file_path"])
 
+@tool(
+    "read_pdf",
+    "Extracts text content from a PDF file",
+    {"pdf_path": {"type": "string", "description": "Path to PDF file", "minLength": 1}},
+    required=["pdf_path"]
+)
 def handle_read_pdf(params):
-    return pdf_reader.read_pdf(params["pdf_path"])
+    return pdf_reader().read_pdf(params["pdf_path"])
 
+@tool(
+    "analyze_repo",
+    "Analyzes a local git repository",
+    {"repo_path": {"type": "string", "description": "Path to local git repo", "minLength": 1}},
+    required=["repo_path"]
+)
 def handle_analyze_repo(params):
-    return repo_analyzer.analyze_repo(params["repo_path"])
+    return repo_analyzer().analyze_repo(params["repo_path"])
 
-def handle_scrape_webpage(params):
+# Handlers may be coroutine functions; the proxy awaits them directly
+# instead of running them on its worker threads.
+@tool(
+    "scrape_webpage",
+    "Scrapes content from a webpage using BeautifulSoup. Returns title, main text content, and links found on "
+    "the page. Can target specific content using CSS selectors. Handles rate limiting and request management.",
+    {
+        "url": {
+            "type": "string",
+            "description": "The URL to scrape (must be a valid http/https URL)",
+            "pattern": "^https?://"
+        },
+        "selector": {
+            "type": "string",
+            "description": "Optional CSS selector to target specific content (e.g. 'div.main-content' or 'article.post')"
+        }
+    },
+    required=["url"]
+)
+async def handle_scrape_webpage(params):
     url = params.get("url")
     selector = params.get("selector")
-    return web_scraper.scrape_webpage(url, selector)
+    return await web_scraper().scrape_webpage_async(url, selector)
 
-def handle_extract_text(params):
+@tool(
+    "extract_text",
+    "Simplified webpage scraping that extracts just the main text content and title. Automatically removes "
+    "scripts, styles, and other non-content elements. Best for quick text extraction when you don't need links "
+    "or specific targeting.",
+    {
+        "url": {
+            "type": "string",
+            "description": "The URL to extract text from (must be a valid http/https URL)",
+            "pattern": "^https?://"
+        }
+    },
+    required=["url"]
+)
+async def handle_extract_text(params):
     url = params.get("url")
-    return web_scraper.extract_text(url)
+    return await web_scraper().extract_text_async(url)
 
+@tool(
+    "analyze_resume",
+    "Analyzes a resume against a job posting to provide tailored feedback and improvements",
+    {
+        "resume_text": {"type": "string", "description": "The content of the resume to analyze"},
+        "job_posting": {"type": "string", "description": "The job posting text to compare against"}
+    },
+    required=["resume_text", "job_posting"]
+)
 def handle_analyze_resume(params):
     resume_text = params.get("resume_text")
     job_posting = params.get("job_posting")
-    return resume_analyzer.analyze_resume(resume_text, job_posting)
+    return resume_analyzer().analyze_resume(resume_text, job_posting)
+
+# Tools from installed plugin packages ("feanor.tools" entry points)
+load_plugins()
 
 # Map tool names to handler functions
-TOOL_HANDLERS = {
-    "read_file": handle_read_file,
-    "analyze_file": handle_analyze_file,
-    "read_pdf": handle_read_pdf,
-    "analyze_repo": handle_analyze_repo,
-    "scrape_webpage": handle_scrape_webpage,
-    "extract_text": handle_extract_text,
-    "analyze_resume": handle_analyze_resume
-} 
\ No newline at end of file
+TOOL_HANDLERS = handlers()
+
+# Streaming variants, served by the proxy as NDJSON
+TOOL_STREAMERS = streamers()
+
+# OpenAI `tools` schemas, generated from the registrations above
+TOOL_SCHEMAS = schemas()
+
+if __name__ == "__main__":
+    # python -m tools.tool_handlers: regenerate tools_config.json from the registry
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools_config.json")
+    if write_tools_config(config_path):
+        print(f"Updated {config_path}")
+    else:
+        print(f"{config_path} is up to date")